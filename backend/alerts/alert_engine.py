@@ -1,47 +1,79 @@
-from typing import Dict, Any, Optional
-from collections import deque
- 
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from alerts.rules import compile_rules, default_rules, load_rules, number
+from app.config import ALERT_RULES
+from app.metrics import metrics
+
+
+def _signals(mode: str, output: Dict[str, Any]):
+    hazard = output.get("prediction") if mode == "classification" else output.get("hazard_level")
+    confidence = output.get("confidence", 0.0)
+    displacement = output.get("risk_score") if mode == "regression" else output.get("displacement_value", 0.0)
+    return hazard, confidence, displacement
+
+
+def _previous(prev_output: Optional[Dict[str, Any]]):
+    if not prev_output:
+        return None, None
+    prev_hazard = prev_output.get("hazard_level") if prev_output.get("hazard_level") is not None else prev_output.get("prediction")
+    prev_disp = prev_output.get("displacement_value") if prev_output.get("displacement_value") is not None else prev_output.get("risk_score", 0.0)
+    return prev_hazard, prev_disp
+
+
+def _column(values: list) -> np.ndarray:
+    column = np.asarray(values)
+    # the common case: every value is a number (None or other objects give an object array)
+    if column.ndim == 1 and column.dtype.kind in "biuf":
+        return column.astype(np.float64)
+    return np.array([number(v) for v in values], dtype=np.float64)
+
+
 class AlertEngine:
-    def __init__(self, sustained_threshold=2, sustained_steps=3, displacement_spike=0.5):
+    """Evaluates alert rules on model outputs.
+
+    Rules come from `rules` (definitions, see alerts/rules.py), else from the
+    ALERT_RULES setting, else the escalation / sustained / spike defaults built
+    from the constructor thresholds. They are compiled once; running counters
+    make `evaluate` O(1) per record, and `evaluate_batch` scores a run of
+    records with array operations and the same results.
+    """
+
+    def __init__(self, sustained_threshold=2, sustained_steps=3, displacement_spike=0.5,
+                 rules: Optional[List[Dict[str, Any]]] = None):
         self.sustained_threshold = sustained_threshold
         self.sustained_steps = sustained_steps
         self.displacement_spike = displacement_spike
-        self._history = deque(maxlen=1000)
+        if rules is None:
+            rules = load_rules(ALERT_RULES) or default_rules(sustained_threshold, sustained_steps, displacement_spike)
+        self.rule_definitions = rules
+        self.rules = compile_rules(rules)
+
+    @staticmethod
+    def chain(output: Dict[str, Any], alert: Dict[str, Any]) -> Dict[str, Any]:
+        """The `prev_output` to pass with the next record."""
+        return {**output, "hazard_level": alert.get("hazard_level"), "displacement_value": alert.get("displacement_value")}
+
+    def reset(self):
+        for rule in self.rules:
+            rule.reset()
 
     def evaluate(self, timestamp: str, mode: str, output: Dict[str, Any], prev_output: Optional[Dict[str, Any]]):
-        alert_flag = False
-        alert_msgs = []
-
-        hazard = output.get("prediction") if mode == "classification" else output.get("hazard_level")
-        confidence = output.get("confidence", 0.0)
-        displacement = output.get("risk_score") if mode == "regression" else output.get("displacement_value", 0.0)
-
-        # Escalation detection
-        if prev_output:
-            prev_hazard = prev_output.get("hazard_level") if prev_output.get("hazard_level") is not None else prev_output.get("prediction")
-            if prev_hazard is not None and hazard is not None and hazard > prev_hazard:
-                alert_flag = True
-                alert_msgs.append("Escalation detected: hazard class increased.")
-
-        # Sustained risk
-        self._history.append(hazard)
-        if hazard is not None and hazard >= self.sustained_threshold:
-            cnt = 0
-            for h in reversed(self._history):
-                if h is not None and h >= self.sustained_threshold:
-                    cnt += 1
-                else:
-                    break
-            if cnt >= self.sustained_steps:
-                alert_flag = True
-                alert_msgs.append(f"Sustained high risk for {cnt} steps.")
-
-        # Displacement spike
-        if prev_output:
-            prev_disp = prev_output.get("displacement_value") if prev_output.get("displacement_value") is not None else prev_output.get("risk_score", 0.0)
-            if displacement is not None and (displacement - prev_disp) > self.displacement_spike:
-                alert_flag = True
-                alert_msgs.append("Displacement spike detected.")
+        with metrics.stage("alerts", "evaluate"):
+            return self._evaluate(timestamp, mode, output, prev_output)
+
+    def _evaluate(self, timestamp, mode, output, prev_output):
+        hazard, confidence, displacement = _signals(mode, output)
+        prev_hazard, prev_disp = _previous(prev_output)
+        sig = {
+            "hazard": number(hazard),
+            "prev_hazard": number(prev_hazard),
+            "displacement": number(displacement),
+            "prev_displacement": number(prev_disp),
+            "confidence": number(confidence),
+        }
+        alert_msgs = [msg for msg in [rule.step(sig) for rule in self.rules] if msg]
 
         message = "; ".join(alert_msgs) if alert_msgs else ""
         return {
@@ -50,6 +82,64 @@ class AlertEngine:
             "hazard_level": hazard,
             "hazard_confidence": confidence,
             "displacement_value": displacement,
-            "alert_flag": alert_flag,
+            "alert_flag": bool(alert_msgs),
             "alert_message": message
         }
+
+    def evaluate_batch(self, timestamps: Sequence[str], mode: str, outputs: Sequence[Dict[str, Any]],
+                       prev_output: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Evaluate consecutive records at once.
+
+        Same results as calling `evaluate` for each record in turn, passing
+        `chain(output, alert)` of the previous one as `prev_output`.
+        """
+        n = len(outputs)
+        if n == 0:
+            return []
+        with metrics.stage("alerts", "evaluate_batch"):
+            return self._evaluate_batch(timestamps, mode, outputs, prev_output)
+
+    def _evaluate_batch(self, timestamps, mode, outputs, prev_output):
+        n = len(outputs)
+        if mode == "classification":
+            hazard = [o.get("prediction") for o in outputs]
+            displacement = [o.get("displacement_value", 0.0) for o in outputs]
+        else:
+            hazard = [o.get("hazard_level") for o in outputs]
+            displacement = [o.get("risk_score") for o in outputs]
+        confidence = [o.get("confidence", 0.0) for o in outputs]
+
+        # what _previous() reads from chain(outputs[i - 1], alert[i - 1])
+        first_hazard, first_disp = _previous(prev_output)
+        prev_hazard = [first_hazard] + [h if h is not None else o.get("prediction")
+                                        for o, h in zip(outputs[:-1], hazard)]
+        prev_disp = [first_disp] + [d if d is not None else o.get("risk_score", 0.0)
+                                    for o, d in zip(outputs[:-1], displacement)]
+
+        sig = {
+            "hazard": _column(hazard),
+            "prev_hazard": _column(prev_hazard),
+            "displacement": _column(displacement),
+            "prev_displacement": _column(prev_disp),
+            "confidence": _column(confidence),
+        }
+        results = [rule.batch(sig) for rule in self.rules]
+        flagged = np.zeros(n, dtype=bool)
+        for mask, _ in results:
+            flagged |= mask
+
+        alerts = []
+        for i in range(n):
+            message = ""
+            if flagged[i]:
+                message = "; ".join(messages(i) for mask, messages in results if mask[i])
+            alerts.append({
+                "timestamp": timestamps[i],
+                "mode": mode,
+                "hazard_level": hazard[i],
+                "hazard_confidence": confidence[i],
+                "displacement_value": displacement[i],
+                "alert_flag": bool(flagged[i]),
+                "alert_message": message
+            })
+        return alerts
@@ -0,0 +1,197 @@
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# the old per-record engine counted sustained steps over a 1000-entry history
+SUSTAINED_CAP = 1000
+
+# signals every rule can read; batch evaluation passes float64 arrays (NaN = missing)
+SIGNALS = ("hazard", "prev_hazard", "displacement", "prev_displacement", "confidence")
+
+Messages = Callable[[int], str]
+
+
+def number(value) -> float:
+    """float(value), NaN for None and non-numbers, so comparisons with a missing value are False."""
+    if type(value) is float:
+        return value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    return math.nan
+
+
+class Rule:
+    """One alert condition.
+
+    `step` evaluates a single record (scalars) and updates the rule's running
+    state in O(1); `batch` evaluates a run of consecutive records (arrays)
+    with the same results and leaves the state where `step` would have.
+    """
+
+    def step(self, sig: Dict[str, float]) -> Optional[str]:
+        raise NotImplementedError
+
+    def batch(self, sig: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Messages]:
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class EscalationRule(Rule):
+    """Hazard class went up since the previous record."""
+
+    message = "Escalation detected: hazard class increased."
+
+    def step(self, sig):
+        return self.message if sig["hazard"] > sig["prev_hazard"] else None
+
+    def batch(self, sig):
+        return sig["hazard"] > sig["prev_hazard"], lambda i: self.message
+
+
+class SustainedRule(Rule):
+    """Hazard at or above `threshold` for at least `steps` consecutive records."""
+
+    def __init__(self, threshold: float = 2, steps: int = 3):
+        self.threshold = threshold
+        self.steps = int(steps)
+        self.run = 0
+
+    def step(self, sig):
+        if sig["hazard"] >= self.threshold:
+            self.run += 1
+            count = min(self.run, SUSTAINED_CAP)
+            if count >= self.steps:
+                return f"Sustained high risk for {count} steps."
+        else:
+            self.run = 0
+        return None
+
+    def batch(self, sig):
+        high = sig["hazard"] >= self.threshold
+        n = len(high)
+        idx = np.arange(n)
+        # index of the latest low record at or before i (-1: none in this batch)
+        last_low = np.maximum.accumulate(np.where(high, -1, idx))
+        runs = np.where(last_low < 0, self.run + idx + 1, idx - last_low)
+        runs = np.minimum(np.where(high, runs, 0), SUSTAINED_CAP)
+        if n:
+            self.run = self.run + n if last_low[-1] < 0 else int(n - 1 - last_low[-1])
+        return runs >= max(self.steps, 1), lambda i: f"Sustained high risk for {int(runs[i])} steps."
+
+    def reset(self):
+        self.run = 0
+
+
+class SpikeRule(Rule):
+    """Displacement rose by more than `threshold` since the previous record."""
+
+    message = "Displacement spike detected."
+
+    def __init__(self, threshold: float = 0.5):
+        self.threshold = threshold
+
+    def step(self, sig):
+        return self.message if sig["displacement"] - sig["prev_displacement"] > self.threshold else None
+
+    def batch(self, sig):
+        return sig["displacement"] - sig["prev_displacement"] > self.threshold, lambda i: self.message
+
+
+class RateOfChangeRule(Rule):
+    """A signal moved by more than `threshold` over the last `window` records.
+
+    `direction` is "up", "down" or "both".
+    """
+
+    def __init__(self, signal: str = "displacement", window: int = 5, threshold: float = 1.0,
+                 direction: str = "up"):
+        if signal not in ("hazard", "displacement", "confidence"):
+            raise ValueError(f"rate_of_change: unknown signal '{signal}'")
+        if direction not in ("up", "down", "both"):
+            raise ValueError("rate_of_change: direction must be 'up', 'down' or 'both'")
+        self.signal = signal
+        self.window = max(1, int(window))
+        self.threshold = threshold
+        self.direction = direction
+        self._recent = deque(maxlen=self.window)
+
+    def _hit(self, delta):
+        if self.direction == "up":
+            return delta > self.threshold
+        if self.direction == "down":
+            return -delta > self.threshold
+        return np.abs(delta) > self.threshold
+
+    def _message(self, delta: float) -> str:
+        return f"{self.signal.capitalize()} changed by {delta:+.3f} over {self.window} steps."
+
+    def step(self, sig):
+        value = sig[self.signal]
+        past = self._recent[0] if len(self._recent) == self.window else math.nan
+        self._recent.append(value)
+        delta = value - past
+        return self._message(delta) if self._hit(delta) else None
+
+    def batch(self, sig):
+        values = sig[self.signal]
+        past = np.full(self.window, np.nan)
+        if self._recent:
+            past[self.window - len(self._recent):] = list(self._recent)
+        series = np.concatenate([past, values])
+        delta = series[self.window:] - series[:-self.window]
+        self._recent.extend(series[-self.window:].tolist())
+        return self._hit(delta), lambda i: self._message(float(delta[i]))
+
+    def reset(self):
+        self._recent.clear()
+
+
+RULE_TYPES = {
+    "escalation": EscalationRule,
+    "sustained": SustainedRule,
+    "spike": SpikeRule,
+    "rate_of_change": RateOfChangeRule,
+}
+
+
+def default_rules(sustained_threshold=2, sustained_steps=3, displacement_spike=0.5) -> List[Dict[str, Any]]:
+    return [
+        {"type": "escalation"},
+        {"type": "sustained", "threshold": sustained_threshold, "steps": sustained_steps},
+        {"type": "spike", "threshold": displacement_spike},
+    ]
+
+
+def load_rules(spec: str) -> Optional[List[Dict[str, Any]]]:
+    """Rule definitions from a JSON list or the path of a JSON file holding one; None when `spec` is empty."""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    if not spec.startswith("["):
+        with open(os.path.expanduser(spec), "r", encoding="utf-8") as f:
+            spec = f.read()
+    rules = json.loads(spec)
+    if not isinstance(rules, list):
+        raise ValueError("alert rules must be a JSON list")
+    return rules
+
+
+def compile_rules(definitions: List[Dict[str, Any]]) -> List[Rule]:
+    """Build the evaluators for rule definitions such as {"type": "spike", "threshold": 0.5}."""
+    rules = []
+    for definition in definitions:
+        params = dict(definition)
+        kind = params.pop("type", None)
+        if kind not in RULE_TYPES:
+            raise ValueError(f"unknown alert rule type: {kind!r} (expected {', '.join(RULE_TYPES)})")
+        try:
+            rules.append(RULE_TYPES[kind](**params))
+        except TypeError as e:
+            raise ValueError(f"bad parameters for alert rule '{kind}': {e}")
+    return rules
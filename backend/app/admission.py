@@ -0,0 +1,144 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.metrics import metrics
+
+QUEUE_SECONDS = "terraguard_inference_queue_seconds"
+COMPUTE_SECONDS = "terraguard_inference_compute_seconds"
+REJECTED_TOTAL = "terraguard_inference_rejected_total"
+
+metrics.histogram(QUEUE_SECONDS, "Time inference requests waited for a worker, by pool.")
+metrics.histogram(COMPUTE_SECONDS, "Time inference requests spent computing, by pool.")
+metrics.counter(REJECTED_TOTAL, "Inference requests turned away, by pool and reason.")
+
+# smoothing of the compute time behind the Retry-After estimate
+COMPUTE_ALPHA = 0.1
+
+
+class Overloaded(Exception):
+    """An inference request was not run; `status_code` 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Runs blocking inference calls for async handlers on a dedicated, bounded executor.
+
+    At most `concurrency` calls run at once and at most `queue_size` more
+    wait for a worker; a request arriving when both are taken is rejected at
+    once (429) instead of queueing without bound, and one that still hasn't
+    started after `queue_timeout_s` is dropped (503) since its client has
+    likely given up. Both carry a Retry-After estimate from the queue length
+    and the recent compute time. Concurrent calls still meet in the
+    micro-batcher (app/batching.py), so `concurrency` is also how many
+    requests can share one forward pass.
+    """
+
+    def __init__(self, concurrency: int = 8, queue_size: int = 64, queue_timeout_s: float = 10.0,
+                 name: str = "inference"):
+        self.concurrency = max(1, int(concurrency))
+        self.queue_size = max(0, int(queue_size))
+        self.queue_timeout_s = queue_timeout_s
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._compute_s = 0.0
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "max_queued": 0,
+        }
+        metrics.collector(self._gauges)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (at least 1)."""
+        with self._lock:
+            backlog = self._admitted
+        return max(1, math.ceil(backlog * self._compute_s / self.concurrency))
+
+    def _admit(self):
+        with self._lock:
+            if self._admitted >= self.concurrency + self.queue_size:
+                self._stats["rejected_queue_full"] += 1
+                full = True
+            else:
+                self._admitted += 1
+                queued = self._admitted - self._running
+                self._stats["max_queued"] = max(self._stats["max_queued"], queued)
+                full = False
+        if full:
+            metrics.inc(REJECTED_TOTAL, pool=self.name, reason="queue_full")
+            raise Overloaded(429, "Too many inference requests queued; retry later", self.retry_after())
+
+    def _call(self, enqueued: float, fn: Callable[..., Any], args, kwargs):
+        started = time.perf_counter()
+        waited = started - enqueued
+        metrics.observe(QUEUE_SECONDS, waited, pool=self.name)
+        if self.queue_timeout_s and waited > self.queue_timeout_s:
+            with self._lock:
+                self._stats["rejected_queue_timeout"] += 1
+            metrics.inc(REJECTED_TOTAL, pool=self.name, reason="queue_timeout")
+            raise Overloaded(503, f"Inference request waited {waited:.1f}s for a worker; retry later",
+                             self.retry_after())
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe(COMPUTE_SECONDS, elapsed, pool=self.name)
+            with self._lock:
+                self._running -= 1
+                self._compute_s = elapsed if not self._compute_s else \
+                    self._compute_s + COMPUTE_ALPHA * (elapsed - self._compute_s)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await `fn(*args, **kwargs)` on the pool; raises Overloaded when it can't be admitted or started in time."""
+        self._admit()
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._executor, self._call, time.perf_counter(), fn, args, kwargs)
+        except Overloaded:
+            raise
+        except Exception:
+            with self._lock:
+                self._stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._admitted -= 1
+        with self._lock:
+            self._stats["completed"] += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            s["running"] = self._running
+            s["queued"] = self._admitted - self._running
+            s["mean_compute_ms"] = round(self._compute_s * 1000.0, 3)
+        s["concurrency"] = self.concurrency
+        s["queue_size"] = self.queue_size
+        s["queue_timeout_s"] = self.queue_timeout_s
+        return s
+
+    def _gauges(self):
+        with self._lock:
+            running, queued = self._running, self._admitted - self._running
+        yield "terraguard_inference_running", "Inference calls running, by pool.", {"pool": self.name}, running
+        yield "terraguard_inference_queued", "Inference requests waiting for a worker, by pool.", {"pool": self.name}, queued
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Any
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent predict calls into one batched forward pass.
+
+    Callers submit a model and a (n, ...) array and block on the result. A
+    worker thread waits up to `window_ms` after the first pending request (or
+    until `max_batch` rows are queued), concatenates the requests for the same
+    model along axis 0, runs `predict_fn(model, x)` once and hands each caller
+    back its own slice. Keying on the model object means a hot-reload never
+    mixes rows for the old and new model in one pass.
+    """
+
+    def __init__(self, predict_fn: Callable[[Any, np.ndarray], Any], window_ms: float = 3.0,
+                 max_batch: int = 64, name: str = "batcher"):
+        self.predict_fn = predict_fn
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.name = name
+        self._pending = deque()
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "rows": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0,
+        }
+        self._thread = threading.Thread(target=self._run, name=f"{name}-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, model, x: np.ndarray) -> Future:
+        x = np.asarray(x)
+        fut = Future()
+        with self._cond:
+            self._pending.append((model, x, fut))
+            self._pending_rows += x.shape[0]
+            depth = len(self._pending)
+            self._cond.notify()
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        return fut
+
+    def predict(self, model, x: np.ndarray, timeout: float = None):
+        return self.submit(model, x).result(timeout=timeout)
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["queue_depth"] = self.queue_depth()
+        s["mean_batch_size"] = s["rows"] / s["batches"] if s["batches"] else 0.0
+        s["window_ms"] = self.window * 1000.0
+        s["max_batch"] = self.max_batch
+        return s
+
+    def _collect(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # the first request opens the window; stop early once the batch is full
+            deadline = time.monotonic() + self.window
+            while self._pending_rows < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            model = self._pending[0][0]
+            batch = []
+            rows = 0
+            while self._pending and self._pending[0][0] is model and (
+                    not batch or rows + self._pending[0][1].shape[0] <= self.max_batch):
+                _, x, fut = self._pending.popleft()
+                rows += x.shape[0]
+                batch.append((x, fut))
+            self._pending_rows -= rows
+            return model, batch, rows
+
+    def _run(self):
+        while True:
+            model, batch, rows = self._collect()
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["rows"] += rows
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], rows)
+            try:
+                out = np.asarray(self.predict_fn(model, np.concatenate([x for x, _ in batch], axis=0)))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            offset = 0
+            for x, fut in batch:
+                n = x.shape[0]
+                fut.set_result(out[offset:offset + n])
+                offset += n
@@ -7,4 +7,109 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 MODELS_DIR = os.path.join(BASE_DIR, "..", "models")
 
-APP_NAME = os.getenv("APP_NAME", "TerraGuard")
\ No newline at end of file
+APP_NAME = os.getenv("APP_NAME", "TerraGuard")
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Micro-batching of concurrent Keras predict calls (see app/batching.py)
+INFERENCE_BATCHING = _env_flag("INFERENCE_BATCHING", True)
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "3"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))
+
+# Async /predict/* path (see app/admission.py): at most INFERENCE_CONCURRENCY calls run at once and
+# INFERENCE_QUEUE_SIZE more may wait; beyond that requests get 429, and ones that waited longer than
+# INFERENCE_QUEUE_TIMEOUT_S for a worker get 503 (both with Retry-After)
+INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "8"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_QUEUE_TIMEOUT_S = float(os.getenv("INFERENCE_QUEUE_TIMEOUT_S", "10"))
+
+# Opt-in cache of classify()/regress() results (see app/result_cache.py). Feature vectors are rounded to
+# PREDICTION_CACHE_PRECISION decimals before hashing (empty: exact match); entries live PREDICTION_CACHE_TTL_S
+# seconds (0: until evicted) and the least recently used go beyond the entry or memory limit
+PREDICTION_CACHE = _env_flag("PREDICTION_CACHE", False)
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))
+PREDICTION_CACHE_MAX_MB = float(os.getenv("PREDICTION_CACHE_MAX_MB", "16"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "300"))
+_precision = os.getenv("PREDICTION_CACHE_PRECISION", "").strip()
+PREDICTION_CACHE_PRECISION = int(_precision) if _precision else None
+
+# Server-side lag features for live sensors (see app/lag_features.py): one history per device, dropped after
+# STREAM_IDLE_RESET_S seconds without a reading (0: kept) or beyond STREAM_MAX_DEVICES least recently seen devices
+STREAM_MAX_DEVICES = int(os.getenv("STREAM_MAX_DEVICES", "10000"))
+STREAM_IDLE_RESET_S = float(os.getenv("STREAM_IDLE_RESET_S", "600"))
+
+# Inference engine for the LSTM models: "keras" or "numpy" (models/numpy_lstm.py).
+# With both set to "numpy" the service runs without importing TensorFlow.
+CLASSIFICATION_ENGINE = os.getenv("CLASSIFICATION_ENGINE", "keras").strip().lower()
+REGRESSION_ENGINE = os.getenv("REGRESSION_ENGINE", "keras").strip().lower()
+
+# Evaluate the RF/XGB/DT regression base models through one compiled
+# array-based tree evaluator (models/tree_ensemble.py) instead of three predict calls
+COMPILED_TREES = _env_flag("COMPILED_TREES", True)
+
+# Apply the fitted imputer + scaler as one NumPy pass (models/preprocessing.py) instead of the sklearn
+# transform calls; checked against sklearn when built, which is used if they differ
+FUSED_PREPROCESSING = _env_flag("FUSED_PREPROCESSING", True)
+
+# "eager": load and warm up every model before serving, "background": start
+# serving immediately and load/warm up in a background thread (see /ready),
+# "lazy": load each model on first use
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").strip().lower()
+
+# Stage timers, row/error counters and the Prometheus /metrics endpoint (see app/metrics.py);
+# when disabled the instrumentation is a no-op and /metrics returns 404
+METRICS_ENABLED = _env_flag("METRICS_ENABLED", True)
+
+# Columnar binary cache of simulation datasets (see simulation/dataset_cache.py)
+DATASET_CACHE = _env_flag("DATASET_CACHE", True)
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(BASE_DIR, "data", ".cache"))
+
+# Streaming ingestion: files larger than the threshold are read in chunks on a
+# background thread instead of being loaded whole (see simulation/chunked_reader.py)
+DATASET_STREAM_THRESHOLD_MB = float(os.getenv("DATASET_STREAM_THRESHOLD_MB", "256"))
+DATASET_STREAM_CHUNK_ROWS = int(os.getenv("DATASET_STREAM_CHUNK_ROWS", "5000"))
+DATASET_STREAM_PREFETCH = int(os.getenv("DATASET_STREAM_PREFETCH", "2"))
+
+# Write-behind persistence of simulation records (see database/db_manager.py):
+# rows are queued and written by a background thread in batched transactions
+DB_WRITE_BEHIND = _env_flag("DB_WRITE_BEHIND", True)
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "256"))
+DB_FLUSH_INTERVAL_MS = float(os.getenv("DB_FLUSH_INTERVAL_MS", "200"))
+DB_QUEUE_SIZE = int(os.getenv("DB_QUEUE_SIZE", "10000"))
+# SQLite synchronous pragma; NORMAL is safe against app crashes in WAL mode
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").strip().upper()
+
+# Live event stream (/simulation/stream, see simulation/pubsub.py)
+STREAM_REPLAY_SIZE = int(os.getenv("STREAM_REPLAY_SIZE", "1000"))
+STREAM_CLIENT_BUFFER = int(os.getenv("STREAM_CLIENT_BUFFER", "256"))
+STREAM_KEEPALIVE_S = float(os.getenv("STREAM_KEEPALIVE_S", "15"))
+
+# Simulation sessions due within this window (or within the last tick's duration) share one batched step
+SCHEDULER_COALESCE_MS = float(os.getenv("SCHEDULER_COALESCE_MS", "20"))
+# What a session that fell behind its rate does (simulation/clock.py): "burst" runs the missed
+# steps back to back, "skip" skips the rows whose time has passed
+SCHEDULER_CATCHUP = os.getenv("SCHEDULER_CATCHUP", "burst").strip().lower()
+
+# Simulation state backend (see simulation/state_store.py and simulation/coordinator.py): "memory" keeps
+# the state in this process (one worker); "sqlite" shares it through STATE_DB_PATH so the API can run on
+# several workers, with the worker holding the leader lease driving the simulations
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").strip().lower()
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(BASE_DIR, "database", "state.db"))
+LEADER_LEASE_S = float(os.getenv("LEADER_LEASE_S", "5"))
+# how often the leader looks for forwarded commands and other workers tail new records for their streams
+STATE_POLL_MS = float(os.getenv("STATE_POLL_MS", "100"))
+COMMAND_TIMEOUT_S = float(os.getenv("COMMAND_TIMEOUT_S", "60"))
+
+# Alert rules (see alerts/rules.py): a JSON list, or the path of a JSON file with one, e.g.
+# [{"type": "escalation"}, {"type": "sustained", "threshold": 2, "steps": 3}, {"type": "spike", "threshold": 0.5},
+#  {"type": "rate_of_change", "signal": "displacement", "window": 10, "threshold": 1.0}]; empty = the first three
+ALERT_RULES = os.getenv("ALERT_RULES", "")
+
+# Rows per chunk of a fast-forward replay (/simulation/replay, see simulation/replay.py)
+REPLAY_CHUNK_ROWS = int(os.getenv("REPLAY_CHUNK_ROWS", "512"))
@@ -0,0 +1,189 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.metrics import metrics
+
+# what a device sends per reading; every other model input is a lag of these or the fed-back class
+RAW_CHANNELS = ("Ax", "Ay", "Az", "Gx", "Gy", "Gz", "Extensometer", "Displacement")
+CLASS_CHANNEL = "Class"
+
+READINGS_TOTAL = "terraguard_stream_readings_total"
+RESETS_TOTAL = "terraguard_stream_resets_total"
+
+metrics.counter(READINGS_TOTAL, "Raw readings turned into model features by the streaming lag engine.")
+metrics.counter(RESETS_TOTAL, "Device histories dropped, by reason (idle / evicted / layout / request).")
+
+_LAG = re.compile(r"^(.+)_t-(\d+)$")
+
+
+class LagLayout:
+    """Where each model feature comes from, parsed from the metadata feature names.
+
+    `Ax` is the current Ax, `Ax_t-2` the Ax two readings back; `Class`
+    columns come from the classes predicted for earlier readings. For a ring
+    buffer whose newest row is `head`, `gather[head]` are the buffer rows of
+    all features, so one fancy-index builds the whole vector.
+    """
+
+    def __init__(self, features: Sequence[str], channels: Sequence[str] = RAW_CHANNELS):
+        parsed = []
+        for name in features:
+            m = _LAG.match(name)
+            parsed.append((m.group(1), int(m.group(2))) if m else (name, 0))
+        self.features = list(features)
+        self.channels = tuple(channels) + (CLASS_CHANNEL,)
+        unknown = sorted({c for c, _ in parsed} - set(self.channels))
+        if unknown:
+            raise ValueError(f"No stream channel for feature(s) {unknown}")
+        column = {c: i for i, c in enumerate(self.channels)}
+        self.class_column = column[CLASS_CHANNEL]
+        self.depth = max((lag for _, lag in parsed), default=0) + 1
+        self.columns = np.array([column[c] for c, _ in parsed], dtype=np.intp)
+        lags = np.array([lag for _, lag in parsed], dtype=np.intp)
+        self.gather = [(head - lags) % self.depth for head in range(self.depth)]
+
+
+class _Stream:
+    """One device's last `depth` readings (plus their classes) in a ring buffer."""
+
+    __slots__ = ("layout", "buf", "head", "seen", "last_class", "last_seen", "lock")
+
+    def __init__(self, layout: LagLayout):
+        self.layout = layout
+        # history not seen yet stays NaN: a missing value the classification imputer fills
+        self.buf = np.full((layout.depth, len(layout.channels)), np.nan)
+        self.head = -1
+        self.seen = 0
+        self.last_class = np.nan
+        self.last_seen = 0.0
+        self.lock = threading.Lock()
+
+    def push(self, values: np.ndarray) -> np.ndarray:
+        layout = self.layout
+        head = self.head = (self.head + 1) % layout.depth
+        row = self.buf[head]
+        row[:layout.class_column] = values
+        # the current Class isn't known before this reading is classified: carry the last prediction forward
+        row[layout.class_column] = self.last_class
+        self.seen += 1
+        return self.buf[layout.gather[head], layout.columns]
+
+    def feed_back(self, class_id: int):
+        self.buf[self.head, self.layout.class_column] = class_id
+        self.last_class = class_id
+
+
+class LagFeatureStreams:
+    """Server-side lag features for live sensors, one ring buffer per device.
+
+    Clients send only the current raw reading (`RAW_CHANNELS`); `step`
+    writes it into the device's buffer, builds the model's feature vector
+    in the metadata order (constant work per reading, whatever the history
+    length), runs `predict` on it and writes the predicted class back so
+    the next readings see it in their `Class_t-*` columns. Readings of one
+    device are processed one at a time; different devices run in parallel.
+    Lags older than the device's history are missing values until its
+    buffer has filled. A device idle for more than `idle_reset_s` (0:
+    never) starts over, and the least recently seen devices are dropped
+    beyond `max_devices`.
+    """
+
+    def __init__(self, max_devices: int = 10000, idle_reset_s: float = 600.0):
+        self.max_devices = max(1, int(max_devices))
+        self.idle_reset_s = idle_reset_s
+        self._lock = threading.Lock()
+        self._layout: Optional[LagLayout] = None
+        self._streams: "OrderedDict[str, _Stream]" = OrderedDict()
+        self._stats = {"readings": 0, "reset_idle": 0, "reset_evicted": 0, "reset_layout": 0, "reset_request": 0}
+        metrics.collector(self._gauges)
+
+    def configure(self, features: Sequence[str]) -> LagLayout:
+        """Use the feature order of the current model; histories built for a different one are dropped."""
+        layout = self._layout
+        if layout is not None and layout.features == list(features):
+            return layout
+        layout = LagLayout(features)
+        with self._lock:
+            dropped = len(self._streams)
+            self._streams.clear()
+            self._layout = layout
+            self._stats["reset_layout"] += dropped
+        if dropped:
+            metrics.inc(RESETS_TOTAL, dropped, reason="layout")
+        return layout
+
+    def _stream(self, device_id: str, now: float) -> _Stream:
+        evicted = idle = 0
+        with self._lock:
+            if self._layout is None:
+                raise RuntimeError("LagFeatureStreams.configure() has not been called")
+            stream = self._streams.get(device_id)
+            if stream is not None and self.idle_reset_s and now - stream.last_seen > self.idle_reset_s:
+                stream = None
+                idle = 1
+            if stream is None:
+                stream = self._streams[device_id] = _Stream(self._layout)
+                while len(self._streams) > self.max_devices:
+                    self._streams.popitem(last=False)
+                    evicted += 1
+            else:
+                self._streams.move_to_end(device_id)
+            stream.last_seen = now
+            self._stats["reset_idle"] += idle
+            self._stats["reset_evicted"] += evicted
+        if idle:
+            metrics.inc(RESETS_TOTAL, reason="idle")
+        if evicted:
+            metrics.inc(RESETS_TOTAL, evicted, reason="evicted")
+        return stream
+
+    def step(self, device_id: str, reading: Dict[str, Optional[float]],
+             predict: Callable[[np.ndarray], Tuple[Optional[int], Any]]) -> Tuple[np.ndarray, Any, int]:
+        """Feed one reading: `predict(features)` gets the (1, n_features) row and returns (class id, result).
+
+        Returns the feature row, the result and how many readings the device
+        has sent. A None class id (failed prediction) leaves the last known
+        class in place.
+        """
+        values = np.array([reading.get(c) for c in RAW_CHANNELS], dtype=np.float64)
+        stream = self._stream(device_id, time.monotonic())
+        with stream.lock:
+            with metrics.stage("lag_features", "build"):
+                row = stream.push(values).reshape(1, -1)
+            class_id, result = predict(row)
+            if class_id is not None:
+                stream.feed_back(class_id)
+            seen = stream.seen
+        with self._lock:
+            self._stats["readings"] += 1
+        metrics.inc(READINGS_TOTAL)
+        return row, result, seen
+
+    def reset(self, device_id: str) -> bool:
+        """Forget a device's history; False if there was none."""
+        with self._lock:
+            found = self._streams.pop(device_id, None) is not None
+            self._stats["reset_request"] += int(found)
+        if found:
+            metrics.inc(RESETS_TOTAL, reason="request")
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            s["devices"] = len(self._streams)
+            layout = self._layout
+        s["history"] = layout.depth - 1 if layout is not None else None
+        s["max_devices"] = self.max_devices
+        s["idle_reset_s"] = self.idle_reset_s
+        return s
+
+    def _gauges(self):
+        with self._lock:
+            devices = len(self._streams)
+        yield "terraguard_stream_devices", "Devices with a lag-feature history held by the streaming engine.", {}, devices
@@ -0,0 +1,285 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import METRICS_ENABLED
+
+# latency buckets in seconds, 10 us .. 10 s
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_perf_counter = time.perf_counter
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple((k, str(v)) for k, v in labels.items())
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Counter:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float):
+        with self.lock:
+            self.value += amount
+
+
+class _Timer:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: _Histogram):
+        self.hist = hist
+        self.t0 = _perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(_perf_counter() - self.t0)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Counters and latency histograms, rendered in the Prometheus text format for `/metrics`.
+
+    Families are declared once (`counter` / `histogram`) and updated by
+    name with their labels. With `enabled=False` every update returns at
+    once and `timer()` hands out a shared no-op context manager, so the
+    instrumented code paths cost a function call.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # name -> (type, help, buckets)
+        self._families: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {}
+        self._counters: Dict[Tuple[str, Labels], _Counter] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        # series of the shorthands below by their positional labels, so hot paths skip building label tuples
+        self._fast: Dict[tuple, Any] = {}
+        # called at scrape time: yield (name, help, labels, value) gauge samples
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]] = []
+
+    # --- declaration ---
+
+    def counter(self, name: str, help: str):
+        self._families[name] = ("counter", help, None)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._families[name] = ("histogram", help, tuple(sorted(buckets)))
+
+    def collector(self, fn):
+        """Register a scrape-time source of gauges (e.g. queue depths already tracked elsewhere)."""
+        self._collectors.append(fn)
+        return fn
+
+    # --- updates ---
+
+    def _counter(self, name: str, labels: Dict[str, Any]) -> _Counter:
+        key = (name, _labels(labels))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, _Counter())
+        return counter
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        if not self.enabled:
+            return
+        self._counter(name, labels).inc(amount)
+
+    def _histogram(self, name: str, labels: Dict[str, Any]) -> _Histogram:
+        key = (name, _labels(labels))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.get(key)
+                if hist is None:
+                    hist = self._histograms[key] = _Histogram(self._families[name][2] or DEFAULT_BUCKETS)
+        return hist
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        self._histogram(name, labels).observe(seconds)
+
+    def timer(self, name: str, **labels):
+        """Context manager observing the time spent in its block."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._histogram(name, labels))
+
+    # --- shorthands for the families below ---
+
+    def _stage(self, component: str, stage: str) -> _Histogram:
+        hist = self._fast.get((STAGE_SECONDS, component, stage))
+        if hist is None:
+            hist = self._fast[(STAGE_SECONDS, component, stage)] = \
+                self._histogram(STAGE_SECONDS, {"component": component, "stage": stage})
+        return hist
+
+    def stage(self, component: str, stage: str):
+        """Context manager timing one pipeline stage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._stage(component, stage))
+
+    def observe_stage(self, component: str, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        self._stage(component, stage).observe(seconds)
+
+    def _fast_counter(self, name: str, first: str, second: str, labels: Tuple[str, str]) -> _Counter:
+        counter = self._fast.get((name, first, second))
+        if counter is None:
+            counter = self._fast[(name, first, second)] = self._counter(name, {labels[0]: first, labels[1]: second})
+        return counter
+
+    def rows(self, component: str, mode: str, n: int = 1):
+        if not self.enabled:
+            return
+        self._fast_counter(ROWS_TOTAL, component, mode, ("component", "mode")).inc(n)
+
+    def swallowed(self, component: str, site: str):
+        """Count an exception a fallback path caught and carried on from."""
+        if not self.enabled:
+            return
+        self._fast_counter(SWALLOWED_TOTAL, component, site, ("component", "site")).inc(1)
+
+    # --- exposition ---
+
+    def render(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items(), key=lambda item: item[0])
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines: List[str] = []
+        by_name: Dict[str, List[str]] = {}
+        for (name, labels), counter in counters:
+            by_name.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(counter.value)}")
+        for (name, labels), hist in histograms:
+            with hist.lock:
+                counts, total, count = list(hist.counts), hist.sum, hist.count
+            samples = by_name.setdefault(name, [])
+            cumulative = 0
+            for bound, n in zip(hist.buckets + (math.inf,), counts):
+                cumulative += n
+                samples.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+            samples.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            samples.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name, (kind, help, _) in self._families.items():
+            if name in by_name:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"] + by_name[name]
+
+        gauges: Dict[str, Tuple[str, List[str]]] = {}
+        for fn in self._collectors:
+            try:
+                for name, help, labels, value in fn():
+                    if value is None:
+                        continue
+                    gauges.setdefault(name, (help, []))[1].append(
+                        f"{name}{_format_labels(_labels(labels))} {_format_value(float(value))}")
+            except Exception:
+                self.swallowed("metrics", "collector")
+        for name, (help, samples) in gauges.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"] + samples
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request up to its response headers (handler plus JSON encoding).
+
+    Requests are labelled with the matched route template, not the raw path,
+    so path parameters don't multiply the series. Streaming bodies (SSE) are
+    timed only up to their first byte.
+    """
+
+    def __init__(self, app, registry: "Metrics"):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                route = scope.get("route")
+                self.registry.observe(HTTP_SECONDS, time.perf_counter() - t0, method=scope["method"],
+                                      route=getattr(route, "path", "unmatched"), status=status["code"])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+STAGE_SECONDS = "terraguard_stage_seconds"
+ROWS_TOTAL = "terraguard_rows_total"
+SWALLOWED_TOTAL = "terraguard_swallowed_errors_total"
+HTTP_SECONDS = "terraguard_http_request_seconds"
+HEURISTIC_TOTAL = "terraguard_fallback_predictions_total"
+
+metrics = Metrics(METRICS_ENABLED)
+metrics.histogram(STAGE_SECONDS, "Time spent in each pipeline stage, by component and stage.")
+metrics.counter(ROWS_TOTAL, "Rows scored or recorded, by component and mode.")
+metrics.counter(SWALLOWED_TOTAL, "Exceptions caught by fallback paths, by component and site.")
+metrics.counter(HEURISTIC_TOTAL, "Predictions answered by a fallback heuristic instead of the model, by component.")
+metrics.histogram(HTTP_SECONDS, "HTTP request time up to the response headers, by method, route and status.")
@@ -1,121 +1,311 @@
 import os
-import joblib
+import logging
 import numpy as np
-import keras
-from keras.models import load_model
-from keras import Model
-from typing import cast 
-from app.config import MODELS_DIR
-from app.utils import reshape_input
+from app.config import (
+    MODELS_DIR, INFERENCE_BATCHING, INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH,
+    CLASSIFICATION_ENGINE, REGRESSION_ENGINE, COMPILED_TREES, FUSED_PREPROCESSING,
+    INFERENCE_CONCURRENCY, INFERENCE_QUEUE_SIZE, INFERENCE_QUEUE_TIMEOUT_S,
+    PREDICTION_CACHE, PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_MB, PREDICTION_CACHE_TTL_S,
+    PREDICTION_CACHE_PRECISION, STREAM_MAX_DEVICES, STREAM_IDLE_RESET_S,
+)
+from models.registry import registry
+from models.tree_ensemble import try_compile
+from models import preprocessing
+from app.utils import reshape_input, stack_rows
+from app.batching import MicroBatcher
+from app.admission import InferencePool
+from app.result_cache import ResultCache
+from app.lag_features import LagFeatureStreams
+from app.metrics import metrics
+
+logger = logging.getLogger("terraguard.ml")
 
 #classification
-clf_model = cast(
-    Model, 
-    load_model(os.path.join(MODELS_DIR, "classification", "classification_lstm.h5"), compile=False))
+CLF_MODEL_PATH = os.path.join(MODELS_DIR, "classification", "classification_lstm.h5")
+CLF_SCALER_PATH = os.path.join(MODELS_DIR, "classification", "classification_scaler.pkl")
+CLF_IMPUTER_PATH = os.path.join(MODELS_DIR, "classification", "classification_imputer.pkl")
+CLF_METADATA_PATH = os.path.join(MODELS_DIR, "classification", "classification_metadata.json")
 
-clf_scaler = joblib.load(
-    os.path.join(MODELS_DIR, "classification", "classification_scaler.pkl")
-)
+#regression
+XGB_MODEL_PATH = os.path.join(MODELS_DIR, "regression", "regression_xgb.pkl")
+RF_MODEL_PATH = os.path.join(MODELS_DIR, "regression", "regression_rf.pkl")
+DT_MODEL_PATH = os.path.join(MODELS_DIR, "regression", "regression_dt.pkl")
+META_LSTM_PATH = os.path.join(MODELS_DIR, "regression", "regression_meta_lstm.h5")
+REG_SCALER_PATH = os.path.join(MODELS_DIR, "regression", "regression_scaler.pkl")
 
-clf_imputer = joblib.load(
-    os.path.join(MODELS_DIR, "classification", "classification_imputer.pkl")
-)
 
-#regression
-xgb_model = joblib.load(
-    os.path.join(MODELS_DIR, "regression", "regression_xgb.pkl")
-)
+class _Pipeline:
+    """Every artifact classify()/regress() need, taken from one registry snapshot."""
 
-rf_model = joblib.load(
-    os.path.join(MODELS_DIR, "regression", "regression_rf.pkl")
-)
+    def __init__(self, snap):
+        self.version = snap.version
+        # "keras" or "numpy" engine, see models/numpy_lstm.py
+        self.clf_model = snap.get(CLF_MODEL_PATH, CLASSIFICATION_ENGINE)
+        self.clf_scaler = snap.get(CLF_SCALER_PATH)
+        self.clf_imputer = snap.get(CLF_IMPUTER_PATH)
+        # feature order of the classification model, for the streaming lag features
+        self.clf_features = (snap.get(CLF_METADATA_PATH) or {}).get("features")
+        self.xgb_model = snap.get(XGB_MODEL_PATH)
+        self.rf_model = snap.get(RF_MODEL_PATH)
+        self.dt_model = snap.get(DT_MODEL_PATH)
+        self.meta_lstm = snap.get(META_LSTM_PATH, REGRESSION_ENGINE)
+        self.reg_scaler = snap.get(REG_SCALER_PATH)
+        # None if the base models could not be compiled exactly; regress() then falls back to predict()
+        self.tree_ensemble = try_compile([self.xgb_model, self.rf_model, self.dt_model]) if COMPILED_TREES else None
+        # imputer + scaler (classification) and scaler (regression) as one pass each, shared with ClassificationModel
+        self.clf_preprocess = preprocessing.build(self.clf_imputer, self.clf_scaler, FUSED_PREPROCESSING)
+        self.reg_preprocess = preprocessing.build(None, self.reg_scaler, FUSED_PREPROCESSING)
+        logger.info("Classification preprocessing: %s", type(self.clf_preprocess).__name__)
+        logger.info("Classification scaler expects: %s", self.clf_scaler.n_features_in_)
+        logger.info("Regression scaler expects: %s", self.reg_scaler.n_features_in_)
 
-dt_model = joblib.load(
-    os.path.join(MODELS_DIR, "regression", "regression_dt.pkl")
-)
 
-meta_lstm = cast(
-    Model, 
-    load_model(os.path.join(MODELS_DIR, "regression", "regression_meta_lstm.h5"), compile=False))
+def _pipeline() -> _Pipeline:
+    # loaded on first use (see app/startup.py); rebuilt by the registry on every hot-reload
+    return registry.derive("ml_logic", _Pipeline)
 
-reg_scaler = joblib.load(
-    os.path.join(MODELS_DIR, "regression", "regression_scaler.pkl")
-)
 
-print("Classification scaler expects:", clf_scaler.n_features_in_)
-print("Regression scaler expects:", reg_scaler.n_features_in_)
+def load_models():
+    _pipeline()
 
 
-def classify(features: list):
-    try:
-        data = reshape_input(features)
+def warm_up():
+    """Run one synthetic row through each pipeline so the first real request doesn't pay for graph tracing."""
+    p = _pipeline()
+    for name, result in (
+        ("classification", classify([0.0] * p.clf_scaler.n_features_in_)),
+        ("regression", regress(list(p.reg_scaler.mean_))),
+    ):
+        if result.get("status") != "success":
+            logger.warning("%s warm-up failed: %s", name, result.get("message"))
 
-        data = clf_imputer.transform(data)
-        data = clf_scaler.transform(data)
-        data = data.reshape(1, 1, clf_scaler.n_features_in_)
+# Concurrent requests share one forward pass per model instead of queueing on TensorFlow.
+# Requests are only batched with others that use the same model object.
+clf_batcher = MicroBatcher(
+    lambda model, x: model.predict(x, verbose=0),
+    window_ms=INFERENCE_BATCH_WINDOW_MS, max_batch=INFERENCE_MAX_BATCH, name="classification"
+) if INFERENCE_BATCHING else None
 
-        prediction = clf_model.predict(data)
+meta_batcher = MicroBatcher(
+    lambda model, x: model.predict(x, verbose=0),
+    window_ms=INFERENCE_BATCH_WINDOW_MS, max_batch=INFERENCE_MAX_BATCH, name="regression_meta"
+) if INFERENCE_BATCHING else None
 
-        class_id = int(np.argmax(prediction))
-        confidence = float(np.max(prediction))
 
-        class_map = {
-            0: "Low",
-            1: "Moderate",
-            2: "High",
-            3: "Critical"
-        }
+# the async /predict/* handlers run classify()/regress() here: bounded concurrency and admission queue
+inference_pool = InferencePool(INFERENCE_CONCURRENCY, INFERENCE_QUEUE_SIZE, INFERENCE_QUEUE_TIMEOUT_S)
 
 
-        return {
+# repeated (or, with a precision, nearly repeated) feature vectors skip the pipeline; keyed to the model version
+result_cache = ResultCache(
+    PREDICTION_CACHE_MAX_ENTRIES, int(PREDICTION_CACHE_MAX_MB * 1024 * 1024), PREDICTION_CACHE_TTL_S,
+    PREDICTION_CACHE_PRECISION
+) if PREDICTION_CACHE else None
+
+
+def _predict_clf(model, data: np.ndarray):
+    if clf_batcher is not None:
+        return clf_batcher.predict(model, data)
+    return model.predict(data, verbose=0)
+
+
+def _predict_meta(model, data: np.ndarray):
+    if meta_batcher is not None:
+        return meta_batcher.predict(model, data)
+    return model.predict(data, verbose=0)
+
+
+# live sensors send raw readings; their lag and Class columns are kept here per device
+feature_streams = LagFeatureStreams(STREAM_MAX_DEVICES, STREAM_IDLE_RESET_S)
+
+
+def batching_stats() -> dict:
+    return {
+        "enabled": INFERENCE_BATCHING,
+        "classification": clf_batcher.stats() if clf_batcher is not None else None,
+        "regression_meta": meta_batcher.stats() if meta_batcher is not None else None,
+        "admission": inference_pool.stats(),
+        "cache": result_cache.stats() if result_cache is not None else None,
+        "streams": feature_streams.stats(),
+    }
+
+
+CLASS_MAP = {
+    0: "Low",
+    1: "Moderate",
+    2: "High",
+    3: "Critical"
+}
+CLASS_IDS = {label: class_id for class_id, label in CLASS_MAP.items()}
+
+
+def risk_level(risk_score: float) -> str:
+    if risk_score < 8:
+        return "Low"
+    elif risk_score < 20:
+        return "Moderate"
+    elif risk_score < 35:
+        return "High"
+    return "Critical"
+
+
+def _classify_matrix(data: np.ndarray, p: _Pipeline = None) -> list:
+    # data: (N, n_features) raw rows -> one imputer/scaler/LSTM pass for all N
+    p = p or _pipeline()
+    with metrics.stage("ml_logic", "clf_preprocess"):
+        data = p.clf_preprocess.transform(data)
+    data = data.reshape(data.shape[0], 1, p.clf_scaler.n_features_in_)
+
+    with metrics.stage("ml_logic", "clf_lstm"):
+        prediction = _predict_clf(p.clf_model, data)
+
+    class_ids = np.argmax(prediction, axis=1)
+    confidences = np.max(prediction, axis=1)
+    metrics.rows("ml_logic", "classification", len(class_ids))
+
+    return [
+        {
             "status": "success",
-            "prediction": class_map[class_id],
-            "confidence": confidence
+            "prediction": CLASS_MAP[int(class_id)],
+            "confidence": float(confidence)
         }
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": str(e)
+        for class_id, confidence in zip(class_ids, confidences)
+    ]
+
+
+def _regress_matrix(data: np.ndarray, p: _Pipeline = None) -> list:
+    # data: (N, n_features) raw rows -> one scaler/base-model/meta-LSTM pass for all N
+    p = p or _pipeline()
+    with metrics.stage("ml_logic", "reg_preprocess"):
+        data = p.reg_preprocess.transform(data)
+
+    #base models
+    if p.tree_ensemble is not None:
+        with metrics.stage("ml_logic", "reg_trees_compiled"):
+            base = p.tree_ensemble.predict(data)
+        xgb_preds, rf_preds, dt_preds = base[:, 0], base[:, 1], base[:, 2]
+    else:
+        with metrics.stage("ml_logic", "reg_xgb"):
+            xgb_preds = np.asarray(p.xgb_model.predict(data), dtype=float).reshape(-1)
+        with metrics.stage("ml_logic", "reg_rf"):
+            rf_preds = np.asarray(p.rf_model.predict(data), dtype=float).reshape(-1)
+        with metrics.stage("ml_logic", "reg_dt"):
+            dt_preds = np.asarray(p.dt_model.predict(data), dtype=float).reshape(-1)
+
+    stacked_input = np.column_stack([xgb_preds, rf_preds, dt_preds])
+    stacked_input = stacked_input.reshape(-1, 1, 3)
+
+    with metrics.stage("ml_logic", "reg_meta_lstm"):
+        risk_scores = np.asarray(_predict_meta(p.meta_lstm, stacked_input), dtype=float).reshape(-1)
+    metrics.rows("ml_logic", "regression", len(risk_scores))
+
+    return [
+        {
+            "status": "success",
+            "risk_score": float(risk_score),
+            "risk_level": risk_level(float(risk_score)),
+            "base_predictions": {
+                "xgb": float(xgb_pred),
+                "rf": float(rf_pred),
+                "dt": float(dt_pred)
+            }
         }
+        for risk_score, xgb_pred, rf_pred, dt_pred in zip(risk_scores, xgb_preds, rf_preds, dt_preds)
+    ]
 
-def regress(features: list):
+
+def _cached(mode: str, data: np.ndarray, run_matrix, p: _Pipeline) -> list:
+    if result_cache is None:
+        return run_matrix(data, p)
+    return result_cache.lookup(mode, data, p.version, lambda rows: run_matrix(rows, p))
+
+
+def _run_batch(rows: list, allow_nan: bool, prepare) -> dict:
+    """`prepare()` resolves the pipeline and returns (n_features, run_matrix); if it fails, every row gets the error."""
     try:
-        data = reshape_input(features)
-        data = reg_scaler.transform(data)
+        n_features, run_matrix = prepare()
+    except Exception as e:
+        metrics.swallowed("ml_logic", "batch")
+        return _batch_response([{"status": "error", "message": str(e)} for _ in rows])
+    data, errors = stack_rows(rows, n_features, allow_nan=allow_nan)
+    results = [{"status": "error", "message": msg} for msg in errors]
 
-        #base models
-        xgb_pred = float(xgb_model.predict(data)[0])
-        rf_pred = float(rf_model.predict(data)[0])
-        dt_pred = float(dt_model.predict(data)[0])
+    valid = [i for i, msg in enumerate(errors) if msg is None]
+    if valid:
+        try:
+            for i, res in zip(valid, run_matrix(data[valid])):
+                results[i] = res
+        except Exception as e:
+            metrics.swallowed("ml_logic", "batch")
+            for i in valid:
+                results[i] = {"status": "error", "message": str(e)}
+    return _batch_response(results)
 
-        stacked_input = np.array([[xgb_pred, rf_pred, dt_pred]])
 
-        stacked_input = stacked_input.reshape(1,1,3)
+def _batch_response(results: list) -> dict:
+    failed = sum(1 for r in results if r["status"] != "success")
+    return {
+        "status": "success" if failed == 0 else ("error" if failed == len(results) else "partial"),
+        "count": len(results),
+        "failed": failed,
+        "results": results
+    }
 
-        risk_score = float(meta_lstm.predict(stacked_input)[0][0])
 
-        if risk_score < 8:
-            level = "Low"
-        elif risk_score < 20:
-            level = "Moderate"
-        elif risk_score < 35:
-            level = "High"
-        else:
-            level = "Critical"
+def classify(features: list):
+    try:
+        data = reshape_input(features)
+        return _cached("classification", data, _classify_matrix, _pipeline())[0]
+    except Exception as e:
+        metrics.swallowed("ml_logic", "classify")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+def classify_stream(device_id: str, reading: dict):
+    """classify() for one raw reading of a live device; its lag and Class features come from the device's history."""
+    try:
+        p = _pipeline()
+        if not p.clf_features:
+            raise ValueError("Classification metadata has no feature list")
+        feature_streams.configure(p.clf_features)
 
+        def predict(row):
+            result = _cached("classification", row, _classify_matrix, p)[0]
+            return CLASS_IDS.get(result.get("prediction")), result
 
+        _, result, seen = feature_streams.step(device_id, reading, predict)
+        return dict(result, device_id=device_id, readings=seen)
+    except Exception as e:
+        metrics.swallowed("ml_logic", "classify_stream")
         return {
-            "status": "success",
-            "risk_score": float(risk_score),
-            "risk_level": level,
-            "base_predictions": {
-                "xgb": xgb_pred,
-                "rf": rf_pred,
-                "dt": dt_pred
-            }
+            "status": "error",
+            "message": str(e)
         }
+
+def regress(features: list):
+    try:
+        data = reshape_input(features)
+        return _cached("regression", data, _regress_matrix, _pipeline())[0]
     except Exception as e:
+        metrics.swallowed("ml_logic", "regress")
         return {
             "status": "error",
             "message": str(e)
-        }
\ No newline at end of file
+        }
+
+
+def classify_batch(rows: list):
+    def prepare():
+        p = _pipeline()
+        return p.clf_scaler.n_features_in_, lambda data: _cached("classification", data, _classify_matrix, p)
+    # missing values are allowed here: the imputer fills them
+    return _run_batch(rows, True, prepare)
+
+
+def regress_batch(rows: list):
+    def prepare():
+        p = _pipeline()
+        return p.reg_scaler.n_features_in_, lambda data: _cached("regression", data, _regress_matrix, p)
+    return _run_batch(rows, False, prepare)
@@ -0,0 +1,171 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.metrics import metrics
+
+LOOKUPS_TOTAL = "terraguard_prediction_cache_lookups_total"
+EVICTIONS_TOTAL = "terraguard_prediction_cache_evictions_total"
+
+metrics.counter(LOOKUPS_TOTAL, "Prediction cache lookups, by mode and result (hit / miss).")
+metrics.counter(EVICTIONS_TOTAL, "Prediction cache entries dropped, by reason (size / expired / invalidated).")
+
+# dict, key and bookkeeping overhead per entry on top of the result itself
+ENTRY_OVERHEAD = 200
+
+
+def _size(value: Any) -> int:
+    """Rough memory footprint of a result (dicts, lists and scalars)."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size(k) + _size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _copy(result: Dict[str, Any]) -> Dict[str, Any]:
+    # results are flat apart from regression's base_predictions; callers may add keys to what they get
+    return {k: dict(v) if isinstance(v, dict) else v for k, v in result.items()}
+
+
+class ResultCache:
+    """LRU/TTL cache of prediction results keyed on (quantized) feature vectors.
+
+    Each row is rounded to `precision` decimals (None: exact values), so
+    readings that differ only below that precision share an entry, and keyed
+    by a 16-byte digest of the rounded values. Entries expire after `ttl_s`
+    (0: never) and the least recently used ones are evicted beyond
+    `max_entries` or `max_bytes`. The cache is bound to a model version and
+    empties itself when a lookup comes with a different one, so a hot-reload
+    never serves results of the old artifacts.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 << 20, ttl_s: float = 300.0,
+                 precision: Optional[int] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl_s = ttl_s
+        self.precision = precision
+        self._lock = threading.Lock()
+        # digest -> (expires_at, result, size)
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._stats = {"hits": 0, "misses": 0, "evicted_size": 0, "expired": 0, "invalidations": 0}
+        metrics.collector(self._gauges)
+
+    def keys(self, mode: str, data: np.ndarray) -> List[bytes]:
+        q = np.asarray(data, dtype=np.float64)
+        if self.precision is not None:
+            q = np.round(q, self.precision)
+        # + 0.0 folds -0.0 into 0.0
+        q = np.ascontiguousarray(q + 0.0)
+        prefix = mode.encode()
+        return [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest() for row in q]
+
+    def _check_version(self, version):
+        # called with the lock held
+        if version != self._version:
+            if self._entries:
+                metrics.inc(EVICTIONS_TOTAL, len(self._entries), reason="invalidated")
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get_many(self, mode: str, keys: List[bytes], version) -> List[Optional[Dict[str, Any]]]:
+        now = time.monotonic()
+        found: List[Optional[Dict[str, Any]]] = []
+        expired = 0
+        with self._lock:
+            self._check_version(version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] and entry[0] <= now:
+                    self._drop(key)
+                    expired += 1
+                    entry = None
+                if entry is None:
+                    found.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                found.append(_copy(entry[1]))
+            hits = sum(1 for r in found if r is not None)
+            self._stats["hits"] += hits
+            self._stats["misses"] += len(keys) - hits
+            self._stats["expired"] += expired
+        if hits:
+            metrics.inc(LOOKUPS_TOTAL, hits, mode=mode, result="hit")
+        if len(keys) - hits:
+            metrics.inc(LOOKUPS_TOTAL, len(keys) - hits, mode=mode, result="miss")
+        if expired:
+            metrics.inc(EVICTIONS_TOTAL, expired, reason="expired")
+        return found
+
+    def put_many(self, keys: List[bytes], results: List[Dict[str, Any]], version):
+        expires = time.monotonic() + self.ttl_s if self.ttl_s else 0.0
+        evicted = 0
+        with self._lock:
+            if version != self._version:
+                # the model changed while these were computed
+                return
+            for key, result in zip(keys, results):
+                if result.get("status") != "success":
+                    continue
+                size = ENTRY_OVERHEAD + _size(result)
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = (expires, _copy(result), size)
+                self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                evicted += 1
+            self._stats["evicted_size"] += evicted
+        if evicted:
+            metrics.inc(EVICTIONS_TOTAL, evicted, reason="size")
+
+    def _drop(self, key: bytes):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def lookup(self, mode: str, data: np.ndarray, version, compute: Callable[[np.ndarray], list]) -> list:
+        """Results for the rows of `data`: cached ones as they are, the rest from one `compute(rows)` call."""
+        keys = self.keys(mode, data)
+        results = self.get_many(mode, keys, version)
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            computed = compute(data[missing])
+            for i, result in zip(missing, computed):
+                results[i] = result
+            self.put_many([keys[i] for i in missing], computed, version)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            s["entries"] = len(self._entries)
+            s["bytes"] = self._bytes
+            s["model_version"] = self._version
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = round(s["hits"] / lookups, 4) if lookups else 0.0
+        s["max_entries"] = self.max_entries
+        s["max_bytes"] = self.max_bytes
+        s["ttl_s"] = self.ttl_s
+        s["precision"] = self.precision
+        return s
+
+    def _gauges(self):
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        yield "terraguard_prediction_cache_entries", "Results held by the prediction cache.", {}, entries
+        yield "terraguard_prediction_cache_bytes", "Approximate memory held by the prediction cache.", {}, size
@@ -1,5 +1,24 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class SensorInput(BaseModel):
-    features: List[float]
\ No newline at end of file
+    features: List[float]
+
+
+class BatchSensorInput(BaseModel):
+    # one feature vector per row; null entries are treated as missing values
+    rows: List[List[Optional[float]]]
+
+
+class StreamReading(BaseModel):
+    # the current raw reading of one device; lags and the Class columns are kept server-side
+    # (see app/lag_features.py). Null or omitted channels are treated as missing values
+    device_id: str
+    Ax: Optional[float] = None
+    Ay: Optional[float] = None
+    Az: Optional[float] = None
+    Gx: Optional[float] = None
+    Gy: Optional[float] = None
+    Gz: Optional[float] = None
+    Extensometer: Optional[float] = None
+    Displacement: Optional[float] = None
@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("terraguard.startup")
+
+
+class StartupTracker:
+    """Startup phases, their timings and the readiness flag behind `/ready`."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = round(seconds, 4)
+        logger.info("startup phase %s took %.3fs", name, seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def mark_since_start(self, name: str):
+        self.record(name, time.perf_counter() - self.started_at)
+
+    def run(self, steps: List[Tuple[str, Callable[[], Any]]]):
+        """Run (name, fn) steps in order, timing each one, then flip to ready."""
+        try:
+            for name, fn in steps:
+                with self.phase(name):
+                    fn()
+            self.ready = True
+            self.mark_since_start("total")
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("startup failed")
+
+    def run_in_background(self, steps):
+        self._thread = threading.Thread(target=self.run, args=(steps,), name="startup-loader", daemon=True)
+        self._thread.start()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = dict(self.phases)
+        return {"ready": self.ready, "error": self.error, "phases": phases}
+
+
+startup = StartupTracker()
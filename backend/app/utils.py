@@ -1,5 +1,48 @@
+import math
 import numpy as np
 
 def reshape_input(features: list):
     
     return np.array(features).reshape(1, -1)
+
+
+def stack_rows(rows: list, n_features: int, allow_nan: bool = False):
+    """Stack feature vectors into one (N, n_features) matrix.
+
+    Returns the matrix and a per-row list of error messages (None for valid
+    rows). Invalid rows are left as zeros so the valid ones can still be
+    scored in a single pass.
+    """
+    data = np.zeros((len(rows), n_features), dtype=float)
+    errors = []
+    for i, row in enumerate(rows):
+        if row is None or len(row) != n_features:
+            errors.append(f"expected {n_features} features, got {0 if row is None else len(row)}")
+            continue
+        try:
+            values = np.array([np.nan if v is None else v for v in row], dtype=float)
+        except (TypeError, ValueError) as e:
+            errors.append(f"invalid feature value: {e}")
+            continue
+        if not allow_nan and not np.all(np.isfinite(values)):
+            errors.append("features must be finite numbers")
+            continue
+        if allow_nan and np.any(np.isinf(values)):
+            errors.append("features must not be infinite")
+            continue
+        data[i] = values
+        errors.append(None)
+    return data, errors
+
+
+def sanitize_floats(obj):
+    """Replace NaN/inf floats (not valid JSON) with None, recursively."""
+    if isinstance(obj, dict):
+        return {k: sanitize_floats(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [sanitize_floats(v) for v in obj]
+    if isinstance(obj, float):
+        if math.isnan(obj) or math.isinf(obj):
+            return None
+        return obj
+    return obj
@@ -0,0 +1,360 @@
+import fnmatch
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app import config
+from benchmarks import synthetic
+
+logger = logging.getLogger("terraguard.benchmarks")
+
+# name -> fn(ctx) -> result; registration order is run order
+BENCHMARKS: Dict[str, Callable[["Context"], Dict[str, Any]]] = {}
+
+# statistic compared against a baseline (microseconds per operation, lower is better)
+COMPARE_STAT = "p50_us"
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """Synthetic datasets and scratch space shared by the benchmarks of one run."""
+
+    def __init__(self, rows: int, iterations: int, seed: int = 0, data_dir: Optional[str] = None):
+        self.rows = rows
+        self.iterations = iterations
+        self.seed = seed
+        self.work_dir = tempfile.mkdtemp(prefix="terraguard-bench-")
+        self.paths = synthetic.write(data_dir or os.path.join(self.work_dir, "data"), rows, seed)
+        self.classification = synthetic.classification_frame(rows, seed)
+        self.regression = synthetic.regression_frame(rows, seed)
+        self.rng = np.random.default_rng(seed)
+        self._models: Dict[str, Any] = {}
+
+    def scratch(self, name: str) -> str:
+        return os.path.join(self.work_dir, name)
+
+    def model(self, mode: str):
+        if mode not in self._models:
+            if mode == "classification":
+                from models.classification_model import ClassificationModel
+                self._models[mode] = ClassificationModel()
+            else:
+                from models.regression_model import RegressionModel
+                self._models[mode] = RegressionModel()
+        return self._models[mode]
+
+    def close(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def measure(call: Callable[[int], Any], n: int, warmup: int = 3) -> Dict[str, Any]:
+    """Time `call(i)` for i in range(n) (after `warmup` untimed calls); per-call statistics in microseconds."""
+    for i in range(warmup):
+        call(i)
+    samples = np.empty(n, dtype=np.float64)
+    clock = time.perf_counter
+    for i in range(n):
+        t0 = clock()
+        call(i)
+        samples[i] = clock() - t0
+    samples *= 1e6
+    return summarize(samples)
+
+
+def summarize(samples_us: np.ndarray) -> Dict[str, Any]:
+    p50, p95, p99 = np.percentile(samples_us, [50, 95, 99])
+    mean = float(samples_us.mean())
+    return {
+        "n": int(samples_us.size),
+        "mean_us": round(mean, 3),
+        "p50_us": round(float(p50), 3),
+        "p95_us": round(float(p95), 3),
+        "p99_us": round(float(p99), 3),
+        "min_us": round(float(samples_us.min()), 3),
+        "ops_per_s": round(1e6 / mean, 1) if mean > 0 else None,
+    }
+
+
+# --- inference -------------------------------------------------------
+
+@benchmark("ml_logic.classify")
+def bench_classify(ctx: Context):
+    from app import ml_logic
+    rows = ctx.classification.to_numpy(dtype=float).tolist()
+    return measure(lambda i: ml_logic.classify(rows[i % len(rows)]), ctx.iterations)
+
+
+@benchmark("ml_logic.regress")
+def bench_regress(ctx: Context):
+    from app import ml_logic
+    rows = ctx.regression[["TI", "Ax", "Ay", "Az"]].to_numpy(dtype=float).tolist()
+    return measure(lambda i: ml_logic.regress(rows[i % len(rows)]), ctx.iterations)
+
+
+@benchmark("ClassificationModel.predict")
+def bench_classification_model(ctx: Context):
+    model = ctx.model("classification")
+    rows = ctx.classification[model.feature_order or synthetic.classification_columns()].to_numpy(dtype=float)
+    return measure(lambda i: model.predict(rows[i % len(rows)]), ctx.iterations)
+
+
+@benchmark("RegressionModel.predict")
+def bench_regression_model(ctx: Context):
+    model = ctx.model("regression")
+    # the 5-row window of every column the simulation loop passes
+    matrix = ctx.regression.to_numpy(dtype=float)
+    windows = [matrix[max(0, i - 4):i + 1] for i in range(len(matrix))]
+    return measure(lambda i: model.predict(windows[i % len(windows)]), ctx.iterations)
+
+
+# --- datasets --------------------------------------------------------
+
+@benchmark("DatasetLoader.load")
+def bench_dataset_load(ctx: Context):
+    from simulation.dataset_loader import DatasetLoader
+    feature_order = synthetic.classification_columns()
+    loader = DatasetLoader(use_cache=False)
+    result = measure(lambda i: loader.load(ctx.paths["classification"], feature_order=feature_order),
+                     max(3, ctx.iterations // 50), warmup=1)
+    result["rows"] = ctx.rows
+    return result
+
+
+@benchmark("DatasetLoader.load[cached]")
+def bench_dataset_load_cached(ctx: Context):
+    from simulation.dataset_loader import DatasetLoader
+    feature_order = synthetic.classification_columns()
+    loader = DatasetLoader(cache_dir=ctx.scratch("cache"), use_cache=True)
+    # the warm-up call builds the columnar cache
+    result = measure(lambda i: loader.load(ctx.paths["classification"], feature_order=feature_order),
+                     max(3, ctx.iterations // 50), warmup=1)
+    result["rows"] = ctx.rows
+    return result
+
+
+@benchmark("DatasetLoader.get_row")
+def bench_dataset_get_row(ctx: Context):
+    from simulation.dataset_loader import DatasetLoader
+    loader = DatasetLoader(use_cache=False)
+    loader.load(ctx.paths["classification"], feature_order=synthetic.classification_columns())
+    order = ctx.rng.integers(0, ctx.rows, ctx.iterations + 3)
+    return measure(lambda i: loader.get_row(int(order[i])), ctx.iterations)
+
+
+# --- database --------------------------------------------------------
+
+def _record(ctx: Context, i: int):
+    raw = ctx.classification.iloc[i % ctx.rows].to_dict()
+    output = {"prediction": i % 3, "confidence": 0.9, "displacement_value": raw["Displacement"]}
+    return datetime.utcnow().isoformat(), "classification", raw, output, i % 3, ""
+
+
+def _bench_insert(ctx: Context, name: str, write_behind: bool):
+    from database.db_manager import DBManager
+    db = DBManager(ctx.scratch(name), write_behind=write_behind)
+    records = [_record(ctx, i) for i in range(min(ctx.rows, ctx.iterations + 3))]
+    try:
+        result = measure(lambda i: db.insert_record(*records[i % len(records)]), ctx.iterations)
+        t0 = time.perf_counter()
+        db.flush()
+        result["flush_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    finally:
+        db.close()
+    return result
+
+
+@benchmark("DBManager.insert_record")
+def bench_db_insert(ctx: Context):
+    # as configured (DB_WRITE_BEHIND): with write-behind this is the enqueue cost
+    return _bench_insert(ctx, "insert.db", config.DB_WRITE_BEHIND)
+
+
+@benchmark("DBManager.insert_record[sync]")
+def bench_db_insert_sync(ctx: Context):
+    return _bench_insert(ctx, "insert-sync.db", False)
+
+
+@benchmark("DBManager.fetch_history")
+def bench_db_fetch(ctx: Context):
+    from database.db_manager import DBManager
+    db = DBManager(ctx.scratch("fetch.db"), write_behind=False)
+    try:
+        db.insert_records([_record(ctx, i) for i in range(ctx.rows)])
+        last = ctx.rows
+        result = measure(lambda i: db.fetch_history(limit=100, since_id=(i * 97) % max(1, last - 100)),
+                         ctx.iterations)
+        result["limit"] = 100
+    finally:
+        db.close()
+    return result
+
+
+# --- alerts ----------------------------------------------------------
+
+@benchmark("AlertEngine.evaluate")
+def bench_alerts(ctx: Context):
+    from alerts.alert_engine import AlertEngine
+    engine = AlertEngine()
+    hazard = ctx.classification["Class"].to_numpy(dtype=int)
+    displacement = ctx.classification["Displacement"].to_numpy(dtype=float)
+    outputs = [{"prediction": int(h), "confidence": 0.9, "displacement_value": float(d)}
+               for h, d in zip(hazard, displacement)]
+    prev = [None]
+
+    def evaluate(i):
+        output = outputs[i % len(outputs)]
+        alert = engine.evaluate("2024-01-01T00:00:00", "classification", output, prev[0])
+        prev[0] = engine.chain(output, alert)
+
+    return measure(evaluate, ctx.iterations)
+
+
+# --- end to end ------------------------------------------------------
+
+def _run_simulation(ctx: Context, mode: str, timeout_s: float = 300.0) -> Dict[str, Any]:
+    """Drive one session through the whole synthetic dataset with no throttling; rows per second achieved."""
+    from database.db_manager import DBManager
+    from simulation.dataset_loader import DatasetLoader
+    from simulation.scheduler import SimulationScheduler
+    from simulation.simulation_controller import SimulationController
+    from simulation.state_manager import StateManager
+
+    model = ctx.model(mode)
+    feature_order = getattr(model, "feature_order", None) if mode == "classification" else None
+    dataset = DatasetLoader(use_cache=False)
+    dataset.load(ctx.paths[mode], feature_order=feature_order)
+    db = DBManager(ctx.scratch(f"run-{mode}.db"))
+    state = StateManager()
+    state.update(mode=mode, speed=0.0)
+    ctl = SimulationController(
+        dataset, state, db,
+        classification_model=model if mode == "classification" else None,
+        regression_model=model if mode == "regression" else None,
+        scheduler=SimulationScheduler(), name=f"bench-{mode}",
+    )
+    try:
+        t0 = time.perf_counter()
+        ctl.start()
+        deadline = t0 + timeout_s
+        while state.get()["running"] and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        ctl.stop()
+        elapsed = time.perf_counter() - t0
+        rows = state.get()["current_index"]
+    finally:
+        db.close()
+    per_row = elapsed / rows * 1e6 if rows else float("nan")
+    return {
+        "n": rows,
+        "mean_us": round(per_row, 3),
+        "p50_us": round(per_row, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "elapsed_s": round(elapsed, 3),
+        "stage_ms": ctl.clock.snapshot(0.0)["stage_ms"],
+    }
+
+
+@benchmark("simulation.run[classification]")
+def bench_run_classification(ctx: Context):
+    return _run_simulation(ctx, "classification")
+
+
+@benchmark("simulation.run[regression]")
+def bench_run_regression(ctx: Context):
+    return _run_simulation(ctx, "regression")
+
+
+# --- running and comparing -------------------------------------------
+
+def select(patterns: Optional[List[str]] = None) -> List[str]:
+    """Benchmark names matching any of the glob `patterns` (all of them when empty)."""
+    if not patterns:
+        return list(BENCHMARKS)
+    return [name for name in BENCHMARKS if any(fnmatch.fnmatch(name, p) for p in patterns)]
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "classification_engine": config.CLASSIFICATION_ENGINE,
+        "regression_engine": config.REGRESSION_ENGINE,
+        "compiled_trees": config.COMPILED_TREES,
+        "inference_batching": config.INFERENCE_BATCHING,
+        "db_write_behind": config.DB_WRITE_BEHIND,
+    }
+
+
+def run(names: List[str], rows: int = 2000, iterations: int = 500, seed: int = 0,
+        data_dir: Optional[str] = None, progress: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        ) -> Dict[str, Any]:
+    """Run the named benchmarks; a benchmark that fails is reported with its error instead of a timing."""
+    ctx = Context(rows, iterations, seed, data_dir)
+    results: Dict[str, Any] = {}
+    try:
+        for name in names:
+            try:
+                result = BENCHMARKS[name](ctx)
+            except Exception as e:
+                logger.exception("benchmark %s failed", name)
+                result = {"error": str(e)}
+            results[name] = result
+            if progress is not None:
+                progress(name, result)
+    finally:
+        ctx.close()
+    return {
+        "created": datetime.utcnow().isoformat(),
+        "environment": environment(),
+        "params": {"rows": rows, "iterations": iterations, "seed": seed},
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[Dict[str, Any]]:
+    """Per-benchmark comparison of the median time per operation.
+
+    status is "regression" when slower than the baseline by more than
+    `tolerance` (0.2 = 20%), "improved" when faster by as much, else "ok";
+    "new" / "missing" / "error" when only one side has a timing.
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    cur_results = current.get("results", {})
+    for name in list(cur_results) + [n for n in base_results if n not in cur_results]:
+        base = base_results.get(name, {}).get(COMPARE_STAT)
+        cur = cur_results.get(name, {}).get(COMPARE_STAT)
+        row = {"name": name, "baseline_us": base, "current_us": cur, "ratio": None}
+        if name not in cur_results:
+            row["status"] = "missing"
+        elif cur is None:
+            row["status"] = "error"
+        elif base is None:
+            row["status"] = "new"
+        else:
+            ratio = cur / base if base > 0 else float("inf")
+            row["ratio"] = round(ratio, 3)
+            if ratio > 1.0 + tolerance:
+                row["status"] = "regression"
+            elif ratio < 1.0 - tolerance:
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
@@ -0,0 +1,74 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# sensor channels of the classification dataset, each with _t-1.._t-3 lag columns
+CLASSIFICATION_SENSORS = ("Ax", "Ay", "Az", "Gx", "Gy", "Gz", "Extensometer")
+LAGS = 3
+# regression test file layout: time, tilt index, accelerations, extensometer displacement
+REGRESSION_COLUMNS = ("Time (s)", "TI", "Ax", "Ay", "Az", "D_ext")
+
+
+def lagged(name: str) -> List[str]:
+    return [name] + [f"{name}_t-{k}" for k in range(1, LAGS + 1)]
+
+
+def classification_columns() -> List[str]:
+    """The 33 classification features in model order (models/classification/classification_metadata.json)."""
+    columns = []
+    for sensor in CLASSIFICATION_SENSORS:
+        columns.extend(lagged(sensor))
+    return columns + ["Displacement"] + lagged("Class")
+
+
+def _walk(rng: np.random.Generator, rows: int, scale: float, drift: float = 0.0) -> np.ndarray:
+    return np.cumsum(rng.normal(drift, scale, rows))
+
+
+def _with_lags(frame: Dict[str, np.ndarray], name: str, values: np.ndarray):
+    frame[name] = values
+    for k in range(1, LAGS + 1):
+        # the first rows repeat the first value, like a sensor warming up
+        frame[f"{name}_t-{k}"] = np.concatenate([np.repeat(values[:1], k), values[:-k]])
+
+
+def classification_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Sensor random walks with lags, a creeping displacement and a 0/1/2 hazard class that follows its velocity."""
+    rng = np.random.default_rng(seed)
+    frame: Dict[str, np.ndarray] = {}
+    for sensor in CLASSIFICATION_SENSORS:
+        scale = 0.05 if sensor == "Extensometer" else 0.01
+        _with_lags(frame, sensor, rng.normal(0.0, 1.0) + _walk(rng, rows, scale))
+    displacement = np.maximum(0.0, _walk(rng, rows, 0.2, drift=0.02))
+    frame["Displacement"] = displacement
+    velocity = np.abs(np.diff(displacement, prepend=displacement[:1]))
+    hazard = np.digitize(velocity, np.quantile(velocity, [0.6, 0.9])).astype(float)
+    _with_lags(frame, "Class", hazard)
+    return pd.DataFrame(frame, columns=classification_columns())
+
+
+def regression_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Slowly varying readings around the levels of data/regression_test.xlsx."""
+    rng = np.random.default_rng(seed + 1)
+    return pd.DataFrame({
+        "Time (s)": 288.625 + 0.09 * np.arange(rows),
+        "TI": 0.091 + _walk(rng, rows, 0.0001),
+        "Ax": -0.91 + _walk(rng, rows, 0.0005),
+        "Ay": -0.05 + _walk(rng, rows, 0.0005),
+        "Az": -0.31 + _walk(rng, rows, 0.0005),
+        "D_ext": 47.3 + np.maximum(0.0, _walk(rng, rows, 0.02, drift=0.002)),
+    }, columns=list(REGRESSION_COLUMNS))
+
+
+def write(directory: str, rows: int, seed: int = 0) -> Dict[str, str]:
+    """Write classification.csv and regression.csv to `directory`; returns their paths by mode."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        "classification": os.path.join(directory, "classification.csv"),
+        "regression": os.path.join(directory, "regression.csv"),
+    }
+    classification_frame(rows, seed).to_csv(paths["classification"], index=False)
+    regression_frame(rows, seed).to_csv(paths["regression"], index=False)
+    return paths
@@ -1,17 +1,110 @@
 import sqlite3
 import json
 import threading
-from typing import List, Dict, Any
+import queue
+import time
+import atexit
+import logging
+from typing import List, Dict, Any, Optional
 import os
+from datetime import datetime, timezone
+from database.migrations import migrate, typed_fields
+from app.metrics import metrics
+from app.config import DB_WRITE_BEHIND, DB_BATCH_SIZE, DB_FLUSH_INTERVAL_MS, DB_QUEUE_SIZE, DB_SYNCHRONOUS
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "simulation.db")
 
+logger = logging.getLogger("terraguard.db")
+
+INSERT_SQL = """
+INSERT INTO records (id, timestamp, mode, raw_row, model_output, risk_level, alert_message,
+                     confidence, risk_score, displacement, alert_flag, ts_epoch, session)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+DEFAULT_SESSION = "default"
+
+TYPED_SELECT = "id, session, timestamp, ts_epoch, mode, risk_level, confidence, risk_score, displacement, alert_flag, alert_message"
+
+# backoff between attempts of a queued write while another connection holds the file's write lock
+BUSY_RETRY_S = 0.05
+BUSY_RETRY_MAX_S = 2.0
+
+
+def _busy(exc: sqlite3.OperationalError) -> bool:
+    """SQLITE_BUSY / SQLITE_LOCKED: another connection (or worker process) is writing; retrying can succeed."""
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    message = str(exc)
+    return "locked" in message or "busy" in message
+
+
+def epoch_seconds(timestamp: str) -> Optional[float]:
+    """Epoch seconds for an ISO timestamp; naive values are UTC (datetime.utcnow())."""
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
 class DBManager:
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str = DB_PATH, write_behind: Optional[bool] = None,
+                 batch_size: Optional[int] = None, flush_interval_ms: Optional[float] = None,
+                 queue_size: Optional[int] = None):
         self.db_path = db_path
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.lock = threading.Lock()
+        self._configure()
         self._ensure_tables()
+        # ids are handed out at enqueue time so callers can reference a record before it is written
+        self._id_lock = threading.Lock()
+        self._next_id = self._max_id() + 1
+        # session -> highest id handed out by this process, queued or written (see history_version)
+        self._last_ids: Dict[str, int] = {}
+
+        self.write_behind = DB_WRITE_BEHIND if write_behind is None else write_behind
+        self.batch_size = max(1, int(batch_size or DB_BATCH_SIZE))
+        self.flush_interval = (DB_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms) / 1000.0
+        # entries are (enqueued_at, params); a full queue blocks the producer
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size or DB_QUEUE_SIZE)))
+        self._flush_now = threading.Event()
+        self._closed = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        # updated from the simulation, replay and writer threads
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "failed": 0,
+            "retries": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+            "last_write_ms": 0.0,
+        }
+        if self.write_behind:
+            self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+            self._writer.start()
+            # daemon threads are killed at exit: drain the queue first
+            atexit.register(self.close)
+
+    def _configure(self):
+        with self.lock:
+            c = self.conn.cursor()
+            try:
+                c.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                # e.g. network filesystems without shared memory support
+                pass
+            if DB_SYNCHRONOUS in ("OFF", "NORMAL", "FULL", "EXTRA"):
+                c.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
 
     def _ensure_tables(self):
         with self.lock:
@@ -27,23 +120,285 @@ class DBManager:
                 alert_message TEXT
             )
             """)
+            # per session, bumped by reset() so history cursors/ETags from before a reset never match;
+            # kept in the file so every worker process sharing it agrees
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS record_generations (
+                session TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+            """)
             self.conn.commit()
+            # typed columns + indexes (database/migrations.py); upgrades older files in place
+            migrate(self.conn)
 
-    def insert_record(self, timestamp: str, mode: str, raw_row: dict, model_output: dict, risk_level: int, alert_message: str):
+    def _max_id(self) -> int:
         with self.lock:
             c = self.conn.cursor()
-            c.execute("""
-            INSERT INTO records (timestamp, mode, raw_row, model_output, risk_level, alert_message)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """, (timestamp, mode, json.dumps(raw_row), json.dumps(model_output), risk_level, alert_message))
+            # sqlite_sequence remembers ids of deleted rows, so ids are never reused after a reset
+            c.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'records'), 0),"
+                      " COALESCE((SELECT MAX(id) FROM records), 0))")
+            return int(c.fetchone()[0] or 0)
+
+    def resync_ids(self):
+        """Continue ids after the highest one in the file (another process may have written records)."""
+        self.flush()
+        with self._id_lock:
+            self._next_id = max(self._next_id, self._max_id() + 1)
+
+    def namespace(self, session: str) -> "SessionDB":
+        return SessionDB(self, session)
+
+    def insert_record(self, timestamp: str, mode: str, raw_row: dict, model_output: dict, risk_level: int, alert_message: str,
+                      session: str = DEFAULT_SESSION) -> int:
+        """Store one record and return its id (the row may still be queued for writing)."""
+        # serialize on the caller so later mutation of the dicts can't leak into the row
+        with metrics.stage("db", "serialize"):
+            raw_json, output_json = json.dumps(raw_row), json.dumps(model_output)
+        with self._id_lock:
+            record_id = self._next_id
+            self._next_id += 1
+            self._last_ids[session] = record_id
+        params = (record_id, timestamp, mode, raw_json, output_json, risk_level, alert_message) \
+            + typed_fields(model_output, alert_message) + (epoch_seconds(timestamp), session)
+        metrics.rows("db", mode)
+        if self._writer is None:
+            with metrics.stage("db", "insert"), self.lock:
+                c = self.conn.cursor()
+                c.execute(INSERT_SQL, params)
+                self.conn.commit()
+            return record_id
+        with metrics.stage("db", "enqueue"):
+            self._queue.put((time.perf_counter(), params))
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        if depth >= self.batch_size:
+            self._flush_now.set()
+        return record_id
+
+    def insert_records(self, records: List[tuple], session: str = DEFAULT_SESSION) -> List[int]:
+        """Store many (timestamp, mode, raw_row, model_output, risk_level, alert_message) records in one
+        transaction, after anything still queued; returns their ids."""
+        if not records:
+            return []
+        with self._id_lock:
+            first = self._next_id
+            self._next_id += len(records)
+            self._last_ids[session] = self._next_id - 1
+        params = []
+        for offset, (timestamp, mode, raw_row, model_output, risk_level, alert_message) in enumerate(records):
+            params.append((first + offset, timestamp, mode, json.dumps(raw_row), json.dumps(model_output), risk_level,
+                           alert_message) + typed_fields(model_output, alert_message) + (epoch_seconds(timestamp), session))
+        # keep rows in id order with the write-behind queue
+        self.flush()
+        t0 = time.perf_counter()
+        with self.lock:
+            c = self.conn.cursor()
+            c.executemany(INSERT_SQL, params)
             self.conn.commit()
+        metrics.observe_stage("db", "insert_many", time.perf_counter() - t0)
+        metrics.rows("db", records[0][1], len(params))
+        with self._stats_lock:
+            self._stats["written"] += len(params)
+            self._stats["enqueued"] += len(params)
+            self._stats["batches"] += 1
+            self._stats["last_batch_size"] = len(params)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(params))
+            self._stats["last_write_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        return list(range(first, first + len(params)))
+
+    def _writer_loop(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return
+                continue
+            batch = [first]
+            deadline = time.perf_counter() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._flush_now.is_set() or self._closed.is_set():
+                    break
+                self._flush_now.wait(min(remaining, 0.01))
+            self._flush_now.clear()
+            self._write_batch(batch)
+
+    def _commit_rows(self, rows: List[tuple]):
+        """executemany + commit in one transaction, retried for as long as the file is busy or locked.
+
+        Queued records were acknowledged (their ids returned and published), so
+        a lock held by another connection, e.g. another worker process
+        migrating or writing the same file, only delays them.
+        """
+        delay = BUSY_RETRY_S
+        retries = 0
+        while True:
+            try:
+                with self.lock:
+                    try:
+                        self.conn.cursor().executemany(INSERT_SQL, rows)
+                        self.conn.commit()
+                    except Exception:
+                        try:
+                            self.conn.rollback()
+                        except sqlite3.Error:
+                            pass
+                        raise
+                if retries:
+                    logger.info("wrote %d records after %d retries", len(rows), retries)
+                return
+            except sqlite3.OperationalError as e:
+                if not _busy(e):
+                    raise
+                if not retries:
+                    logger.warning("database busy writing %d records (%s); retrying until it commits", len(rows), e)
+                retries += 1
+                with self._stats_lock:
+                    self._stats["retries"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, BUSY_RETRY_MAX_S)
+
+    def _write_batch(self, batch):
+        t0 = time.perf_counter()
+        rows = [params for _, params in batch]
+        written = failed = 0
+        try:
+            try:
+                # one transaction (and one sync) per batch
+                self._commit_rows(rows)
+                written = len(rows)
+            except Exception:
+                metrics.swallowed("db", "write_batch")
+                logger.exception("failed to write a batch of %d records; writing them one by one", len(rows))
+                # a row that can't be written must not take its peers with it
+                for params in rows:
+                    try:
+                        self._commit_rows([params])
+                        written += 1
+                    except Exception:
+                        metrics.swallowed("db", "write_row")
+                        failed += 1
+                        logger.exception("dropped record %s", params[0])
+            if written:
+                metrics.observe_stage("db", "write_batch", time.perf_counter() - t0)
+            lag_ms = (time.perf_counter() - batch[0][0]) * 1000.0
+            with self._stats_lock:
+                self._stats["written"] += written
+                self._stats["failed"] += failed
+                self._stats["batches"] += 1
+                self._stats["last_batch_size"] = len(batch)
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+                self._stats["last_lag_ms"] = round(lag_ms, 3)
+                self._stats["max_lag_ms"] = round(max(self._stats["max_lag_ms"], lag_ms), 3)
+                self._stats["last_write_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _drain(self):
+        """Write whatever is still queued on the calling thread."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write_batch(batch)
 
-    def fetch_history(self, limit: int = 1000) -> List[Dict[str, Any]]:
+    def flush(self):
+        """Block until every queued record has been committed."""
+        if self._writer is None:
+            return
+        self._flush_now.set()
+        self._queue.join()
+
+    def close(self):
+        """Drain the queue and stop the writer; later inserts are written synchronously."""
+        writer = self._writer
+        if writer is None:
+            return
+        # the writer empties the queue before it exits
+        self._closed.set()
+        self._flush_now.set()
+        while True:
+            writer.join(timeout=5)
+            if not writer.is_alive():
+                break
+            # e.g. waiting out another connection's lock: its records are acknowledged, so keep waiting
+            logger.warning("db writer still busy on shutdown, %d records queued", self._queue.qsize())
+        self._writer = None
+        # records queued by producers racing the shutdown
+        self._drain()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["write_behind"] = self._writer is not None
+        s["queue_depth"] = self._queue.qsize()
+        s["pending"] = s["enqueued"] - s["written"] - s["failed"] if self._writer is not None else 0
+        try:
+            oldest = self._queue.queue[0][0]
+            s["oldest_pending_ms"] = round((time.perf_counter() - oldest) * 1000.0, 3)
+        except IndexError:
+            s["oldest_pending_ms"] = 0.0
+        s["batch_size"] = self.batch_size
+        s["flush_interval_ms"] = self.flush_interval * 1000.0
+        return s
+
+    def history_version(self, session: str = DEFAULT_SESSION):
+        """(generation, last id) of a session: changes whenever its visible history changes.
+
+        Ids are assigned at enqueue, so records still queued by the write-behind
+        writer already count without draining it; a poll that ends in a 304 never
+        waits on a write. The committed MAX(id) covers records written by other
+        processes sharing the file.
+        """
+        with self._id_lock:
+            enqueued = self._last_ids.get(session, 0)
         with self.lock:
             c = self.conn.cursor()
-            c.execute("SELECT id, timestamp, mode, raw_row, model_output, risk_level, alert_message FROM records ORDER BY id ASC LIMIT ?", (limit,))
+            c.execute("SELECT (SELECT generation FROM record_generations WHERE session = ?),"
+                      " (SELECT MAX(id) FROM records WHERE session = ?)", (session, session))
+            generation, last_id = c.fetchone()
+        return generation or 0, max(last_id or 0, enqueued)
+
+    def fetch_history(self, limit: int = 1000, since_id: Optional[int] = None, before_id: Optional[int] = None,
+                      latest: bool = False, session: str = DEFAULT_SESSION) -> List[Dict[str, Any]]:
+        """Records of a session in ascending id order, optionally only ids in (since_id, before_id).
+
+        `latest` returns the last `limit` matching rows instead of the first.
+        """
+        # read-your-writes: rows still queued would otherwise be missing
+        self.flush()
+        where, params = ["session = ?"], [session]
+        if since_id is not None:
+            where.append("id > ?")
+            params.append(since_id)
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        sql = "SELECT id, timestamp, mode, raw_row, model_output, risk_level, alert_message FROM records"
+        sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY id {'DESC' if latest else 'ASC'} LIMIT ?"
+        params.append(limit)
+        with metrics.stage("db", "fetch_query"), self.lock:
+            c = self.conn.cursor()
+            c.execute(sql, params)
             rows = c.fetchall()
-            res = []
+        if latest:
+            rows.reverse()
+        res = []
+        with metrics.stage("db", "fetch_decode"):
             for r in rows:
                 res.append({
                     "id": r[0],
@@ -54,11 +409,112 @@ class DBManager:
                     "risk_level": r[5],
                     "alert_message": r[6]
                 })
-            return res
+        return res
 
-    def reset(self):
+    def fetch_series_rows(self, after_id: int, columns: List[str], session: str = DEFAULT_SESSION) -> List[tuple]:
+        """(id, ts_epoch, *columns) for every record of a session with id > after_id, in id order."""
+        self.flush()
+        with self.lock:
+            c = self.conn.cursor()
+            c.execute(f"SELECT id, ts_epoch, {', '.join(columns)} FROM records WHERE session = ? AND id > ? ORDER BY id",
+                      (session, after_id))
+            return c.fetchall()
+
+    def query_records(self, start_ts: Optional[float] = None, end_ts: Optional[float] = None,
+                      mode: Optional[str] = None, min_risk: Optional[int] = None, max_risk: Optional[int] = None,
+                      alerts_only: bool = False, limit: int = 1000, latest: bool = False,
+                      include_payload: bool = False, session: Optional[str] = DEFAULT_SESSION) -> List[Dict[str, Any]]:
+        """Filter records on the typed, indexed columns; the JSON blobs are only read with `include_payload`.
+
+        `session=None` searches every session.
+        """
+        self.flush()
+        where, params = [], []
+        if session is not None:
+            where.append("session = ?")
+            params.append(session)
+        if start_ts is not None:
+            where.append("ts_epoch >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            where.append("ts_epoch < ?")
+            params.append(end_ts)
+        if mode is not None:
+            where.append("mode = ?")
+            params.append(mode)
+        if min_risk is not None:
+            where.append("risk_level >= ?")
+            params.append(min_risk)
+        if max_risk is not None:
+            where.append("risk_level <= ?")
+            params.append(max_risk)
+        if alerts_only:
+            where.append("alert_flag = 1")
+        sql = f"SELECT {TYPED_SELECT}{', raw_row, model_output' if include_payload else ''} FROM records"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY id {'DESC' if latest else 'ASC'} LIMIT ?"
+        params.append(limit)
+        with metrics.stage("db", "query"), self.lock:
+            c = self.conn.cursor()
+            c.execute(sql, params)
+            names = [d[0] for d in c.description]
+            rows = c.fetchall()
+        if latest:
+            rows.reverse()
+        res = []
+        for r in rows:
+            item = dict(zip(names, r))
+            item["alert_flag"] = bool(item["alert_flag"])
+            if include_payload:
+                item["raw_row"] = json.loads(item["raw_row"]) if item["raw_row"] else {}
+                item["model_output"] = json.loads(item["model_output"]) if item["model_output"] else {}
+            res.append(item)
+        return res
+
+    def reset(self, session: str = DEFAULT_SESSION):
+        # queued rows belong to the run being reset: write them out, then clear the session
+        self.flush()
+        with self._id_lock:
+            self._last_ids.pop(session, None)
         with self.lock:
             c = self.conn.cursor()
-            c.execute("DELETE FROM records")
+            c.execute("DELETE FROM records WHERE session = ?", (session,))
+            c.execute("INSERT INTO record_generations (session, generation) VALUES (?, 1)"
+                      " ON CONFLICT(session) DO UPDATE SET generation = generation + 1", (session,))
             self.conn.commit()
- 
\ No newline at end of file
+
+
+class SessionDB:
+    """DBManager view bound to one simulation session's records."""
+
+    def __init__(self, db: DBManager, session: str):
+        self.db = db
+        self.session = session
+
+    def insert_record(self, timestamp, mode, raw_row, model_output, risk_level, alert_message) -> int:
+        return self.db.insert_record(timestamp, mode, raw_row, model_output, risk_level, alert_message, session=self.session)
+
+    def insert_records(self, records: List[tuple]) -> List[int]:
+        return self.db.insert_records(records, session=self.session)
+
+    def history_version(self):
+        return self.db.history_version(session=self.session)
+
+    def fetch_history(self, **kwargs) -> List[Dict[str, Any]]:
+        return self.db.fetch_history(session=self.session, **kwargs)
+
+    def fetch_series_rows(self, after_id: int, columns: List[str]) -> List[tuple]:
+        return self.db.fetch_series_rows(after_id, columns, session=self.session)
+
+    def query_records(self, **kwargs) -> List[Dict[str, Any]]:
+        return self.db.query_records(session=self.session, **kwargs)
+
+    def flush(self):
+        self.db.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.db.stats()
+
+    def reset(self):
+        self.db.reset(session=self.session)
@@ -0,0 +1,112 @@
+import json
+import logging
+import math
+import sqlite3
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("terraguard.db")
+
+# columns promoted out of the JSON blobs (schema version 2); risk_level already holds the hazard level
+TYPED_COLUMNS = [
+    ("confidence", "REAL"),
+    ("risk_score", "REAL"),
+    ("displacement", "REAL"),
+    ("alert_flag", "INTEGER NOT NULL DEFAULT 0"),
+    ("ts_epoch", "REAL"),
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_records_ts ON records (ts_epoch)",
+    "CREATE INDEX IF NOT EXISTS idx_records_mode_ts ON records (mode, ts_epoch)",
+    "CREATE INDEX IF NOT EXISTS idx_records_risk_ts ON records (risk_level, ts_epoch)",
+    "CREATE INDEX IF NOT EXISTS idx_records_alert_ts ON records (ts_epoch) WHERE alert_flag = 1",
+]
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def typed_fields(model_output: Dict[str, Any], alert_message: str) -> tuple:
+    """(confidence, risk_score, displacement, alert_flag) for one record."""
+    return (
+        _number(model_output.get("confidence")),
+        _number(model_output.get("risk_score")),
+        _number(model_output.get("displacement_value")),
+        1 if alert_message else 0,
+    )
+
+
+def _columns(c) -> set:
+    c.execute("PRAGMA table_info(records)")
+    return {row[1] for row in c.fetchall()}
+
+
+def _to_v2(c):
+    existing = _columns(c)
+    for name, decl in TYPED_COLUMNS:
+        if name not in existing:
+            c.execute(f"ALTER TABLE records ADD COLUMN {name} {decl}")
+
+    # backfill in SQL; timestamps are naive UTC ISO strings from datetime.utcnow()
+    c.execute("""
+    UPDATE records SET
+        confidence = CASE WHEN json_valid(model_output) THEN json_extract(model_output, '$.confidence') END,
+        risk_score = CASE WHEN json_valid(model_output) THEN json_extract(model_output, '$.risk_score') END,
+        displacement = CASE WHEN json_valid(model_output) THEN json_extract(model_output, '$.displacement_value') END,
+        alert_flag = CASE WHEN alert_message IS NOT NULL AND alert_message <> '' THEN 1 ELSE 0 END,
+        ts_epoch = (julianday(timestamp) - 2440587.5) * 86400.0
+    """)
+
+    # json.dumps writes NaN/Infinity, which SQLite's JSON functions reject: decode those rows in Python
+    c.execute("SELECT id, model_output, alert_message FROM records WHERE model_output IS NOT NULL AND NOT json_valid(model_output)")
+    fixes = []
+    for record_id, output, alert_message in c.fetchall():
+        try:
+            parsed = json.loads(output)
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            fixes.append(typed_fields(parsed, alert_message) + (record_id,))
+    if fixes:
+        c.executemany("UPDATE records SET confidence = ?, risk_score = ?, displacement = ?, alert_flag = ? WHERE id = ?", fixes)
+
+    for sql in INDEXES:
+        c.execute(sql)
+
+
+def _to_v3(c):
+    # simulation sessions: every record belongs to one named session ("default" for older rows)
+    if "session" not in _columns(c):
+        c.execute("ALTER TABLE records ADD COLUMN session TEXT NOT NULL DEFAULT 'default'")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_session ON records (session, id)")
+
+
+# user_version -> step that upgrades the schema to the next version
+MIGRATIONS = {
+    1: _to_v2,
+    2: _to_v3,
+}
+SCHEMA_VERSION = 3
+
+
+def migrate(conn: sqlite3.Connection):
+    """Bring the records table up to SCHEMA_VERSION in place, one transaction per step."""
+    c = conn.cursor()
+    c.execute("PRAGMA user_version")
+    version = c.fetchone()[0] or 1
+    while version < SCHEMA_VERSION:
+        step = MIGRATIONS[version]
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            step(c)
+            c.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info("migrated records schema to version %d", version + 1)
+        version += 1
@@ -0,0 +1,236 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# series name -> typed column in `records`
+SERIES_COLUMNS = {
+    "displacement": "displacement",
+    "risk_score": "risk_score",
+    "hazard": "risk_level",
+}
+FANOUT = 8
+
+
+class _Growable:
+    """Append-only numpy buffer with amortized O(1) appends."""
+
+    def __init__(self, dtype):
+        self._data = np.empty(1024, dtype=dtype)
+        self.n = 0
+
+    def extend(self, values: np.ndarray):
+        need = self.n + len(values)
+        if need > len(self._data):
+            grown = np.empty(max(need, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self.n] = self._data[:self.n]
+            self._data = grown
+        self._data[self.n:need] = values
+        self.n = need
+
+    def view(self) -> np.ndarray:
+        return self._data[:self.n]
+
+
+def _bucket_extremes(values: np.ndarray, idx: np.ndarray, width: int):
+    """Index of the min and max value in each run of `width` candidates (NaN ignored when possible)."""
+    v = values[idx].reshape(-1, width)
+    idx = idx.reshape(-1, width)
+    nan = np.isnan(v)
+    rows = np.arange(len(v))
+    lo = np.where(nan, np.inf, v).argmin(axis=1)
+    hi = np.where(nan, -np.inf, v).argmax(axis=1)
+    return idx[rows, lo], idx[rows, hi]
+
+
+class _Level:
+    """Complete buckets of FANOUT**k base points, each reduced to its min and max point per series."""
+
+    def __init__(self, size: int, names: List[str]):
+        self.size = size
+        self.buckets = 0
+        self.min_idx = {name: _Growable(np.int64) for name in names}
+        self.max_idx = {name: _Growable(np.int64) for name in names}
+
+
+class SeriesCache:
+    """Downsampled chart series over the records table.
+
+    Keeps the typed series columns in memory plus a pyramid of min/max
+    levels (bucket sizes 8, 64, 512, ...). New records are pulled in by id
+    and only the new buckets of each level are computed, so a query costs
+    roughly O(points) + O(range / bucket size) no matter how long the run is.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.names = list(SERIES_COLUMNS)
+        self._lock = threading.Lock()
+        self._clear(None)
+
+    def _clear(self, generation):
+        self.generation = generation
+        self.last_id = 0
+        self.ids = _Growable(np.int64)
+        self.ts = _Growable(np.float64)
+        self.values = {name: _Growable(np.float64) for name in self.names}
+        self.levels: List[_Level] = []
+
+    def refresh(self):
+        generation, last_id = self.db.history_version()
+        with self._lock:
+            if generation != self.generation:
+                self._clear(generation)
+            if last_id <= self.last_id:
+                return
+            rows = self.db.fetch_series_rows(self.last_id, [SERIES_COLUMNS[n] for n in self.names])
+            if not rows:
+                return
+            data = np.array(rows, dtype=np.float64)  # None -> nan
+            self.ids.extend(data[:, 0].astype(np.int64))
+            self.ts.extend(data[:, 1])
+            for j, name in enumerate(self.names):
+                self.values[name].extend(data[:, 2 + j])
+            self.last_id = int(data[-1, 0])
+            self._extend_levels()
+
+    def _extend_levels(self):
+        count = self.ids.n
+        size = FANOUT
+        k = 0
+        while size <= count:
+            if k == len(self.levels):
+                self.levels.append(_Level(size, self.names))
+            level = self.levels[k]
+            complete = count // size
+            if complete > level.buckets:
+                for name in self.names:
+                    values = self.values[name].view()
+                    if k == 0:
+                        start = level.buckets * size
+                        idx = np.arange(start, complete * size, dtype=np.int64)
+                        lo, hi = _bucket_extremes(values, idx, FANOUT)
+                    else:
+                        # each bucket's extremes are among its children's extremes
+                        child = self.levels[k - 1]
+                        a, b = level.buckets * FANOUT, complete * FANOUT
+                        lo, _ = _bucket_extremes(values, child.min_idx[name].view()[a:b], FANOUT)
+                        _, hi = _bucket_extremes(values, child.max_idx[name].view()[a:b], FANOUT)
+                    level.min_idx[name].extend(lo)
+                    level.max_idx[name].extend(hi)
+                level.buckets = complete
+            size *= FANOUT
+            k += 1
+
+    def _candidates(self, name: str, i0: int, i1: int, points: int) -> np.ndarray:
+        """Base indices in [i0, i1) that contain every bucket extreme at the finest useful resolution."""
+        n = i1 - i0
+        level = None
+        for lv in self.levels:
+            # keep ~4 candidates per output point
+            if lv.size * points * 2 <= n:
+                level = lv
+        if level is None:
+            return np.arange(i0, i1, dtype=np.int64)
+        s = level.size
+        b0 = -(-i0 // s)
+        b1 = min(i1 // s, level.buckets)
+        if b1 <= b0:
+            return np.arange(i0, i1, dtype=np.int64)
+        parts = [
+            np.arange(i0, b0 * s, dtype=np.int64),
+            level.min_idx[name].view()[b0:b1],
+            level.max_idx[name].view()[b0:b1],
+            np.arange(b1 * s, i1, dtype=np.int64),
+        ]
+        return np.unique(np.concatenate(parts))
+
+    @staticmethod
+    def _minmax(idx: np.ndarray, values: np.ndarray, i0: int, i1: int, points: int) -> np.ndarray:
+        groups = max(1, points // 2)
+        edges = np.linspace(i0, i1, groups + 1)
+        grp = np.searchsorted(edges, idx, side="right") - 1
+        v = values[idx]
+        order = np.lexsort((v, grp))
+        g_sorted = grp[order]
+        first = np.unique(g_sorted, return_index=True)[1]
+        last = np.r_[first[1:] - 1, len(order) - 1]
+        return np.unique(np.concatenate([idx[order[first]], idx[order[last]]]))
+
+    @staticmethod
+    def _lttb(idx: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+        n = len(idx)
+        if points >= n or points < 3:
+            return idx
+        x = idx.astype(np.float64)
+        # gaps (NaN) must not poison the triangle areas
+        y = np.nan_to_num(values[idx])
+        out = [0]
+        edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+        a = 0
+        for b in range(points - 2):
+            lo, hi = edges[b], edges[b + 1]
+            nlo, nhi = edges[b + 1], (edges[b + 2] if b + 2 < len(edges) else n)
+            avg_x = x[nlo:nhi].mean() if nhi > nlo else x[-1]
+            avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+            area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+            a = lo + int(area.argmax()) if hi > lo else lo
+            out.append(a)
+        out.append(n - 1)
+        return idx[np.unique(np.array(out, dtype=np.int64))]
+
+    def series(self, names: Optional[List[str]] = None, points: int = 500, method: str = "lttb",
+               start_id: Optional[int] = None, end_id: Optional[int] = None,
+               start_ts: Optional[float] = None, end_ts: Optional[float] = None) -> Dict[str, Any]:
+        """Downsample records with id in [start_id, end_id) and ts in [start_ts, end_ts) to ~`points` per series."""
+        names = names or self.names
+        unknown = [n for n in names if n not in SERIES_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown series: {', '.join(unknown)} (expected {', '.join(self.names)})")
+        if method not in ("lttb", "minmax"):
+            raise ValueError("method must be 'lttb' or 'minmax'")
+        points = max(3, int(points))
+        self.refresh()
+        with self._lock:
+            ids, ts = self.ids.view(), self.ts.view()
+            i0, i1 = 0, len(ids)
+            if start_id is not None:
+                i0 = max(i0, int(np.searchsorted(ids, start_id, side="left")))
+            if end_id is not None:
+                i1 = min(i1, int(np.searchsorted(ids, end_id, side="left")))
+            if start_ts is not None or end_ts is not None:
+                # ts is monotonic within a run; fall back to a mask scan if it isn't
+                window = ts[i0:i1]
+                if len(window) and np.all(np.diff(window) >= 0):
+                    if start_ts is not None:
+                        i0 += int(np.searchsorted(window, start_ts, side="left"))
+                    if end_ts is not None:
+                        i1 = i0 + int(np.searchsorted(ts[i0:i1], end_ts, side="left"))
+                else:
+                    keep = np.ones(len(window), dtype=bool)
+                    if start_ts is not None:
+                        keep &= window >= start_ts
+                    if end_ts is not None:
+                        keep &= window < end_ts
+                    hits = np.flatnonzero(keep)
+                    i0, i1 = (i0 + int(hits[0]), i0 + int(hits[-1]) + 1) if len(hits) else (i0, i0)
+            i1 = max(i0, i1)
+            result = {"generation": self.generation, "last_id": self.last_id, "count": i1 - i0,
+                      "method": method, "series": {}}
+            for name in names:
+                values = self.values[name].view()
+                if i1 - i0 <= points:
+                    idx = np.arange(i0, i1, dtype=np.int64)
+                else:
+                    idx = self._candidates(name, i0, i1, points)
+                    if method == "minmax":
+                        idx = self._minmax(idx, values, i0, i1, points)
+                    else:
+                        idx = self._lttb(idx, values, points)
+                v = values[idx]
+                result["series"][name] = {
+                    "id": ids[idx].tolist(),
+                    "ts": [None if np.isnan(t) else t for t in ts[idx].tolist()],
+                    "value": [None if np.isnan(x) else x for x in v.tolist()],
+                }
+            return result
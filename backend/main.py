@@ -1,14 +1,58 @@
+from app.startup import startup
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from routes import simulation_routes
 from routes.simulation_routes import router as sim_router
+from routes.model_routes import router as model_router
+from routes.session_routes import router as session_router
 import uvicorn
 
-from app.schemas import SensorInput
-from app.ml_logic import classify, regress
+from app import ml_logic
+from app.metrics import metrics, MetricsMiddleware, CONTENT_TYPE
+from app.config import STARTUP_MODE
+from app.schemas import SensorInput, BatchSensorInput, StreamReading
+from app.ml_logic import (
+    classify, regress, classify_batch, regress_batch, classify_stream, batching_stats, inference_pool, feature_streams
+)
+from app.admission import Overloaded
+
+logging.basicConfig(level=logging.INFO)
+startup.mark_since_start("imports")
+
+STARTUP_STEPS = [
+    ("load_inference_models", ml_logic.load_models),
+    ("load_simulation_models", simulation_routes.load_models),
+    ("warm_up_inference", ml_logic.warm_up),
+    ("warm_up_simulation", simulation_routes.warm_up),
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_MODE == "eager":
+        startup.run(STARTUP_STEPS)
+    elif STARTUP_MODE == "background":
+        # bind the port right away; /ready flips once models are loaded and warm
+        startup.run_in_background(STARTUP_STEPS)
+    else:
+        startup.ready = True
+    # with a shared state backend: compete for the leader lease
+    simulation_routes.coordinator.start()
+    yield
+    # hand the simulations over to another worker right away
+    simulation_routes.coordinator.stop()
+    inference_pool.shutdown()
+    # commit any records still queued by the write-behind writer
+    simulation_routes.db.close()
+
 
 app = FastAPI(
     title="TerraGuard Simulation & AI Backend",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for frontend
@@ -22,22 +66,69 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # read by the dashboard's incremental history polling
+    expose_headers=["ETag", "X-History-Generation"],
 )
 
+# request timings for /metrics (route, status); not installed when metrics are disabled
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # Include simulation routes  
 app.include_router(sim_router)
+app.include_router(model_router)
+app.include_router(session_router)
 
 @app.get("/")
 def health_check():
     return {"message": "TerraGuard Backend Running"}
 
+@app.get("/ready")
+def readiness():
+    status = startup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.exception_handler(Overloaded)
+def overloaded(request, exc: Overloaded):
+    return JSONResponse({"status": "error", "message": exc.detail}, status_code=exc.status_code,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+# inference runs on ml_logic's bounded pool, not the shared threadpool; overload fails fast (see app/admission.py)
 @app.post("/predict/classification")
-def predict_classification(data: SensorInput):
-    return classify(data.features)
+async def predict_classification(data: SensorInput):
+    return await inference_pool.run(classify, data.features)
 
 @app.post("/predict/regression")
-def predict_regression(data: SensorInput):
-    return regress(data.features)
+async def predict_regression(data: SensorInput):
+    return await inference_pool.run(regress, data.features)
+
+@app.post("/predict/classification/batch")
+async def predict_classification_batch(data: BatchSensorInput):
+    return await inference_pool.run(classify_batch, data.rows)
+
+@app.post("/predict/regression/batch")
+async def predict_regression_batch(data: BatchSensorInput):
+    return await inference_pool.run(regress_batch, data.rows)
+
+# live sensors: one raw reading per call, lag features built from the device's history
+@app.post("/predict/classification/stream")
+async def predict_classification_stream(data: StreamReading):
+    reading = data.model_dump(exclude={"device_id"})
+    return await inference_pool.run(classify_stream, data.device_id, reading)
+
+@app.delete("/predict/classification/stream/{device_id}")
+def reset_classification_stream(device_id: str):
+    return {"status": "success", "device_id": device_id, "reset": feature_streams.reset(device_id)}
+
+@app.get("/predict/stats")
+def predict_stats():
+    return batching_stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    if not metrics.enabled:
+        return JSONResponse({"detail": "Metrics are disabled (METRICS_ENABLED=0)"}, status_code=404)
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,14 @@
 import os
 import numpy as np
 from .model_loader import try_load
+from .registry import registry
+from . import preprocessing
+from app.config import CLASSIFICATION_ENGINE, FUSED_PREPROCESSING
+from app.metrics import metrics, HEURISTIC_TOTAL
 
 
 class ClassificationModel:
-    def __init__(self, model_path=None, scaler_path=None):
+    def __init__(self, model_path=None, scaler_path=None, engine=None, preload=True, imputer_path=None):
         # If explicit paths not provided, attempt to load from repo-level models/classification
         if not model_path:
             repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -19,14 +23,76 @@ class ClassificationModel:
                     scaler_name = meta.get("scaler") or meta.get("scaler_path")
                     if scaler_name:
                         scaler_path = os.path.join(default_dir, scaler_name) if not os.path.isabs(scaler_name) else scaler_name
+                    imputer_name = meta.get("imputer") or meta.get("imputer_path")
+                    if imputer_name and not imputer_path:
+                        imputer_path = os.path.join(default_dir, imputer_name) if not os.path.isabs(imputer_name) else imputer_name
                     self.feature_order = meta.get("features")
                 else:
                     self.feature_order = None
         else:
             self.feature_order = None
 
-        self.model = try_load(model_path) if model_path else None 
-        self.scaler = try_load(scaler_path) if scaler_path else None
+        # the metadata doesn't name them: use the preprocessing files saved next to the model (as ml_logic does)
+        model_dir = os.path.dirname(model_path) if model_path else None
+        if model_dir and not scaler_path and os.path.exists(os.path.join(model_dir, "classification_scaler.pkl")):
+            scaler_path = os.path.join(model_dir, "classification_scaler.pkl")
+        if model_dir and not imputer_path and os.path.exists(os.path.join(model_dir, "classification_imputer.pkl")):
+            imputer_path = os.path.join(model_dir, "classification_imputer.pkl")
+
+        self.engine = engine or CLASSIFICATION_ENGINE
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.imputer_path = imputer_path
+        self._preprocess_key = f"classification_model:preprocess:{imputer_path}|{scaler_path}|{FUSED_PREPROCESSING}"
+        # predict() re-reads from the shared registry so hot-reloads are picked up;
+        # with preload=False nothing is deserialized until first use
+        if preload:
+            self._artifacts()
+
+    def _artifacts(self):
+        snap = registry.snapshot()
+        model = snap.get(self.model_path, self.engine) if self.model_path else None
+        scaler = snap.get(self.scaler_path) if self.scaler_path else None
+        return model, scaler
+
+    def _preprocess(self):
+        """Imputer + scaler stage (models/preprocessing.py), rebuilt with the artifacts on hot-reload."""
+        return registry.derive(self._preprocess_key, lambda snap: preprocessing.build(
+            snap.get(self.imputer_path) if self.imputer_path else None,
+            snap.get(self.scaler_path) if self.scaler_path else None,
+            FUSED_PREPROCESSING,
+        ))
+
+    def _prepare(self, x: np.ndarray) -> np.ndarray:
+        """(N, n_features) raw rows -> model-ready rows: imputed and scaled, or NaN -> 0 without an imputer."""
+        pre = self._preprocess()
+        if pre is None or self.imputer_path is None:
+            # Replace NaN with 0
+            x = np.nan_to_num(x, nan=0.0)
+        if pre is not None:
+            try:
+                with metrics.stage("classification_model", "preprocess"):
+                    x = pre.transform(x)
+            except Exception:
+                metrics.swallowed("classification_model", "preprocess")
+                x = np.nan_to_num(x, nan=0.0)
+        return x
+
+    @staticmethod
+    def _model_input(model, x: np.ndarray) -> np.ndarray:
+        # recurrent models take (samples, timesteps, features): one timestep per row
+        shape = getattr(model, "input_shape", None)
+        if isinstance(shape, tuple) and len(shape) == 3:
+            return x.reshape(x.shape[0], 1, x.shape[1])
+        return x
+
+    @property
+    def model(self):
+        return self._artifacts()[0]
+
+    @property
+    def scaler(self):
+        return self._artifacts()[1]
 
     def predict(self, features):
         # features can be list/array (ordered) or dict (named)
@@ -40,18 +106,14 @@ class ClassificationModel:
         else:
             x = np.asarray(features).reshape(1, -1)
 
-        # Replace NaN with 0
-        x = np.nan_to_num(x, nan=0.0)
+        metrics.rows("classification_model", "classification")
+        x = self._prepare(np.asarray(x, dtype=float))
 
-        if self.scaler:
+        model = self._artifacts()[0]
+        if model:
             try:
-                x = self.scaler.transform(x)
-            except Exception:
-                pass
-
-        if self.model:
-            try:
-                probs = self.model.predict(x)
+                with metrics.stage("classification_model", "model"):
+                    probs = model.predict(self._model_input(model, x), verbose=0)
                 if isinstance(probs, (list, tuple)):
                     probs = np.asarray(probs)
                 if hasattr(probs, "ndim") and probs.ndim == 2:
@@ -66,8 +128,51 @@ class ClassificationModel:
                     conf = 0.5
                 return {"prediction": class_idx, "confidence": conf}
             except Exception:
-                pass
+                metrics.swallowed("classification_model", "model")
 
         # fallback deterministic heuristic
+        metrics.inc(HEURISTIC_TOTAL, component="classification_model")
         return {"prediction": int(np.clip(int(x.sum()) % 3, 0, 2)), "confidence": 0.5}
+
+    def predict_batch(self, rows):
+        """predict() for many feature vectors with one model call; same result per row as predict()."""
+        if not rows:
+            return []
+        try:
+            x = np.asarray([np.asarray(r, dtype=float).reshape(-1) for r in rows], dtype=float)
+        except ValueError:
+            # ragged rows can't share one call
+            return [self.predict(r) for r in rows]
+        metrics.rows("classification_model", "classification", len(rows))
+        x = self._prepare(x)
+
+        model = self._artifacts()[0]
+        if model:
+            try:
+                with metrics.stage("classification_model", "model"):
+                    probs = model.predict(self._model_input(model, x), verbose=0)
+                if isinstance(probs, (list, tuple)):
+                    probs = np.asarray(probs)
+                results = []
+                for i in range(len(rows)):
+                    if hasattr(probs, "ndim") and probs.ndim == 2:
+                        class_idx = int(np.argmax(probs[i]))
+                        conf = float(np.max(probs[i]))
+                    else:
+                        class_idx = int(probs[i])
+                        conf = 1.0
+                    if np.isnan(class_idx) or np.isnan(conf):
+                        class_idx = 0
+                        conf = 0.5
+                    results.append({"prediction": class_idx, "confidence": conf})
+                return results
+            except Exception:
+                metrics.swallowed("classification_model", "model")
+
+        # row slices keep the single-row summation order of predict()
+        metrics.inc(HEURISTIC_TOTAL, len(rows), component="classification_model")
+        return [
+            {"prediction": int(np.clip(int(x[i:i + 1].sum()) % 3, 0, 2)), "confidence": 0.5}
+            for i in range(len(rows))
+        ]
  
\ No newline at end of file
@@ -3,17 +3,23 @@ import json
 import joblib
 from typing import Any
 
-try:
-    from keras.models import load_model as keras_load
-except Exception:
-    keras_load = None
+from .numpy_lstm import NumpySequential
 
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "saved_models")
 
 def load_joblib(path: str) -> Any:
     return joblib.load(path)
 
+def _keras_loader():
+    # imported lazily so the numpy engine can serve without TensorFlow
+    try:
+        from keras.models import load_model as keras_load
+    except Exception:
+        keras_load = None
+    return keras_load
+
 def load_keras(path: str) -> Any: 
+    keras_load = _keras_loader()
     if keras_load:
         try:
             # load without compiling to avoid deserializing training-only objects
@@ -30,15 +36,30 @@ def load_json(path: str):
     with open(path, "r") as f:
         return json.load(f)
 
-def try_load(path: str):
-    if not path:
-        return None
-    if not os.path.exists(path):
-        return None
+def load_numpy(path: str) -> Any:
+    return NumpySequential.from_h5(path)
+
+def load_artifact(path: str, engine: str = "keras"):
+    """Deserialize a model artifact without going through the registry cache."""
     if path.endswith(".joblib") or path.endswith(".pkl"):
         return load_joblib(path)
+    if path.endswith(".h5") and engine == "numpy":
+        return load_numpy(path)
     if path.endswith(".h5") or path.endswith(".keras"):
         return load_keras(path)
     if path.endswith(".json"):
         return load_json(path)
     return None
+
+def try_load(path: str, engine: str = "keras"):
+    if not path:
+        return None
+    if not os.path.exists(path):
+        return None
+    if path.endswith(".json"):
+        return load_json(path)
+    if path.endswith((".joblib", ".pkl", ".h5", ".keras")):
+        # shared with app/ml_logic so every artifact is deserialized once per process
+        from .registry import registry
+        return registry.get(path, engine)
+    return None
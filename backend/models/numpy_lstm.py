@@ -0,0 +1,214 @@
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import h5py
+except Exception:
+    h5py = None
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    # Keras 3
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+
+def _hard_sigmoid_keras2(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+def _softmax(x):
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    None: lambda x: x,
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "hard_sigmoid": _hard_sigmoid,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "softmax": _softmax,
+}
+
+
+def _activation(name, keras_major: Optional[int] = 3):
+    if name == "hard_sigmoid":
+        # the definition changed between Keras 2 (0.2x + 0.5) and Keras 3 (x/6 + 0.5)
+        if keras_major is None:
+            raise NotImplementedError("hard_sigmoid in a file without keras_version")
+        return _hard_sigmoid if keras_major >= 3 else _hard_sigmoid_keras2
+    if name not in _ACTIVATIONS:
+        raise NotImplementedError(f"Unsupported activation: {name}")
+    return _ACTIVATIONS[name]
+
+
+def _keras_major(attrs) -> Optional[int]:
+    """Major version of the Keras that saved an .h5 file, None if it isn't recorded."""
+    version = attrs.get("keras_version")
+    if isinstance(version, bytes):
+        version = version.decode()
+    try:
+        return int(str(version).split(".")[0])
+    except ValueError:
+        return None
+
+
+class _LSTMLayer:
+    def __init__(self, config: Dict[str, Any], weights: Dict[str, np.ndarray], keras_major: Optional[int] = 3):
+        self.units = int(config["units"])
+        self.act = _activation(config.get("activation", "tanh"), keras_major)
+        self.rec_act = _activation(config.get("recurrent_activation", "sigmoid"), keras_major)
+        self.return_sequences = bool(config.get("return_sequences", False))
+        if config.get("go_backwards") or config.get("stateful"):
+            raise NotImplementedError("go_backwards/stateful LSTMs are not supported")
+        self.kernel = weights["kernel"]
+        self.recurrent_kernel = weights["recurrent_kernel"]
+        self.bias = weights.get("bias", np.zeros(4 * self.units, dtype=np.float32))
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        n, steps, _ = x.shape
+        u = self.units
+        # input projection for every timestep at once: (n, steps, 4u)
+        z_in = x @ self.kernel + self.bias
+        h = np.zeros((n, u), dtype=np.float32)
+        c = np.zeros((n, u), dtype=np.float32)
+        outputs = []
+        for t in range(steps):
+            z = z_in[:, t, :]
+            if t:
+                # h and c start at zero, so the recurrent term is skipped for the first step
+                z = z + h @ self.recurrent_kernel
+            i = self.rec_act(z[:, :u])
+            f = self.rec_act(z[:, u:2 * u])
+            g = self.act(z[:, 2 * u:3 * u])
+            o = self.rec_act(z[:, 3 * u:])
+            c = i * g if not t else f * c + i * g
+            h = o * self.act(c)
+            if self.return_sequences:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if self.return_sequences else h
+
+
+class _DenseLayer:
+    def __init__(self, config: Dict[str, Any], weights: Dict[str, np.ndarray], keras_major: Optional[int] = 3):
+        self.act = _activation(config.get("activation", "linear"), keras_major)
+        self.kernel = weights["kernel"]
+        self.bias = weights.get("bias")
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        y = x @ self.kernel
+        if self.bias is not None:
+            y = y + self.bias
+        return self.act(y)
+
+
+class _FlattenLayer:
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        return x.reshape(x.shape[0], -1)
+
+
+def _read_layer_weights(weights_group, layer_name: str) -> Dict[str, np.ndarray]:
+    if layer_name not in weights_group:
+        return {}
+    g = weights_group[layer_name]
+    names = [n.decode() if isinstance(n, bytes) else str(n) for n in g.attrs.get("weight_names", [])]
+    out = {}
+    for name in names:
+        # e.g. "sequential_77/lstm_68/lstm_cell/kernel" or legacy "lstm/lstm_cell/kernel:0"
+        key = name.split("/")[-1].split(":")[0]
+        out[key] = np.asarray(g[name], dtype=np.float32)
+    return out
+
+
+class NumpySequential:
+    """Forward pass of a saved Keras Sequential LSTM/Dense model in plain NumPy.
+
+    Weights are read once from the .h5 file, so serving does not need
+    TensorFlow. Only inference is supported; Dropout is a no-op.
+    """
+
+    def __init__(self, layers: List[Any], input_shape: tuple, name: str = "numpy_sequential"):
+        self.layers = layers
+        self.input_shape = input_shape
+        self.name = name
+
+    @classmethod
+    def from_h5(cls, path: str) -> "NumpySequential":
+        if h5py is None:
+            raise RuntimeError("h5py not available")
+        with h5py.File(path, "r") as f:
+            raw = f.attrs["model_config"]
+            config = json.loads(raw.decode() if isinstance(raw, bytes) else raw)
+            if config.get("class_name") != "Sequential":
+                raise NotImplementedError(f"Unsupported model type: {config.get('class_name')}")
+            weights_group = f["model_weights"]
+            keras_major = _keras_major(f.attrs)
+            layer_configs = config["config"]["layers"]
+            input_shape = None
+            layers = []
+            for layer in layer_configs:
+                kind = layer["class_name"]
+                lcfg = layer["config"]
+                if kind == "InputLayer":
+                    input_shape = tuple(lcfg.get("batch_shape") or lcfg.get("batch_input_shape"))
+                    continue
+                if input_shape is None and (lcfg.get("batch_input_shape") or lcfg.get("batch_shape")):
+                    input_shape = tuple(lcfg.get("batch_input_shape") or lcfg.get("batch_shape"))
+                weights = _read_layer_weights(weights_group, lcfg["name"])
+                if kind == "LSTM":
+                    layers.append(_LSTMLayer(lcfg, weights, keras_major))
+                elif kind == "Dense":
+                    layers.append(_DenseLayer(lcfg, weights, keras_major))
+                elif kind == "Flatten":
+                    layers.append(_FlattenLayer())
+                elif kind in ("Dropout", "SpatialDropout1D", "GaussianNoise", "ActivityRegularization"):
+                    continue
+                else:
+                    raise NotImplementedError(f"Unsupported layer: {kind}")
+            if input_shape is None:
+                input_shape = tuple(config["config"].get("build_input_shape") or ())
+        return cls(layers, input_shape, name=config["config"].get("name", "numpy_sequential"))
+
+    def predict(self, x, verbose=0, batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        # mirror Keras: the input rank and feature dimension must match the saved model
+        if self.input_shape and x.ndim != len(self.input_shape):
+            raise ValueError(f"Invalid input shape {x.shape}; expected {self.input_shape}")
+        if self.input_shape and self.input_shape[-1] is not None and x.shape[-1] != self.input_shape[-1]:
+            raise ValueError(f"Invalid input shape {x.shape}; expected {self.input_shape}")
+        for layer in self.layers:
+            x = layer(x)
+        return x
+
+    __call__ = predict
+
+
+def parity_check(path: str, samples: int = 256, timesteps: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """Compare NumpySequential against Keras on random inputs (imports TensorFlow)."""
+    from keras.models import load_model
+
+    engine = NumpySequential.from_h5(path)
+    keras_model = load_model(path, compile=False)
+    shape = list(engine.input_shape)
+    shape[0] = samples
+    if len(shape) == 3 and shape[1] is None:
+        shape[1] = timesteps or 1
+    rng = np.random.default_rng(seed)
+    x = rng.normal(0.0, 2.0, size=shape).astype(np.float32)
+    expected = np.asarray(keras_model.predict(x, verbose=0))
+    actual = engine.predict(x)
+    diff = np.abs(expected - actual)
+    return {
+        "path": path,
+        "samples": samples,
+        "max_abs_diff": float(diff.max()),
+        "max_rel_diff": float((diff / np.maximum(np.abs(expected), 1e-6)).max()),
+        "argmax_agreement": float(np.mean(np.argmax(expected, axis=-1) == np.argmax(actual, axis=-1))),
+    }
@@ -0,0 +1,170 @@
+import logging
+from typing import Any, Optional
+
+import numpy as np
+
+from app.metrics import metrics
+
+logger = logging.getLogger("terraguard.models")
+
+
+class FusedPreprocessor:
+    """A fitted SimpleImputer followed by a fitted StandardScaler / MinMaxScaler as one NumPy pass.
+
+    Missing values (NaN) take the imputer's fill value for their column, then
+    every column gets its scaler's affine map, all on the (N, n_features)
+    batch at once: no per-call estimator validation, feature-name checks or
+    intermediate copies. The arithmetic is the one sklearn does
+    ((x - mean) / scale, or x * scale + min), so results match it exactly.
+    """
+
+    def __init__(self, n_features: int, fill: Optional[np.ndarray], offset: np.ndarray, divide: Optional[np.ndarray],
+                 multiply: Optional[np.ndarray], add: Optional[np.ndarray], name: str):
+        self.n_features = n_features
+        self.fill = fill
+        self.offset = offset
+        self.divide = divide
+        self.multiply = multiply
+        self.add = add
+        self.name = name
+
+    @classmethod
+    def compile(cls, imputer: Any = None, scaler: Any = None) -> "FusedPreprocessor":
+        if imputer is None and scaler is None:
+            raise ValueError("nothing to compile")
+        fill = None
+        n_features = None
+        names = []
+        if imputer is not None:
+            if type(imputer).__name__ != "SimpleImputer":
+                raise ValueError(f"unsupported imputer {type(imputer).__name__}")
+            missing = imputer.missing_values
+            if not (isinstance(missing, float) and np.isnan(missing)):
+                raise ValueError("only NaN missing_values are supported")
+            if getattr(imputer, "add_indicator", False):
+                raise ValueError("add_indicator is not supported")
+            fill = np.asarray(imputer.statistics_, dtype=np.float64)
+            if np.isnan(fill).any() and not getattr(imputer, "keep_empty_features", False):
+                # sklearn drops these columns
+                raise ValueError("imputer drops all-missing columns")
+            fill = np.nan_to_num(fill, nan=0.0)
+            n_features = fill.shape[0]
+            names.append("SimpleImputer")
+
+        offset = divide = multiply = add = None
+        if scaler is not None:
+            kind = type(scaler).__name__
+            if kind == "StandardScaler":
+                if scaler.with_mean:
+                    offset = np.asarray(scaler.mean_, dtype=np.float64)
+                if scaler.with_std:
+                    divide = np.asarray(scaler.scale_, dtype=np.float64)
+            elif kind == "MinMaxScaler":
+                if getattr(scaler, "clip", False):
+                    raise ValueError("MinMaxScaler(clip=True) is not supported")
+                multiply = np.asarray(scaler.scale_, dtype=np.float64)
+                add = np.asarray(scaler.min_, dtype=np.float64)
+            else:
+                raise ValueError(f"unsupported scaler {kind}")
+            scaler_features = int(scaler.n_features_in_)
+            if n_features is not None and scaler_features != n_features:
+                raise ValueError(f"imputer has {n_features} features, scaler {scaler_features}")
+            n_features = scaler_features
+            names.append(kind)
+        return cls(n_features, fill, offset, divide, multiply, add, " + ".join(names))
+
+    def transform(self, x) -> np.ndarray:
+        """The preprocessed float64 copy of `x` (N, n_features)."""
+        x = np.array(x, dtype=np.float64, ndmin=2)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            # same message as the first sklearn stage would give
+            first = self.name.split(" + ")[0]
+            raise ValueError(f"X has {x.shape[-1]} features, but {first} is expecting {self.n_features} features as input.")
+        missing = np.isnan(x)
+        if self.fill is not None:
+            if missing.any():
+                np.copyto(x, self.fill, where=missing)
+        if np.isinf(x).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+        if self.offset is not None:
+            x -= self.offset
+        if self.divide is not None:
+            x /= self.divide
+        if self.multiply is not None:
+            x *= self.multiply
+            x += self.add
+        return x
+
+    def reference(self, imputer: Any, scaler: Any, x: np.ndarray) -> np.ndarray:
+        """What the sklearn objects produce for `x`."""
+        if imputer is not None:
+            x = imputer.transform(x)
+        if scaler is not None:
+            x = scaler.transform(x)
+        return np.asarray(x, dtype=np.float64)
+
+    def probe_inputs(self, n: int = 512, seed: int = 0) -> np.ndarray:
+        """Inputs around the fitted statistics, with some missing values when there is an imputer."""
+        rng = np.random.default_rng(seed)
+        center = self.fill if self.fill is not None else (self.offset if self.offset is not None else np.zeros(self.n_features))
+        spread = self.divide if self.divide is not None else np.ones(self.n_features)
+        x = center + rng.normal(size=(n, self.n_features)) * spread * 3.0
+        if self.fill is not None:
+            x[rng.random(x.shape) < 0.1] = np.nan
+        return x
+
+    def verify(self, imputer: Any, scaler: Any, x: Optional[np.ndarray] = None) -> float:
+        """Max absolute difference from the sklearn objects over `x`; raises ValueError if they differ."""
+        import warnings
+
+        x = self.probe_inputs() if x is None else np.asarray(x, dtype=np.float64)
+        with warnings.catch_warnings():
+            # scalers fitted on a DataFrame warn about the plain array
+            warnings.simplefilter("ignore", UserWarning)
+            expected = self.reference(imputer, scaler, x.copy())
+        ours = self.transform(x)
+        if ours.shape != expected.shape:
+            raise ValueError(f"fused preprocessing shape {ours.shape} != {expected.shape}")
+        diff = np.abs(ours - expected)
+        worst = float(np.nanmax(diff)) if diff.size else 0.0
+        if not np.array_equal(np.isnan(ours), np.isnan(expected)) or worst > 0.0:
+            raise ValueError(f"fused preprocessing diverges from {self.name}: max diff {worst}")
+        return worst
+
+
+class SklearnPreprocessor:
+    """The fitted objects called one after the other; used when they can't be fused."""
+
+    def __init__(self, imputer: Any = None, scaler: Any = None):
+        self.imputer = imputer
+        self.scaler = scaler
+        self.name = " + ".join(type(o).__name__ for o in (imputer, scaler) if o is not None)
+
+    def transform(self, x) -> np.ndarray:
+        x = np.array(x, dtype=np.float64, ndmin=2)
+        if self.imputer is not None:
+            x = self.imputer.transform(x)
+        if self.scaler is not None:
+            x = self.scaler.transform(x)
+        return np.asarray(x, dtype=np.float64)
+
+
+def build(imputer: Any = None, scaler: Any = None, fused: bool = True):
+    """The preprocessing stage for a model: fused when possible, else the sklearn objects; None without either."""
+    if imputer is None and scaler is None:
+        return None
+    return (try_compile(imputer, scaler) if fused else None) or SklearnPreprocessor(imputer, scaler)
+
+
+def try_compile(imputer: Any = None, scaler: Any = None, verify: bool = True) -> Optional[FusedPreprocessor]:
+    """Compile and self-check the fitted objects; None if they can't be reproduced exactly."""
+    try:
+        pre = FusedPreprocessor.compile(imputer, scaler)
+        if verify:
+            pre.verify(imputer, scaler)
+        return pre
+    except Exception:
+        # e.g. a scaler type or imputer option not reproduced above, or an sklearn version whose fitted attributes differ
+        logger.warning("Could not fuse the preprocessing stages; using the sklearn objects", exc_info=True)
+        metrics.swallowed("preprocessing", "compile")
+        return None
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .model_loader import load_artifact
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _key(path: str, engine: str) -> Tuple[str, str]:
+    # the engine only changes how .h5 files are loaded; pickles are shared across engines
+    path = os.path.abspath(path)
+    return path, (engine if path.endswith(".h5") else "-")
+
+
+class ModelSnapshot:
+    """One consistent, immutable view of the loaded artifacts.
+
+    Callers take a snapshot once per request and read every model from it, so
+    a concurrent reload can never hand them a mix of old and new artifacts.
+    Objects derived from the artifacts (compiled trees, wrappers, ...) are
+    cached on the snapshot itself and therefore swap together with it.
+    """
+
+    def __init__(self, registry: "ModelRegistry", version: int, artifacts: Dict[Tuple[str, str], Tuple[str, Any]]):
+        self._registry = registry
+        self.version = version
+        self.artifacts = artifacts
+        self.derived: Dict[str, Any] = {}
+        self._derive_lock = threading.Lock()
+
+    def get(self, path: str, engine: str = "keras"):
+        entry = self.artifacts.get(_key(path, engine))
+        if entry is not None:
+            return entry[1]
+        # first use of this artifact: load it into the live registry
+        return self._registry.get(path, engine)
+
+
+class ModelRegistry:
+    """Process-wide cache of model artifacts keyed by path and content hash.
+
+    `get()` deserializes each artifact once no matter how many components ask
+    for it. `reload()` re-hashes every tracked file, loads only the changed
+    ones off to the side, rebuilds registered derived objects and then swaps
+    the whole snapshot in with a single reference assignment.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded: Dict[Tuple[str, str, str], Any] = {}
+        self._builders: Dict[str, Callable[[ModelSnapshot], Any]] = {}
+        self._snapshot = ModelSnapshot(self, 1, {})
+        self._reload_thread: Optional[threading.Thread] = None
+        self._reload_status: Dict[str, Any] = {"state": "idle", "error": None, "finished_at": None}
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def snapshot(self) -> ModelSnapshot:
+        return self._snapshot
+
+    def _load(self, path: str, engine: str, digest: str):
+        key = (path, engine, digest)
+        if key not in self._loaded:
+            self._loaded[key] = load_artifact(path, engine)
+        return self._loaded[key]
+
+    def get(self, path: str, engine: str = "keras"):
+        if not path or not os.path.exists(path):
+            return None
+        path, engine = _key(path, engine)
+        entry = self._snapshot.artifacts.get((path, engine))
+        if entry is not None:
+            return entry[1]
+        with self._lock:
+            current = self._snapshot
+            entry = current.artifacts.get((path, engine))
+            if entry is not None:
+                return entry[1]
+            digest = file_digest(path)
+            obj = self._load(path, engine, digest)
+            # adding an artifact doesn't change the version: existing entries are untouched
+            artifacts = dict(current.artifacts)
+            artifacts[(path, engine)] = (digest, obj)
+            snap = ModelSnapshot(self, current.version, artifacts)
+            snap.derived = current.derived
+            snap._derive_lock = current._derive_lock
+            self._snapshot = snap
+            return obj
+
+    def derive(self, name: str, build: Callable[[ModelSnapshot], Any], snapshot: Optional[ModelSnapshot] = None):
+        """Build (once per snapshot) an object computed from the artifacts.
+
+        The builder is remembered and re-run against the new artifacts during
+        `reload()`, before the swap.
+        """
+        snap = snapshot or self._snapshot
+        if name in snap.derived:
+            return snap.derived[name]
+        with snap._derive_lock:
+            if name not in snap.derived:
+                self._builders[name] = build
+                snap.derived[name] = build(snap)
+            return snap.derived[name]
+
+    def reload(self) -> Dict[str, Any]:
+        with self._lock:
+            current = self._snapshot
+            artifacts = {}
+            changed = []
+            for (path, engine), (digest, obj) in current.artifacts.items():
+                if not os.path.exists(path):
+                    # keep serving the last good artifact if the file disappeared
+                    artifacts[(path, engine)] = (digest, obj)
+                    continue
+                new_digest = file_digest(path)
+                if new_digest != digest:
+                    changed.append(os.path.basename(path))
+                    obj = self._load(path, engine, new_digest)
+                artifacts[(path, engine)] = (new_digest, obj)
+            if not changed:
+                return {"version": current.version, "changed": []}
+
+            snap = ModelSnapshot(self, current.version + 1, artifacts)
+            for name, build in list(self._builders.items()):
+                snap.derived[name] = build(snap)
+            self._snapshot = snap
+
+            # drop superseded objects so their memory can be released
+            live = {(p, e, d) for (p, e), (d, _) in artifacts.items()}
+            self._loaded = {k: v for k, v in self._loaded.items() if k in live}
+            return {"version": snap.version, "changed": changed}
+
+    def reload_async(self) -> bool:
+        """Start a background reload; returns False if one is already running."""
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_status = {"state": "running", "error": None, "finished_at": None}
+            self._reload_thread = threading.Thread(target=self._reload_worker, name="model-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def _reload_worker(self):
+        try:
+            result = self.reload()
+            self._reload_status = {"state": "idle", "error": None, "finished_at": time.time(), **result}
+        except Exception as e:
+            # the previous snapshot stays active
+            self._reload_status = {"state": "failed", "error": str(e), "finished_at": time.time()}
+
+    def status(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            "version": snap.version,
+            "artifacts": [
+                {"path": path, "engine": engine, "sha256": digest}
+                for (path, engine), (digest, _) in sorted(snap.artifacts.items())
+            ],
+            "derived": sorted(snap.derived),
+            "reload": dict(self._reload_status),
+        }
+
+
+registry = ModelRegistry()
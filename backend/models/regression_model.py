@@ -1,6 +1,10 @@
 import os
 import numpy as np
 from .model_loader import try_load
+from .registry import registry
+from .tree_ensemble import try_compile
+from app.metrics import metrics, HEURISTIC_TOTAL
+from app.config import REGRESSION_ENGINE, COMPILED_TREES
 
 
 def _is_keras_model(m) -> bool:
@@ -8,8 +12,23 @@ def _is_keras_model(m) -> bool:
     return hasattr(m, 'input_shape')
 
 
+class _RegressionArtifacts:
+    """Meta model, base models, scaler and compiled trees from one registry snapshot."""
+
+    def __init__(self, snap, meta_model_path, base_model_paths, scaler_path, engine, compiled_trees):
+        self.meta_model = snap.get(meta_model_path, engine) if meta_model_path else None
+        self.base_models = [
+            model for model in (snap.get(p, engine) for p in (base_model_paths or []))
+            if model is not None
+        ]
+        self.scaler = snap.get(scaler_path) if scaler_path else None
+        # all base models packed into one tree evaluator; None keeps the per-model predict loop
+        self.tree_ensemble = try_compile(self.base_models) if compiled_trees and self.base_models else None
+
+
 class RegressionModel:
-    def __init__(self, meta_model_path=None, base_model_paths=None, scaler_path=None):
+    def __init__(self, meta_model_path=None, base_model_paths=None, scaler_path=None, engine=None,
+                 compiled_trees=None, preload=True):
         # Attempt to locate repo-level regression models if paths not provided
         if not meta_model_path:
             repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -28,30 +47,42 @@ class RegressionModel:
                     if scaler_name and not scaler_path:
                         scaler_path = os.path.join(default_dir, scaler_name) if not os.path.isabs(scaler_name) else scaler_name
 
-        self.meta_model = try_load(meta_model_path) if meta_model_path else None
-        self.base_models = [
-            model for model in (try_load(p) for p in (base_model_paths or []))
-            if model is not None
-        ]
-        self.scaler = try_load(scaler_path) if scaler_path else None
+        self.engine = engine or REGRESSION_ENGINE
+        self.meta_model_path = meta_model_path
+        self.base_model_paths = [p for p in (base_model_paths or []) if p and os.path.exists(p)]
+        self.scaler_path = scaler_path
+        self.compiled_trees = COMPILED_TREES if compiled_trees is None else compiled_trees
+        # artifacts come from the shared registry, so a hot-reload swaps them all at once
+        self._registry_key = "regression_model:" + "|".join(
+            [str(meta_model_path), str(self.base_model_paths), str(scaler_path), self.engine, str(self.compiled_trees)]
+        )
+        if preload:
+            self._artifacts()
 
+    def _artifacts(self) -> _RegressionArtifacts:
+        return registry.derive(self._registry_key, lambda snap: _RegressionArtifacts(
+            snap, self.meta_model_path, self.base_model_paths, self.scaler_path, self.engine, self.compiled_trees
+        ))
 
-    def predict(self, sequence):
-        x = np.asarray(sequence)
-        
-        # Ensure x is at least 2D; if 1D, reshape to (1, -1)
-        if x.ndim == 1:
-            x = x.reshape(1, -1)
-        
-        if self.scaler:
-            try:
-                # scaler may expect 2D
-                x = self.scaler.transform(x)
-            except Exception:
-                pass
+    @property
+    def meta_model(self):
+        return self._artifacts().meta_model
+
+    @property
+    def base_models(self):
+        return self._artifacts().base_models
 
+    @property
+    def scaler(self):
+        return self._artifacts().scaler
+
+    @property
+    def tree_ensemble(self):
+        return self._artifacts().tree_ensemble
+
+    def _predict_base_models(self, x, base_models):
         base_preds = []
-        for m in self.base_models:
+        for m in base_models:
             try:
                 if m is None:
                     continue
@@ -68,6 +99,7 @@ class RegressionModel:
                                 x_reshaped = x.reshape(1, x.shape[0], x.shape[1])
                                 p = m.predict(x_reshaped)
                             except Exception:
+                                metrics.swallowed("regression_model", "base_model")
                                 base_preds.append(0.0)
                                 continue
                         elif len(input_shape) == 2:
@@ -76,6 +108,7 @@ class RegressionModel:
                                 x_reshaped = x.reshape(1, -1)
                                 p = m.predict(x_reshaped)
                             except Exception:
+                                metrics.swallowed("regression_model", "base_model")
                                 base_preds.append(0.0)
                                 continue
                         else:
@@ -90,6 +123,7 @@ class RegressionModel:
                         x_reshaped = x.reshape(1, -1)
                         p = m.predict(x_reshaped)
                     except Exception:
+                        metrics.swallowed("regression_model", "base_model")
                         base_preds.append(0.0)
                         continue
                 
@@ -99,9 +133,39 @@ class RegressionModel:
                 else:
                     base_preds.append(float(p))
             except Exception:
+                metrics.swallowed("regression_model", "base_model")
                 base_preds.append(0.0)
+        return base_preds
+
+    def _prepare(self, sequence, parts):
+        x = np.asarray(sequence)
+        
+        # Ensure x is at least 2D; if 1D, reshape to (1, -1)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        
+        if parts.scaler:
+            try:
+                # scaler may expect 2D
+                with metrics.stage("regression_model", "scale"):
+                    x = parts.scaler.transform(x)
+            except Exception:
+                metrics.swallowed("regression_model", "scale")
+
+        if parts.tree_ensemble is not None:
+            try:
+                with metrics.stage("regression_model", "base_models_compiled"):
+                    base_preds = [float(p) for p in parts.tree_ensemble.predict(x.reshape(1, -1))[0]]
+            except Exception:
+                metrics.swallowed("regression_model", "base_models_compiled")
+                base_preds = [0.0] * len(parts.base_models)
+        else:
+            with metrics.stage("regression_model", "base_models"):
+                base_preds = self._predict_base_models(x, parts.base_models)
+        return x, base_preds
 
-        if self.meta_model and base_preds:
+    def _finish(self, x, base_preds, parts):
+        if parts.meta_model and base_preds:
             try:
                 # Meta-model (LSTM) expects 3D input: (samples, timesteps, features)
                 # Here we have 1 sample, 1 timestep, len(base_preds) features
@@ -110,12 +174,48 @@ class RegressionModel:
                 except Exception:
                     inp = np.asarray(base_preds).reshape(1, -1)
                 
-                risk = float(self.meta_model.predict(inp)[0])
+                with metrics.stage("regression_model", "meta_model"):
+                    risk = float(np.asarray(parts.meta_model.predict(inp, verbose=0)).reshape(-1)[0])
                 return {"risk_score": risk, "base_predictions": base_preds}
             except Exception:
-                pass
+                metrics.swallowed("regression_model", "meta_model")
 
         # fallback
+        metrics.inc(HEURISTIC_TOTAL, component="regression_model")
         risk = float(x.mean()) if x.size else 0.0
         return {"risk_score": risk, "base_predictions": base_preds}
- 
\ No newline at end of file
+
+    def predict(self, sequence):
+        parts = self._artifacts()
+        metrics.rows("regression_model", "regression")
+        x, base_preds = self._prepare(sequence, parts)
+        return self._finish(x, base_preds, parts)
+
+    def predict_batch(self, sequences):
+        """predict() for many windows with a single meta-model call."""
+        parts = self._artifacts()
+        metrics.rows("regression_model", "regression", len(sequences))
+        prepared = [self._prepare(seq, parts) for seq in sequences]
+        results = [None] * len(prepared)
+        if parts.meta_model:
+            by_width = {}
+            for i, (_, base_preds) in enumerate(prepared):
+                if base_preds:
+                    by_width.setdefault(len(base_preds), []).append(i)
+            for width, idxs in by_width.items():
+                inp = np.asarray([prepared[i][1] for i in idxs], dtype=float).reshape(len(idxs), 1, width)
+                try:
+                    with metrics.stage("regression_model", "meta_model_batch"):
+                        out = parts.meta_model.predict(inp, verbose=0)
+                    # (n, 1) risk scores, one row per window
+                    risks = np.asarray(out, dtype=float).reshape(len(idxs), -1)[:, 0]
+                except ValueError:
+                    # the model rejects this input width: leave these to the single-row path below
+                    metrics.swallowed("regression_model", "meta_model_batch")
+                    continue
+                for i, risk in zip(idxs, risks):
+                    results[i] = {"risk_score": float(risk), "base_predictions": prepared[i][1]}
+        for i, (x, base_preds) in enumerate(prepared):
+            if results[i] is None:
+                results[i] = self._finish(x, base_preds, parts)
+        return results
@@ -0,0 +1,240 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.metrics import metrics
+
+logger = logging.getLogger("terraguard.models")
+
+
+def _sklearn_trees(model) -> Dict[str, Any]:
+    """Node arrays for a fitted sklearn DecisionTreeRegressor / RandomForestRegressor."""
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        estimators = [model]
+    trees = []
+    for est in estimators:
+        t = est.tree_
+        if t.n_outputs != 1:
+            raise NotImplementedError("multi-output trees are not supported")
+        leaf = t.children_left == -1
+        missing_left = getattr(t, "missing_go_to_left", None)
+        trees.append({
+            "feature": np.where(leaf, 0, t.feature),
+            # sklearn: go left when float32(x) <= threshold (float64)
+            "threshold": np.where(leaf, np.inf, t.threshold),
+            "left": t.children_left,
+            "right": t.children_right,
+            "value": t.value[:, 0, 0],
+            "missing_left": np.zeros(t.node_count, dtype=bool) if missing_left is None else np.asarray(missing_left, dtype=bool),
+            "depth": int(t.max_depth),
+        })
+    return {"trees": trees, "scale": 1.0 / len(trees), "bias": 0.0}
+
+
+def _xgb_base_score(booster) -> float:
+    cfg = json.loads(booster.save_config())
+    value = str(cfg["learner"]["learner_model_param"]["base_score"])
+    # xgboost >= 3 stores a vector such as "[1.8389046E1]"
+    return float(value.strip("[]").split(",")[0])
+
+
+def _xgb_trees(model) -> Dict[str, Any]:
+    """Node arrays for a fitted XGBRegressor with a squared-error (identity link) objective."""
+    booster = model.get_booster()
+    cfg = json.loads(booster.save_config())
+    objective = cfg["learner"]["objective"]["name"]
+    if objective not in ("reg:squarederror", "reg:linear", "reg:absoluteerror", "reg:pseudohubererror"):
+        raise NotImplementedError(f"unsupported xgboost objective: {objective}")
+    if cfg["learner"]["gradient_booster"]["name"] != "gbtree":
+        raise NotImplementedError("only gbtree boosters are supported")
+
+    raw = json.loads(booster.save_raw("json"))
+    gbtree = raw["learner"]["gradient_booster"]["model"]
+    trees_json = gbtree["trees"]
+    best = getattr(model, "best_iteration", None)
+    if best is not None:
+        # XGBRegressor.predict only uses trees up to the best iteration
+        per_round = int(gbtree["gbtree_model_param"].get("num_parallel_tree", 1))
+        trees_json = trees_json[: (best + 1) * per_round]
+
+    trees = []
+    for tj in trees_json:
+        if any(tj.get("split_type", [])):
+            raise NotImplementedError("categorical splits are not supported")
+        left = np.asarray(tj["left_children"], dtype=np.int64)
+        right = np.asarray(tj["right_children"], dtype=np.int64)
+        cond = np.asarray(tj["split_conditions"], dtype=np.float32)
+        leaf = left == -1
+        # xgboost: go left when float32(x) < split; rewrite as x <= previous float32
+        threshold = np.nextafter(cond, np.float32(-np.inf)).astype(np.float64)
+        trees.append({
+            "feature": np.where(leaf, 0, np.asarray(tj["split_indices"], dtype=np.int64)),
+            "threshold": np.where(leaf, np.inf, threshold),
+            "left": left,
+            "right": right,
+            "value": np.where(leaf, cond.astype(np.float64), 0.0),
+            "missing_left": np.asarray(tj["default_left"], dtype=bool),
+            "depth": _depth(left, right),
+        })
+    return {"trees": trees, "scale": 1.0, "bias": _xgb_base_score(booster)}
+
+
+def _depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max()) if len(depth) else 0
+
+
+def _extract(model) -> Dict[str, Any]:
+    if hasattr(model, "get_booster"):
+        return _xgb_trees(model)
+    if hasattr(model, "tree_") or hasattr(model, "estimators_"):
+        return _sklearn_trees(model)
+    raise NotImplementedError(f"cannot compile {type(model).__name__}")
+
+
+def _sibling_order(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Breadth-first node order in which every right child directly follows its left sibling."""
+    order = [0]
+    for node in order:
+        if left[node] != -1:
+            order.append(int(left[node]))
+            order.append(int(right[node]))
+    return np.asarray(order, dtype=np.int64)
+
+
+class CompiledTreeEnsemble:
+    """Several tree models packed into one set of flat node arrays.
+
+    Nodes are renumbered so the right child of node i is `left[i] + 1`, and
+    leaves point at themselves. `predict(X)` walks every tree of every model
+    over the whole batch at once and returns an (N, n_models) matrix, one
+    column per source model in the order they were compiled.
+    """
+
+    def __init__(self, feature, threshold, left, value, missing_left, roots,
+                 group_starts, group_scale, group_bias, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.group_starts = group_starts
+        self.group_scale = group_scale
+        self.group_bias = group_bias
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    @classmethod
+    def compile(cls, models: List[Any]) -> "CompiledTreeEnsemble":
+        parts = {k: [] for k in ("feature", "threshold", "left", "value", "missing_left")}
+        roots, group_starts, scale, bias = [], [], [], []
+        offset = 0
+        max_depth = 0
+        n_features = None
+        for model in models:
+            extracted = _extract(model)
+            n_in = getattr(model, "n_features_in_", None)
+            if n_in is not None:
+                if n_features is not None and n_in != n_features:
+                    raise ValueError("models disagree on the number of input features")
+                n_features = int(n_in)
+            group_starts.append(len(roots))
+            scale.append(extracted["scale"])
+            bias.append(extracted["bias"])
+            for tree in extracted["trees"]:
+                order = _sibling_order(tree["left"], tree["right"])
+                position = np.empty(len(tree["left"]), dtype=np.int64)
+                position[order] = np.arange(len(order))
+                left = tree["left"][order]
+                leaf = left == -1
+                new_ids = np.arange(offset, offset + len(order))
+                parts["left"].append(np.where(leaf, new_ids, position[np.where(leaf, 0, left)] + offset))
+                parts["feature"].append(tree["feature"][order])
+                parts["threshold"].append(tree["threshold"][order])
+                parts["value"].append(tree["value"][order])
+                # a NaN reaching a leaf must not move it
+                parts["missing_left"].append(tree["missing_left"][order] | leaf)
+                roots.append(offset)
+                offset += len(order)
+                max_depth = max(max_depth, tree["depth"])
+        return cls(
+            feature=np.concatenate(parts["feature"]).astype(np.intp),
+            threshold=np.concatenate(parts["threshold"]).astype(np.float64),
+            left=np.concatenate(parts["left"]).astype(np.intp),
+            value=np.concatenate(parts["value"]).astype(np.float64),
+            missing_left=np.concatenate(parts["missing_left"]),
+            roots=np.asarray(roots, dtype=np.intp),
+            group_starts=np.asarray(group_starts, dtype=np.intp),
+            group_scale=np.asarray(scale, dtype=np.float64),
+            group_bias=np.asarray(bias, dtype=np.float64),
+            max_depth=max_depth,
+            n_features=n_features,
+        )
+
+    def predict(self, X) -> np.ndarray:
+        # both sklearn and xgboost compare in float32 input precision
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.n_features is not None and X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the ensemble expects {self.n_features}")
+        n = X.shape[0]
+        flat = np.ascontiguousarray(X.T, dtype=np.float64).reshape(-1)
+        cols = np.arange(n)
+        has_nan = bool(np.isnan(flat).any())
+        idx = np.repeat(self.roots[:, None], n, axis=1)
+        for _ in range(self.max_depth):
+            xv = flat.take(self.feature.take(idx) * n + cols)
+            go_left = xv <= self.threshold.take(idx)
+            if has_nan:
+                go_left |= np.isnan(xv) & self.missing_left.take(idx)
+            idx = self.left.take(idx) + ~go_left
+        sums = np.add.reduceat(self.value.take(idx), self.group_starts, axis=0)
+        return (sums * self.group_scale[:, None] + self.group_bias[:, None]).T
+
+    def verify(self, models: List[Any], X, atol: float = 1e-3, rtol: float = 1e-4) -> float:
+        """Max abs difference against each model's own predict(); raises if out of tolerance."""
+        X = np.asarray(X, dtype=np.float64)
+        ours = self.predict(X)
+        worst = 0.0
+        for j, model in enumerate(models):
+            expected = np.asarray(model.predict(X), dtype=np.float64).reshape(-1)
+            diff = np.abs(ours[:, j] - expected)
+            worst = max(worst, float(diff.max()) if diff.size else 0.0)
+            if not np.all(diff <= atol + rtol * np.abs(expected)):
+                raise ValueError(f"compiled predictions diverge for {type(model).__name__}: max diff {diff.max()}")
+        return worst
+
+    def probe_inputs(self, n: int = 512, seed: int = 0) -> np.ndarray:
+        """Inputs sitting on either side of real split thresholds, for verify()."""
+        rng = np.random.default_rng(seed)
+        n_features = self.n_features or int(self.feature.max()) + 1
+        X = rng.normal(size=(n, n_features))
+        internal = np.isfinite(self.threshold)
+        for f in range(n_features):
+            th = self.threshold[internal & (self.feature == f)]
+            if th.size:
+                X[:, f] = rng.choice(th, size=n) + rng.normal(0.0, 1e-3, size=n) * np.maximum(np.abs(th).mean(), 1.0)
+        return X
+
+
+def try_compile(models: List[Any], verify: bool = True) -> Optional[CompiledTreeEnsemble]:
+    """Compile and self-check `models`; returns None if any of them can't be compiled exactly."""
+    try:
+        ensemble = CompiledTreeEnsemble.compile(models)
+        if verify:
+            ensemble.verify(models, ensemble.probe_inputs())
+        return ensemble
+    except Exception:
+        # e.g. a pickle from another sklearn / xgboost version: the slower path still works, but say so
+        logger.warning("Could not compile the regression base models into one tree ensemble; using their predict()", exc_info=True)
+        metrics.swallowed("tree_ensemble", "compile")
+        return None
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from models.registry import registry
+
+router = APIRouter()
+
+@router.get("/models")
+def model_status():
+    return registry.status()
+
+@router.post("/models/reload")
+def reload_models():
+    # loads changed artifacts in the background and swaps them in atomically
+    started = registry.reload_async()
+    return {"status": "reloading" if started else "already_reloading", "version": registry.version}
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from typing import Optional
+from routes.simulation_routes import (sessions, coordinator, control, session_controller, load_dataset,
+                                     history_response, event_stream_response, replay_progress,
+                                     series_response)
+
+router = APIRouter()
+
+
+class SessionCreate(BaseModel):
+    name: str
+    csv_path: Optional[str] = None
+    mode: str = "classification"
+    speed: float = 1.0
+    stream: Optional[bool] = None
+    start: bool = False
+
+
+@coordinator.op("create_session")
+def create_session_op(name: str, csv_path: Optional[str], mode: str, speed: float, stream: Optional[bool], start: bool):
+    if mode not in ("classification", "regression"):
+        raise HTTPException(status_code=400, detail="mode must be 'classification' or 'regression'")
+    try:
+        ctl = sessions.create(name)
+    except KeyError:
+        raise HTTPException(status_code=409, detail=f"Session already exists: {name}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        ctl.set_mode(mode)
+        ctl.set_speed(speed)
+        loaded_path = load_dataset(ctl, csv_path, mode, stream)
+    except HTTPException:
+        sessions.delete(name)
+        raise
+    if start:
+        ctl.start()
+    return {"status": "created", "state": ctl.status(), "loaded_path": loaded_path}
+
+
+@coordinator.op("delete_session")
+def delete_session_op(name: str, purge: bool):
+    if name == "default":
+        raise HTTPException(status_code=400, detail="The default session can't be deleted")
+    session_controller(name)
+    sessions.delete(name, purge=purge)
+    return {"status": "deleted", "session": name, "purged": purge}
+
+
+@router.post("/sessions")
+def create_session(body: SessionCreate):
+    return control("create_session", **body.model_dump())
+
+
+@router.get("/sessions")
+def list_sessions():
+    return {"sessions": sessions.list(), "scheduler": sessions.scheduler.stats()}
+
+
+@router.get("/sessions/{name}")
+def get_session(name: str):
+    return session_controller(name).status()
+
+
+@router.delete("/sessions/{name}")
+def delete_session(name: str, purge: bool = True):
+    return control("delete_session", name=name, purge=purge)
+
+
+@router.post("/sessions/{name}/start")
+def start_session(name: str):
+    return control("start", session=name)
+
+
+@router.post("/sessions/{name}/stop")
+def stop_session(name: str):
+    return control("stop", session=name)
+
+
+@router.post("/sessions/{name}/reset")
+def reset_session(name: str):
+    return control("reset", session=name)
+
+
+@router.post("/sessions/{name}/set-speed")
+def set_session_speed(name: str, speed: float, catchup: Optional[str] = None):
+    return control("set_speed", session=name, speed=speed, catchup=catchup)
+
+
+@router.post("/sessions/{name}/replay")
+def replay_session(name: str, chunk_size: Optional[int] = None, from_start: bool = False):
+    return control("replay", session=name, chunk_size=chunk_size, from_start=from_start)
+
+
+@router.get("/sessions/{name}/replay")
+def get_session_replay(name: str):
+    return replay_progress(session_controller(name))
+
+
+@router.post("/sessions/{name}/replay/cancel")
+def cancel_session_replay(name: str):
+    return control("cancel_replay", session=name)
+
+
+@router.get("/sessions/{name}/history")
+def get_session_history(request: Request, name: str, limit: int = 1000, since_id: Optional[int] = None,
+                        before_id: Optional[int] = None, latest: bool = False):
+    return history_response(request, session_controller(name), limit, since_id, before_id, latest)
+
+
+@router.get("/sessions/{name}/series")
+def get_session_series(name: str, fields: str = "displacement,risk_score,hazard", points: int = 500,
+                       method: str = "lttb", start_id: Optional[int] = None, end_id: Optional[int] = None,
+                       start: Optional[str] = None, end: Optional[str] = None):
+    return series_response(session_controller(name), fields, points, method, start_id, end_id, start, end)
+
+
+@router.get("/sessions/{name}/stream")
+async def stream_session(request: Request, name: str, since_id: Optional[int] = None):
+    return event_stream_response(request, session_controller(name), since_id)
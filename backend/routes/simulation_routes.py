@@ -1,22 +1,43 @@
-from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Optional
 from simulation.dataset_loader import DatasetLoader
 from simulation.state_manager import StateManager
-from database.db_manager import DBManager
+from simulation.state_store import SQLiteStateStore, SharedStateManager
+from simulation.coordinator import Coordinator, CommandFailed
+from database.db_manager import DBManager, epoch_seconds
+from database.series_cache import SeriesCache
 from simulation.simulation_controller import SimulationController
+from simulation.session_manager import SessionManager
 from alerts.alert_engine import AlertEngine
 from models.classification_model import ClassificationModel
 from models.regression_model import RegressionModel
 from models.model_loader import try_load
+from app.config import (STARTUP_MODE, DATASET_STREAM_THRESHOLD_MB, STREAM_KEEPALIVE_S, STATE_BACKEND,
+                        STATE_DB_PATH, LEADER_LEASE_S, STATE_POLL_MS, COMMAND_TIMEOUT_S, REPLAY_CHUNK_ROWS)
+from app.utils import sanitize_floats
+from app.metrics import metrics
+from simulation.pubsub import Event
+import logging
 import os
+import threading
 
 router = APIRouter()
+logger = logging.getLogger("terraguard.simulation")
+
+# Simulation state shared by every worker process ("sqlite") or kept in this one ("memory")
+store = SQLiteStateStore(STATE_DB_PATH) if STATE_BACKEND == "sqlite" else None
+# the worker holding the leader lease drives the simulations; the others forward operations to it
+coordinator = Coordinator(store, lease_ttl_s=LEADER_LEASE_S, poll_interval_s=STATE_POLL_MS / 1000.0,
+                          command_timeout_s=COMMAND_TIMEOUT_S)
 
 # Singleton components
 dataset = DatasetLoader(csv_path=None)
-state = StateManager()
+state = StateManager() if store is None else SharedStateManager(store, "default")
 db = DBManager()
 alert_engine = AlertEngine()
+# chart series of the default session; other sessions get theirs on first use (series_cache_for)
+series_cache = SeriesCache(db)
 
 # Wire existing trained model files from the repo's top-level `models/` folders
 repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -31,7 +52,9 @@ DEFAULT_CLASSIFICATION_XLSX = os.path.abspath(os.path.join(_data_dir, "classific
 DEFAULT_REGRESSION_TRAIN_XLSX = os.path.abspath(os.path.join(_data_dir, "regression_train.xlsx"))
 DEFAULT_REGRESSION_TEST_XLSX = os.path.abspath(os.path.join(_data_dir, "regression_test.xlsx"))
 
-class_model = ClassificationModel(model_path=class_model_path, scaler_path=None)
+# outside "eager" startup the model files are loaded by app/startup.py or on first use
+_preload = STARTUP_MODE == "eager"
+class_model = ClassificationModel(model_path=class_model_path, scaler_path=None, preload=_preload)
 
 # Wire base models from metadata for regression
 base_model_paths = None
@@ -48,23 +71,116 @@ try:
 except Exception:
     pass
 
-reg_model = RegressionModel(meta_model_path=reg_meta_path, base_model_paths=base_model_paths, scaler_path=None)
+reg_model = RegressionModel(meta_model_path=reg_meta_path, base_model_paths=base_model_paths, scaler_path=None, preload=_preload)
 controller = SimulationController(dataset, state, db, class_model, reg_model, alert_engine)
 
-@router.post("/simulation/start")
-def start_simulation(csv_path: Optional[str] = None, mode: Optional[str] = None):
-    # If no csv_path provided, select sensible default based on mode
-    if not mode:
-        mode = state.get().get("mode", "classification")
+# the routes below drive the "default" session; more sessions live under /sessions
+sessions = SessionManager(db, class_model, reg_model, scheduler=controller.scheduler, store=store)
+sessions.register("default", controller)
 
-    # Ensure controller state reflects requested mode before loading dataset/start
-    if mode:
+
+# session name -> its chart series cache
+_series_caches: Dict[str, SeriesCache] = {"default": series_cache}
+_series_lock = threading.Lock()
+
+
+def series_cache_for(ctl: SimulationController) -> SeriesCache:
+    """The chart series cache over a session's records, created on first use."""
+    with _series_lock:
+        cache = _series_caches.get(ctl.name)
+        # a deleted and re-created session has a new record namespace
+        if cache is None or cache.db is not ctl.db:
+            live = {c.name: c.db for c in sessions.controllers()}
+            for name in [n for n, c in _series_caches.items() if live.get(n) is not c.db]:
+                del _series_caches[name]
+            cache = _series_caches[ctl.name] = SeriesCache(ctl.db)
+        return cache
+
+
+def session_controller(name: str) -> SimulationController:
+    try:
+        return sessions.get(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {name}")
+
+
+def control(op: str, **kwargs):
+    """Run a simulation operation on the leader worker (in place when this worker leads)."""
+    try:
+        return coordinator.call(op, **kwargs)
+    except CommandFailed as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@coordinator.on_elected
+def resume_sessions():
+    # the previous leader may have written records: continue after its ids
+    db.resync_ids()
+    for name in sessions.names():
         try:
-            controller.set_mode(mode)
-        except Exception:
-            # ignore and let downstream validation handle invalid modes
-            pass
+            ctl = sessions.get(name)
+        except KeyError:
+            continue
+        s = ctl.state.get()
+        spec = s.get("dataset")
+        if spec and not ctl.dataset.length():
+            try:
+                load_dataset(ctl, spec.get("path"), spec.get("mode") or s["mode"], spec.get("stream"))
+            except HTTPException as e:
+                logger.warning("session %s: can't reload its dataset: %s", name, e.detail)
+                continue
+        ctl.resume()
+
 
+@coordinator.on_demoted
+def detach_sessions():
+    for ctl in sessions.controllers():
+        ctl.detach()
+
+
+@coordinator.on_follow
+def follow_sessions():
+    for ctl in sessions.controllers():
+        ctl.follow()
+
+
+@metrics.collector
+def simulation_gauges():
+    """Queue depths and session lag for /metrics, read from the stats the components already keep."""
+    d = db.stats()
+    yield "terraguard_db_queue_depth", "Records waiting for the write-behind writer.", {}, d["queue_depth"]
+    yield "terraguard_db_oldest_pending_seconds", "Age of the oldest queued record.", {}, d["oldest_pending_ms"] / 1000.0
+    sched = controller.scheduler.stats()
+    yield "terraguard_scheduler_sessions", "Sessions scheduled on the shared simulation scheduler.", {}, sched["sessions"]
+    yield "terraguard_scheduler_mean_batch_size", "Steps per batched model call.", {}, sched["mean_batch_size"]
+    yield "terraguard_leader", "1 if this worker drives the simulations.", {}, int(coordinator.is_leader)
+    for ctl in sessions.controllers():
+        s = ctl.state.get()
+        labels = {"session": ctl.name}
+        yield "terraguard_session_running", "1 while the session is running.", labels, int(bool(s.get("running")))
+        yield "terraguard_session_index", "Next dataset row of the session.", labels, s.get("current_index")
+        clock = s.get("clock") or {}
+        if clock:
+            yield "terraguard_session_lag_seconds", "How far the session is behind its schedule.", labels, \
+                clock["lag_ms"] / 1000.0
+            yield "terraguard_session_rows_per_second", "Rows per second the session achieves.", labels, \
+                clock["achieved_rate"]
+
+
+def load_models():
+    class_model.model
+    reg_model.meta_model
+
+
+def warm_up():
+    # one synthetic step per model, shaped like the simulation loop's inputs
+    n_class = len(class_model.feature_order) if getattr(class_model, "feature_order", None) else 33
+    class_model.predict([0.0] * n_class)
+    n_reg = getattr(reg_model.base_models[0], "n_features_in_", 4) if reg_model.base_models else 4
+    reg_model.predict([[0.0] * n_reg])
+
+def load_dataset(ctl: SimulationController, csv_path: Optional[str], mode: str, stream: Optional[bool]) -> str:
+    """Load the session's dataset for `mode` (default files when csv_path is empty); returns the path used."""
     if not csv_path:
         if mode == "classification":
             csv_path = DEFAULT_CLASSIFICATION_XLSX
@@ -73,57 +189,264 @@ def start_simulation(csv_path: Optional[str] = None, mode: Optional[str] = None)
             csv_path = DEFAULT_REGRESSION_TEST_XLSX
 
     try:
-        dataset.load(csv_path)
+        # build the feature matrix in the order the active model expects
+        feature_order = class_model.feature_order if mode == "classification" else None
+        if stream is None:
+            # large files are streamed in chunks instead of being loaded whole
+            stream = os.path.exists(csv_path) and os.path.getsize(csv_path) > DATASET_STREAM_THRESHOLD_MB * 1024 * 1024
+        ctl.dataset.load(csv_path, feature_order=feature_order, stream=stream)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to load dataset: {e}")
-    if dataset.length() == 0:
+    if ctl.dataset.length() == 0:
         raise HTTPException(status_code=400, detail=f"Dataset not loaded or empty: {csv_path}")
+    # lets a new leader reload it, and other workers report its length
+    ctl.state.update(dataset={"path": csv_path, "mode": mode, "stream": stream},
+                     dataset_length=ctl.dataset.length(), dataset_length_exact=ctl.dataset.length_exact())
+    return csv_path
+
+@coordinator.op("start")
+def start_op(session: str, load: bool = False, csv_path: Optional[str] = None, mode: Optional[str] = None,
+             stream: Optional[bool] = None):
+    ctl = session_controller(session)
+    if ctl.replaying():
+        raise HTTPException(status_code=409, detail="A replay is in progress; cancel it first")
+    if not load:
+        ctl.start()
+        return {"status": "started", "state": ctl.status()}
+
+    # If no csv_path provided, select sensible default based on mode
+    if not mode:
+        mode = ctl.state.get().get("mode", "classification")
+
+    # Ensure controller state reflects requested mode before loading dataset/start
+    if mode:
+        try:
+            ctl.set_mode(mode)
+        except Exception:
+            # ignore and let downstream validation handle invalid modes
+            pass
+
+    csv_path = load_dataset(ctl, csv_path, mode, stream)
     if mode:
-        controller.set_mode(mode)
-    controller.start()
-    return {"status": "started", "state": controller.status(), "loaded_path": csv_path}
+        ctl.set_mode(mode)
+    ctl.start()
+    return {"status": "started", "state": ctl.status(), "loaded_path": csv_path, "streaming": ctl.dataset.is_streaming()}
+
+@coordinator.op("replay")
+def replay_op(session: str, csv_path: Optional[str] = None, mode: Optional[str] = None, stream: Optional[bool] = None,
+              chunk_size: Optional[int] = None, from_start: bool = False):
+    ctl = session_controller(session)
+    if ctl.state.get()["running"] or ctl.replaying():
+        raise HTTPException(status_code=409, detail="The simulation is already running")
+    if mode:
+        try:
+            ctl.set_mode(mode)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    s = ctl.state.get()
+    loaded_path = None
+    # keep the loaded dataset unless another file or mode is asked for
+    if csv_path or not ctl.dataset.length() or (s.get("dataset") or {}).get("mode") != s["mode"]:
+        loaded_path = load_dataset(ctl, csv_path, s["mode"], stream)
+    if from_start:
+        ctl.reset()
+    ctl.start_replay(chunk_size or REPLAY_CHUNK_ROWS)
+    return {"status": "replaying", "state": ctl.status(), "loaded_path": loaded_path}
+
+@coordinator.op("cancel_replay")
+def cancel_replay_op(session: str):
+    ctl = session_controller(session)
+    ctl.cancel_replay()
+    return {"status": "cancelled", "state": ctl.status()}
+
+def replay_progress(ctl: SimulationController):
+    return ctl.state.get().get("replay") or {"status": "idle"}
+
+@coordinator.op("stop")
+def stop_op(session: str):
+    ctl = session_controller(session)
+    ctl.stop()
+    return {"status": "stopped", "state": ctl.status()}
+
+@coordinator.op("reset")
+def reset_op(session: str):
+    ctl = session_controller(session)
+    ctl.reset()
+    return {"status": "reset", "state": ctl.status()}
+
+@coordinator.op("set_speed")
+def set_speed_op(session: str, speed: float, catchup: Optional[str] = None):
+    ctl = session_controller(session)
+    if catchup is not None:
+        try:
+            ctl.set_catchup(catchup)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    ctl.set_speed(speed)
+    return {"status": "speed_set", "speed": speed, "catchup": ctl.state.get().get("catchup", ctl.clock.catchup)}
+
+@coordinator.op("set_mode")
+def set_mode_op(session: str, mode: str):
+    ctl = session_controller(session)
+    try:
+        ctl.set_mode(mode)
+        return {"status": "mode_set", "mode": mode}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/simulation/start")
+def start_simulation(csv_path: Optional[str] = None, mode: Optional[str] = None, stream: Optional[bool] = None):
+    return control("start", session="default", load=True, csv_path=csv_path, mode=mode, stream=stream)
 
 @router.post("/simulation/stop")
 def stop_simulation():
-    controller.stop()
-    return {"status": "stopped", "state": controller.status()}
+    return control("stop", session="default")
 
 @router.post("/simulation/reset")
 def reset_simulation():
-    controller.reset()
-    return {"status": "reset", "state": controller.status()}
+    return control("reset", session="default")
+
+@router.post("/simulation/replay")
+def start_replay(csv_path: Optional[str] = None, mode: Optional[str] = None, stream: Optional[bool] = None,
+                 chunk_size: Optional[int] = None, from_start: bool = False):
+    """Fast-forward: score the rest of the dataset (or all of it with from_start) in chunks, in the background."""
+    return control("replay", session="default", csv_path=csv_path, mode=mode, stream=stream,
+                   chunk_size=chunk_size, from_start=from_start)
+
+@router.get("/simulation/replay")
+def get_replay():
+    return replay_progress(controller)
+
+@router.post("/simulation/replay/cancel")
+def cancel_replay():
+    return control("cancel_replay", session="default")
 
 @router.get("/simulation/status")
 def get_status():
     return controller.status()
 
+@router.get("/simulation/coordinator")
+def get_coordinator():
+    """State backend, this worker's id and role, and the current leader."""
+    return coordinator.stats()
+
+@router.get("/simulation/db/stats")
+def get_db_stats():
+    return db.stats()
+
+def history_response(request: Request, ctl: SimulationController, limit: int, since_id: Optional[int],
+                     before_id: Optional[int], latest: bool):
+    # records are append-only between resets, so (generation, last id, query) identifies the response
+    generation, last_id = ctl.db.history_version()
+    etag = f'W/"h{generation}-{last_id}-{limit}-{since_id}-{before_id}-{int(latest)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-History-Generation": str(generation)}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    raw = ctl.history(limit=limit, since_id=since_id, before_id=before_id, latest=latest)
+    return JSONResponse(sanitize_floats(raw), headers=headers)
+
 @router.get("/simulation/history")
-def get_history(limit: int = 1000):
-    import math
-
-    def _sanitize(obj):
-        if isinstance(obj, dict):
-            return {k: _sanitize(v) for k, v in obj.items()}
-        if isinstance(obj, list):
-            return [_sanitize(v) for v in obj]
-        if isinstance(obj, float):
-            if math.isnan(obj) or math.isinf(obj):
-                return None
-            return obj
-        return obj
-
-    raw = controller.history(limit=limit)
-    return _sanitize(raw)
+def get_history(request: Request, limit: int = 1000, since_id: Optional[int] = None,
+                before_id: Optional[int] = None, latest: bool = False):
+    return history_response(request, controller, limit, since_id, before_id, latest)
+
+def _parse_time(value: Optional[str], name: str) -> Optional[float]:
+    # epoch seconds or an ISO timestamp (naive = UTC)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        ts = epoch_seconds(value)
+        if ts is None:
+            raise HTTPException(status_code=400, detail=f"{name} must be epoch seconds or an ISO timestamp")
+        return ts
+
+@router.get("/simulation/records")
+def query_records(start: Optional[str] = None, end: Optional[str] = None, mode: Optional[str] = None,
+                  min_risk: Optional[int] = None, max_risk: Optional[int] = None, alerts_only: bool = False,
+                  limit: int = 1000, latest: bool = False, include_payload: bool = False,
+                  session: str = "default", all_sessions: bool = False):
+    """Records filtered by time range [start, end), mode, risk level and alert flag, evaluated in SQL."""
+    rows = db.query_records(
+        start_ts=_parse_time(start, "start"), end_ts=_parse_time(end, "end"), mode=mode,
+        min_risk=min_risk, max_risk=max_risk, alerts_only=alerts_only,
+        limit=limit, latest=latest, include_payload=include_payload,
+        session=None if all_sessions else session,
+    )
+    return sanitize_floats(rows)
+
+def series_response(ctl: SimulationController, fields: str, points: int, method: str, start_id: Optional[int],
+                    end_id: Optional[int], start: Optional[str], end: Optional[str]):
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    try:
+        return series_cache_for(ctl).series(
+            names, points=points, method=method, start_id=start_id, end_id=end_id,
+            start_ts=_parse_time(start, "start"), end_ts=_parse_time(end, "end"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/simulation/series")
+def get_series(fields: str = "displacement,risk_score,hazard", points: int = 500, method: str = "lttb",
+               start_id: Optional[int] = None, end_id: Optional[int] = None,
+               start: Optional[str] = None, end: Optional[str] = None):
+    """Chart series downsampled on the server to about `points` points (LTTB or min/max buckets)."""
+    return series_response(controller, fields, points, method, start_id, end_id, start, end)
+
+def event_stream_response(request: Request, ctl: SimulationController, since_id: Optional[int]):
+    if since_id is None:
+        # EventSource sends the id of the last event it received when it reconnects
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id and last_event_id.isdigit():
+            since_id = int(last_event_id)
+    if not coordinator.is_leader:
+        # records come from the leader worker through the database
+        ctl.follow(prime=True)
+    sub = ctl.events.subscribe(since_id=since_id)
+
+    async def event_source():
+        try:
+            yield "retry: 2000\n\n"
+            yield Event("status", ctl.status()).sse()
+            while not await request.is_disconnected():
+                await sub.wait(STREAM_KEEPALIVE_S)
+                events = sub.drain()
+                if events:
+                    yield "".join(e.sse() for e in events)
+                else:
+                    # keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        finally:
+            ctl.events.unsubscribe(sub)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/simulation/stream")
+async def stream_events(request: Request, since_id: Optional[int] = None):
+    """Server-sent events: `record` (history item), `status` (coalesced), `reset`,
+    `dropped` / `resync` (the client fell behind and should backfill from /simulation/history)."""
+    return event_stream_response(request, controller, since_id)
+
+@router.get("/simulation/stream/stats")
+def get_stream_stats():
+    return controller.events.stats()
 
 @router.post("/simulation/set-speed")
-def set_speed(speed: float):
-    controller.set_speed(speed)
-    return {"status": "speed_set", "speed": speed}
+def set_speed(speed: float, catchup: Optional[str] = None):
+    """Seconds between steps (0: as fast as possible); `catchup` is "burst" or "skip"."""
+    return control("set_speed", session="default", speed=speed, catchup=catchup)
+
+@router.post("/simulation/set-rate")
+def set_rate(rate: float, catchup: Optional[str] = None):
+    """Target rows per second (0: as fast as possible)."""
+    if rate < 0:
+        raise HTTPException(status_code=400, detail="rate must be >= 0")
+    return control("set_speed", session="default", speed=1.0 / rate if rate > 0 else 0.0, catchup=catchup)
 
 @router.post("/simulation/set-mode")
 def set_mode(mode: str):
-    try:
-        controller.set_mode(mode)
-        return {"status": "mode_set", "mode": mode}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return control("set_mode", session="default", mode=mode)
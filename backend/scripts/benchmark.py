@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import BASE_DIR
+from benchmarks import suite
+
+DEFAULT_RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+
+def _format(result) -> str:
+    if "error" in result:
+        return f"ERROR {result['error']}"
+    line = f"p50 {result['p50_us']:>12.1f} us"
+    if "p95_us" in result:
+        line += f"   p95 {result['p95_us']:>12.1f} us"
+    if result.get("rows_per_s") is not None:
+        line += f"   {result['rows_per_s']:.1f} rows/s"
+    elif result.get("ops_per_s") is not None:
+        line += f"   {result['ops_per_s']:.1f} ops/s"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inference, dataset, database, alert and simulation hot paths")
+    parser.add_argument("only", nargs="*", help="benchmark name patterns, e.g. 'DBManager.*' (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    parser.add_argument("--rows", type=int, default=2000, help="rows in the synthetic datasets")
+    parser.add_argument("--iterations", type=int, default=500, help="timed calls per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="keep the synthetic CSV files in this directory")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="results file to compare against; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also write the results to PATH as the new baseline")
+    args = parser.parse_args()
+
+    names = suite.select(args.only)
+    if args.list:
+        print("\n".join(names))
+        return
+    if not names:
+        parser.error("no benchmark matches " + ", ".join(args.only))
+
+    width = max(len(n) for n in names)
+    results = suite.run(names, rows=args.rows, iterations=args.iterations, seed=args.seed, data_dir=args.data_dir,
+                        progress=lambda name, result: print(f"{name:<{width}}  {_format(result)}", flush=True))
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, results["created"].replace(":", "") + ".json")
+    for path in filter(None, (output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = suite.compare(results, baseline, args.tolerance)
+        if args.only:
+            # the benchmarks not selected this time are not missing
+            rows = [row for row in rows if row["status"] != "missing"]
+        print(f"\nAgainst {args.baseline} (median time per operation, tolerance {args.tolerance:.0%}):")
+        for row in rows:
+            ratio = f"{row['ratio']:.2f}x" if row["ratio"] is not None else "-"
+            print(f"{row['name']:<{width}}  {str(row['baseline_us']):>12} -> {str(row['current_us']):>12} us  "
+                  f"{ratio:>7}  {row['status']}")
+        if any(row["status"] == "regression" for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from alerts.alert_engine import AlertEngine
+from alerts.rules import RULE_TYPES
+
+# one definition per rule type and direction, with thresholds the random outputs below cross often
+RULES = [
+    {"type": "escalation"},
+    {"type": "sustained", "threshold": 2, "steps": 3},
+    {"type": "sustained", "threshold": 1, "steps": 1},
+    {"type": "spike", "threshold": 0.5},
+    {"type": "rate_of_change", "signal": "displacement", "window": 5, "threshold": 1.0, "direction": "up"},
+    {"type": "rate_of_change", "signal": "hazard", "window": 2, "threshold": 0.5, "direction": "down"},
+    {"type": "rate_of_change", "signal": "confidence", "window": 3, "threshold": 0.3, "direction": "both"},
+]
+
+
+def _value(rng: random.Random, low: float, high: float, missing: float):
+    r = rng.random()
+    if r < missing:
+        return None
+    if r < missing * 1.5:
+        return rng.randint(int(low), int(high))
+    return rng.uniform(low, high)
+
+
+def outputs(rng: random.Random, mode: str, n: int, missing: float):
+    rows = []
+    for _ in range(n):
+        if mode == "classification":
+            row = {"prediction": rng.choice([0, 1, 2, 3, None]) if rng.random() < missing else rng.randint(0, 3),
+                   "confidence": _value(rng, 0.0, 1.0, missing)}
+            if rng.random() < 0.7:
+                row["displacement_value"] = _value(rng, 0.0, 3.0, missing)
+        else:
+            row = {"hazard_level": rng.choice([0, 1, 2, 3, None]) if rng.random() < missing else rng.randint(0, 3),
+                   "risk_score": _value(rng, 0.0, 3.0, missing),
+                   "confidence": _value(rng, 0.0, 1.0, missing)}
+        rows.append(row)
+    return rows
+
+
+def per_record(engine: AlertEngine, mode: str, rows, prev):
+    alerts = []
+    for i, output in enumerate(rows):
+        alert = engine.evaluate(str(i), mode, output, prev)
+        alerts.append(alert)
+        prev = AlertEngine.chain(output, alert)
+    return alerts
+
+
+def chunked(engine: AlertEngine, mode: str, rows, prev, rng: random.Random):
+    alerts = []
+    i = 0
+    while i < len(rows):
+        size = rng.choice([1, 1, 2, 3, 5, 8, 13, 50])
+        chunk = rows[i:i + size]
+        out = engine.evaluate_batch([str(i + j) for j in range(len(chunk))], mode, chunk, prev)
+        alerts += out
+        prev = AlertEngine.chain(chunk[-1], out[-1])
+        i += size
+    return alerts
+
+
+def _same(a, b) -> bool:
+    # NaN != NaN, and the alerts carry the outputs' values through unchanged
+    return json.dumps(a, sort_keys=True, default=str) == json.dumps(b, sort_keys=True, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check AlertEngine.evaluate_batch against per-record evaluate")
+    parser.add_argument("--trials", type=int, default=300)
+    parser.add_argument("--records", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    covered = {rule["type"] for rule in RULES}
+    if covered != set(RULE_TYPES):
+        print(f"rule types not covered: {sorted(set(RULE_TYPES) - covered)}")
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    failures = 0
+    for trial in range(args.trials):
+        mode = rng.choice(["classification", "regression"])
+        missing = rng.choice([0.0, 0.05, 0.3])
+        rows = outputs(rng, mode, rng.randint(1, args.records), missing)
+        prev = rng.choice([None, {}, {"prediction": 2, "risk_score": 1.0}, {"hazard_level": None, "displacement_value": 0.4}])
+        # the rules' running state carries over between runs, so compare two runs back to back
+        expected_engine, batch_engine = AlertEngine(rules=RULES), AlertEngine(rules=RULES)
+        for run in range(2):
+            expected = per_record(expected_engine, mode, rows, prev)
+            got = chunked(batch_engine, mode, rows, prev, rng)
+            for i, (a, b) in enumerate(zip(expected, got)):
+                if not _same(a, b):
+                    failures += 1
+                    print(json.dumps({"trial": trial, "run": run, "record": i, "mode": mode,
+                                      "evaluate": a, "evaluate_batch": b}, default=str))
+                    break
+            if len(expected) != len(got):
+                failures += 1
+                print(json.dumps({"trial": trial, "run": run, "evaluate": len(expected), "evaluate_batch": len(got)}))
+    print(json.dumps({"trials": args.trials, "rule_types": sorted(covered), "failures": failures, "ok": failures == 0}))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import MODELS_DIR
+from models.numpy_lstm import parity_check
+
+DEFAULT_MODELS = [
+    os.path.join(MODELS_DIR, "classification", "classification_lstm.h5"),
+    os.path.join(MODELS_DIR, "regression", "regression_meta_lstm.h5"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the NumPy LSTM engine against Keras output")
+    parser.add_argument("models", nargs="*", default=DEFAULT_MODELS, help=".h5 files to check")
+    parser.add_argument("--samples", type=int, default=512)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.models:
+        result = parity_check(os.path.abspath(path), samples=args.samples)
+        result["ok"] = result["max_abs_diff"] <= args.atol
+        failed = failed or not result["ok"]
+        print(json.dumps(result, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import MODELS_DIR
+from models import preprocessing
+from models.model_loader import load_artifact
+
+DEFAULT_STAGES = [
+    (os.path.join(MODELS_DIR, "classification", "classification_imputer.pkl"),
+     os.path.join(MODELS_DIR, "classification", "classification_scaler.pkl")),
+    (None, os.path.join(MODELS_DIR, "regression", "regression_scaler.pkl")),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the fused NumPy preprocessing against the sklearn objects")
+    parser.add_argument("--samples", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    for imputer_path, scaler_path in DEFAULT_STAGES:
+        result = {"imputer": imputer_path, "scaler": scaler_path}
+        try:
+            imputer = load_artifact(imputer_path) if imputer_path else None
+            scaler = load_artifact(scaler_path) if scaler_path else None
+            pre = preprocessing.FusedPreprocessor.compile(imputer, scaler)
+            result["stages"] = pre.name
+            result["max_abs_diff"] = pre.verify(imputer, scaler, pre.probe_inputs(args.samples, args.seed))
+            result["ok"] = True
+        except Exception as e:
+            # ValueError for a mismatch; AttributeError and friends when the pickles come from another sklearn
+            result["error"] = f"{type(e).__name__}: {e}"
+            result["ok"] = False
+        failed = failed or not result["ok"]
+        print(json.dumps(result, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
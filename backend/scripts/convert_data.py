@@ -1,34 +1,68 @@
-import pandas as pd
+import argparse
 import os
+import sys
 import time
 
-# Define paths
-DATA_DIR = r"C:\Users\priya\OneDrive\Desktop\IIT Mandi\Data"
-EXCEL_FILE = os.path.join(DATA_DIR, "classification_data.xlsx")
-CSV_FILE = os.path.join(DATA_DIR, "classification_data.csv")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import BASE_DIR, DATASET_CACHE_DIR
+from simulation import dataset_cache
+
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, "data")
 
-def convert_excel_to_csv():
-    if not os.path.exists(EXCEL_FILE):
-        print(f"Error: Excel file not found at {EXCEL_FILE}")
-        return
 
-    print(f"Reading Excel file: {EXCEL_FILE}...")
+def convert(path: str, cache_dir: str, force: bool = False, csv: bool = False):
     start_time = time.time()
-    try:
-        # Read Excel file
-        df = pd.read_excel(EXCEL_FILE)
+    cached = None if force else dataset_cache.load(path, cache_dir)
+    if cached is not None:
+        print(f"Up to date: {path} ({len(cached)} rows)")
+        df = cached
+    else:
+        print(f"Reading {path}...")
+        df = dataset_cache.read_source(path)
         read_time = time.time()
-        print(f"Excel read complete in {read_time - start_time:.2f} seconds.")
-        
-        # Save as CSV
-        print(f"Saving to CSV: {CSV_FILE}...")
-        df.to_csv(CSV_FILE, index=False)
-        save_time = time.time()
-        print(f"CSV save complete in {save_time - read_time:.2f} seconds.")
-        print(f"Total time: {save_time - start_time:.2f} seconds.")
-        
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        print(f"Read complete in {read_time - start_time:.2f} seconds ({len(df)} rows).")
+        stem = dataset_cache.store(path, df, cache_dir)
+        print(f"Cache written to {stem}.* in {time.time() - read_time:.2f} seconds.")
+
+    if csv and not path.lower().endswith(".csv"):
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        df.to_csv(csv_path, index=False)
+        print(f"CSV saved to {csv_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-build the columnar dataset cache for a data directory")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DATA_DIR],
+                        help="data directories or individual CSV/Excel files (default: backend/data)")
+    parser.add_argument("--cache-dir", default=DATASET_CACHE_DIR, help="cache directory")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cache is up to date")
+    parser.add_argument("--csv", action="store_true", help="also export Excel files as CSV next to the source")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(dataset_cache.SOURCE_EXTENSIONS)
+            )
+        else:
+            files.append(path)
+
+    if not files:
+        print("No CSV/Excel files found.")
+        return
+
+    failed = 0
+    for path in files:
+        try:
+            convert(path, args.cache_dir, force=args.force, csv=args.csv)
+        except Exception as e:
+            failed += 1
+            print(f"An error occurred converting {path}: {e}")
+    sys.exit(1 if failed else 0)
+
 
 if __name__ == "__main__":
-    convert_excel_to_csv()
+    main()
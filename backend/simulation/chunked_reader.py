@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+from typing import Iterator, Optional
+
+import pandas as pd
+
+_END = object()
+
+
+def _iter_csv(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(path, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _iter_excel(path: str, chunk_size: int, on_estimate) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        # the sheet dimension tag gives the row count up front (minus the header)
+        if ws.max_row:
+            on_estimate(max(0, ws.max_row - 1))
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        buf = []
+        for row in rows:
+            buf.append(row)
+            if len(buf) >= chunk_size:
+                yield pd.DataFrame(buf, columns=columns)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=columns)
+    finally:
+        wb.close()
+
+
+def _estimate_csv_rows(path: str, sample_bytes: int = 1 << 16) -> Optional[int]:
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    lines = sample.count(b"\n")
+    if not lines:
+        return None
+    if len(sample) >= size:
+        return max(0, lines - 1 if sample.endswith(b"\n") else lines)
+    return max(0, int(size / (len(sample) / lines)) - 1)
+
+
+class ChunkPrefetcher:
+    """Read a CSV/Excel file chunk by chunk on a background thread.
+
+    At most `prefetch` parsed chunks are buffered, so memory stays bounded no
+    matter how large the file is; the reader blocks until the consumer takes
+    the next chunk.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 5000, prefetch: int = 2):
+        self.path = path
+        self.chunk_size = max(1, int(chunk_size))
+        self._queue = queue.Queue(maxsize=max(1, int(prefetch)))
+        self._stop = threading.Event()
+        self.rows_read = 0
+        self.done = False
+        self.error: Optional[str] = None
+        self.estimated_rows: Optional[int] = None
+        if not path.lower().endswith((".xls", ".xlsx")):
+            try:
+                self.estimated_rows = _estimate_csv_rows(path)
+            except OSError:
+                pass
+        self._thread = threading.Thread(target=self._run, name="dataset-prefetch", daemon=True)
+        self._thread.start()
+
+    def _set_estimate(self, rows: int):
+        self.estimated_rows = rows
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            if self.path.lower().endswith((".xls", ".xlsx")):
+                chunks = _iter_excel(self.path, self.chunk_size, self._set_estimate)
+            else:
+                chunks = _iter_csv(self.path, self.chunk_size)
+            for chunk in chunks:
+                self.rows_read += len(chunk)
+                if not self._put(chunk):
+                    return
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.done = True
+            self._put(_END)
+
+    def next_chunk(self, timeout: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """Next parsed chunk, or None once the file is exhausted."""
+        item = self._queue.get(timeout=timeout)
+        if item is _END:
+            # leave the marker for any later caller
+            self._queue.put(_END)
+            return None
+        return item
+
+    def close(self):
+        self._stop.set()
@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.metrics import metrics
+
+CATCHUP_POLICIES = ("burst", "skip")
+# smoothing of the per-stage step times
+STAGE_ALPHA = 0.1
+
+
+class SessionClock:
+    """Paces one session against absolute monotonic deadlines.
+
+    Step k is due at start + k * period (period = the session's `speed`,
+    seconds per row), however long the steps themselves take, so the rate
+    does not drift when the model or the database slows down. When a step
+    starts after its deadline the session is behind by `lag`; the catch-up
+    policy decides what happens then:
+
+    - "burst": the missed steps run back to back until it is on time again
+    - "skip": the rows whose slots have passed are skipped, so the cursor
+      keeps following the wall clock
+    """
+
+    def __init__(self, catchup: str = "burst", window: int = 50):
+        self.catchup = catchup if catchup in CATCHUP_POLICIES else "burst"
+        self.next_due: Optional[float] = None
+        self._done = deque(maxlen=max(2, int(window)))
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.skipped = 0
+        self.steps = 0
+        self.stages: Dict[str, float] = {}
+
+    def start(self, now: Optional[float] = None):
+        self.next_due = time.monotonic() if now is None else now
+        self._done.clear()
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.skipped = 0
+        self.steps = 0
+
+    def begin(self, period: float, now: Optional[float] = None) -> int:
+        """Called when a step starts; returns how many rows to skip first."""
+        now = time.monotonic() if now is None else now
+        if self.next_due is None:
+            self.next_due = now
+        if period <= 0:
+            # unthrottled: there is no schedule to fall behind
+            self.lag = 0.0
+            return 0
+        self.lag = max(0.0, now - self.next_due)
+        self.max_lag = max(self.max_lag, self.lag)
+        if self.catchup == "skip" and self.lag >= period:
+            return int(self.lag // period)
+        return 0
+
+    def advance(self, period: float, skipped: int = 0, now: Optional[float] = None):
+        """Called when a step is done: schedule the next one."""
+        now = time.monotonic() if now is None else now
+        self.steps += 1
+        self.skipped += skipped
+        self._done.append(now)
+        if period <= 0 or self.next_due is None:
+            self.next_due = now
+        else:
+            self.next_due += period * (1 + skipped)
+
+    def stage(self, name: str, seconds: float):
+        metrics.observe_stage("simulation", name, seconds)
+        ms = seconds * 1000.0
+        prev = self.stages.get(name)
+        self.stages[name] = ms if prev is None else prev + STAGE_ALPHA * (ms - prev)
+
+    def rate(self) -> float:
+        """Achieved rows per second over the last `window` steps."""
+        if len(self._done) < 2:
+            return 0.0
+        span = self._done[-1] - self._done[0]
+        return (len(self._done) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self, period: float) -> Dict[str, Any]:
+        return {
+            "target_rate": round(1.0 / period, 3) if period > 0 else None,
+            "achieved_rate": round(self.rate(), 3),
+            "lag_ms": round(self.lag * 1000.0, 3),
+            "max_lag_ms": round(self.max_lag * 1000.0, 3),
+            "catchup": self.catchup,
+            "steps": self.steps,
+            "skipped_rows": self.skipped,
+            "stage_ms": {name: round(ms, 3) for name, ms in self.stages.items()},
+        }
@@ -0,0 +1,211 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from simulation.state_store import SQLiteStateStore
+
+logger = logging.getLogger("terraguard.coordinator")
+
+LEASE_NAME = "simulation-leader"
+
+
+class CommandFailed(Exception):
+    """A command run by the leader raised an HTTP-style error (status_code, detail)."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Coordinator:
+    """Runs simulation operations on exactly one worker process.
+
+    Without a store (the "memory" state backend) this process is always the
+    leader and operations run in place. With a shared store the workers
+    compete for a lease: the holder (the leader) runs the scheduler and
+    executes operations; other workers write them to the store's command
+    queue and wait for the leader's result, and keep their event hubs fed
+    from the database (`on_follow`). When the leader stops renewing its
+    lease another worker takes over within `lease_ttl_s`.
+    """
+
+    def __init__(self, store: Optional[SQLiteStateStore] = None, lease_ttl_s: float = 5.0,
+                 poll_interval_s: float = 0.1, command_timeout_s: float = 60.0):
+        self.store = store
+        self.lease_ttl_s = lease_ttl_s
+        self.poll_interval_s = poll_interval_s
+        self.command_timeout_s = command_timeout_s
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = store is None
+        self.ops: Dict[str, Callable[..., Any]] = {}
+        self._on_elected: List[Callable[[], None]] = []
+        self._on_demoted: List[Callable[[], None]] = []
+        self._on_follow: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._transition = threading.Lock()
+        # set on election; the work loop runs the on_elected callbacks so slow ones never delay lease renewal
+        self._elected = threading.Event()
+        self._stats = {"elections": 0, "commands_run": 0, "commands_sent": 0, "commands_failed": 0}
+
+    # --- wiring ---
+
+    def op(self, name: str):
+        """Register an operation; its kwargs and return value must be JSON-serializable."""
+        def register(fn):
+            self.ops[name] = fn
+            return fn
+        return register
+
+    def on_elected(self, fn: Callable[[], None]):
+        self._on_elected.append(fn)
+        return fn
+
+    def on_demoted(self, fn: Callable[[], None]):
+        self._on_demoted.append(fn)
+        return fn
+
+    def on_follow(self, fn: Callable[[], None]):
+        self._on_follow.append(fn)
+        return fn
+
+    # --- calls ---
+
+    def call(self, op: str, **kwargs) -> Any:
+        """Run operation `op` on the leader and return its result."""
+        if self.is_leader:
+            return self.ops[op](**kwargs)
+        command_id = self.store.submit_command(op, kwargs)
+        self._stats["commands_sent"] += 1
+        deadline = time.monotonic() + self.command_timeout_s
+        delay = 0.005
+        extended = False
+        while True:
+            result = self.store.command_result(command_id)
+            if result is not None:
+                status, payload = result
+                if status == "done":
+                    return payload
+                raise CommandFailed(payload.get("status_code", 500), payload.get("detail"))
+            if time.monotonic() >= deadline:
+                if self.store.cancel_command(command_id):
+                    raise CommandFailed(503, "No simulation leader is available")
+                if extended:
+                    raise CommandFailed(504, f"The simulation leader did not finish '{op}' in time")
+                # the leader is working on it: wait one more lease period
+                deadline = time.monotonic() + self.lease_ttl_s
+                extended = True
+            time.sleep(delay)
+            delay = min(delay * 2, self.poll_interval_s)
+
+    def _run_command(self, command_id: int, name: str, kwargs: Dict[str, Any]):
+        if not self.store.claim_command(command_id):
+            return
+        try:
+            fn = self.ops.get(name)
+            if fn is None:
+                raise CommandFailed(400, f"Unknown operation: {name}")
+            result = fn(**kwargs)
+            self.store.finish_command(command_id, True, result)
+        except Exception as e:
+            # HTTPException and CommandFailed both carry status_code/detail
+            status_code = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or str(e)
+            if status_code >= 500:
+                logger.exception("command %s (%s) failed", command_id, name)
+            self._stats["commands_failed"] += 1
+            self.store.finish_command(command_id, False, {"status_code": status_code, "detail": detail})
+        self._stats["commands_run"] += 1
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self.store is None or self._threads:
+            return
+        self._stop.clear()
+        self._renew()
+        for target, name in ((self._lease_loop, "coordinator-lease"), (self._work_loop, "coordinator-work")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        """Step down (letting another worker take over right away) and stop the background threads."""
+        if self.store is None:
+            return
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+        if self.is_leader:
+            self._set_leader(False)
+            self.store.release_lease(LEASE_NAME, self.worker_id)
+
+    def _renew(self):
+        try:
+            held = self.store.acquire_lease(LEASE_NAME, self.worker_id, self.lease_ttl_s)
+        except Exception:
+            logger.exception("lease renewal failed")
+            held = False
+        self._set_leader(held)
+
+    def _set_leader(self, leader: bool):
+        with self._transition:
+            if leader == self.is_leader:
+                return
+            self.is_leader = leader
+            logger.info("worker %s %s the simulation leader", self.worker_id, "is now" if leader else "is no longer")
+            if leader:
+                self._stats["elections"] += 1
+                self._elected.set()
+                return
+            self._elected.clear()
+            self._run_callbacks(self._on_demoted)
+
+    @staticmethod
+    def _run_callbacks(callbacks):
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                logger.exception("leader transition callback failed")
+
+    def _lease_loop(self):
+        # renew well before expiry; a stalled process loses the lease and stops driving on its next renewal
+        while not self._stop.wait(self.lease_ttl_s / 3.0):
+            self._renew()
+
+    def _work_loop(self):
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                if self.is_leader:
+                    if self._elected.is_set():
+                        self._elected.clear()
+                        self._run_callbacks(self._on_elected)
+                    for command_id, name, kwargs in self.store.pending_commands():
+                        self._run_command(command_id, name, kwargs)
+                    if time.monotonic() - last_prune > 60:
+                        self.store.prune_commands()
+                        last_prune = time.monotonic()
+                else:
+                    for fn in self._on_follow:
+                        fn()
+            except Exception:
+                logger.exception("coordinator loop failed")
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        s["backend"] = "memory" if self.store is None else "sqlite"
+        s["worker_id"] = self.worker_id
+        s["is_leader"] = self.is_leader
+        if self.store is not None:
+            holder = self.store.lease_holder(LEASE_NAME)
+            s["leader"] = holder[0] if holder else None
+            s["lease_expires_in_s"] = round(holder[1] - time.time(), 3) if holder else None
+        return s
@@ -0,0 +1,123 @@
+import glob
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+SOURCE_EXTENSIONS = (".csv", ".xls", ".xlsx")
+
+
+def read_source(path: str) -> pd.DataFrame:
+    # support CSV and Excel
+    if path.lower().endswith('.csv'):
+        return pd.read_csv(path)
+    if path.lower().endswith(('.xls', '.xlsx')):
+        # requires openpyxl or xlrd depending on file type
+        return pd.read_excel(path)
+    # attempt to read with pandas generic loader
+    try:
+        return pd.read_csv(path)
+    except Exception:
+        return pd.DataFrame()
+
+
+def _prefix(path: str) -> str:
+    name = os.path.basename(path)
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f"{name}-{digest}"
+
+
+def cache_stem(path: str, cache_dir: str) -> str:
+    """Cache file stem for the current version of `path` (source path, mtime and size)."""
+    st = os.stat(path)
+    key = hashlib.sha1(f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{_prefix(path)}-{key}")
+
+
+def load(path: str, cache_dir: str) -> Optional[pd.DataFrame]:
+    """Return the cached DataFrame for `path`, or None if there is no valid cache.
+
+    Numeric columns are memory-mapped from a column-major .npy file, so
+    nothing is parsed and pages are only read when touched.
+    """
+    stem = cache_stem(path, cache_dir)
+    try:
+        with open(stem + ".json", "r") as f:
+            schema = json.load(f)
+        if schema.get("version") != CACHE_VERSION:
+            return None
+        numeric = schema["numeric"]
+        if numeric:
+            data = np.load(stem + ".npy", mmap_mode="r")
+            df = pd.DataFrame(data.T, columns=numeric, copy=False)
+        else:
+            df = pd.DataFrame(index=pd.RangeIndex(schema["rows"]))
+        for col, dtype in schema["dtypes"].items():
+            if col in numeric and dtype != "float64":
+                df[col] = df[col].astype(dtype)
+        if len(numeric) != len(schema["columns"]):
+            extra = pd.read_pickle(stem + ".extra.pkl")
+            for col in extra.columns:
+                df[col] = extra[col].to_numpy()
+            df = df[schema["columns"]]
+        return df
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store(path: str, df: pd.DataFrame, cache_dir: str) -> str:
+    """Write the columnar cache for `path` and drop caches of older versions of it."""
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = cache_stem(path, cache_dir)
+    columns = [str(c) for c in df.columns]
+    df = df.set_axis(columns, axis=1)
+    numeric = [
+        c for c in columns
+        if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])
+    ]
+    schema = {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(path),
+        "rows": int(len(df)),
+        "columns": columns,
+        "numeric": numeric,
+        "dtypes": {c: str(df[c].dtype) for c in numeric},
+    }
+
+    # write data first and the schema last, each via rename, so readers never see a partial cache
+    if numeric:
+        data = np.ascontiguousarray(df[numeric].to_numpy(dtype=np.float64).T)
+        with open(stem + ".npy.tmp", "wb") as f:
+            np.save(f, data)
+        os.replace(stem + ".npy.tmp", stem + ".npy")
+    if len(numeric) != len(columns):
+        df[[c for c in columns if c not in numeric]].to_pickle(stem + ".extra.pkl.tmp")
+        os.replace(stem + ".extra.pkl.tmp", stem + ".extra.pkl")
+    with open(stem + ".json.tmp", "w") as f:
+        json.dump(schema, f)
+    os.replace(stem + ".json.tmp", stem + ".json")
+
+    for old in glob.glob(os.path.join(cache_dir, glob.escape(_prefix(path)) + "-*")):
+        if not old.startswith(stem + "."):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return stem
+
+
+def load_or_build(path: str, cache_dir: str) -> pd.DataFrame:
+    df = load(path, cache_dir)
+    if df is not None:
+        return df
+    df = read_source(path)
+    try:
+        store(path, df, cache_dir)
+    except OSError:
+        # read-only data dir etc.: serve from the parsed frame
+        pass
+    return df
@@ -1,35 +1,221 @@
+import threading
+from collections import deque
+import numpy as np
 import pandas as pd
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import os
+from simulation import dataset_cache
+from simulation.chunked_reader import ChunkPrefetcher
+from app.config import DATASET_CACHE, DATASET_CACHE_DIR, DATASET_STREAM_CHUNK_ROWS, DATASET_STREAM_PREFETCH
+
+
+def _to_matrix(df: pd.DataFrame, columns: List[str]):
+    matrix = np.zeros((len(df), len(columns)), dtype=np.float32)
+    for j, col in enumerate(columns):
+        # columns missing from the file stay 0.0, like raw.get(col, 0.0)
+        if col in df.columns:
+            matrix[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float32)
+    matrix[np.isnan(matrix)] = 0.0
+    all_numeric = all(
+        pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])
+        for c in df.columns if str(c) in columns
+    )
+    return np.ascontiguousarray(matrix), all_numeric
+
+
+class _Chunk:
+    def __init__(self, offset: int, df: pd.DataFrame, matrix: np.ndarray):
+        self.offset = offset
+        self.df = df
+        self.matrix = matrix
+        self.records = None
+
+    def __len__(self):
+        return len(self.df)
+
+    def record(self, local: int) -> Dict[str, Any]:
+        if self.records is None:
+            self.records = self.df.to_dict("records")
+        return dict(self.records[local])
+
 
 class DatasetLoader:
-    def __init__(self, csv_path: Optional[str] = None):
+    def __init__(self, csv_path: Optional[str] = None, feature_order: Optional[List[str]] = None,
+                 cache_dir: Optional[str] = None, use_cache: Optional[bool] = None):
         self.csv_path = csv_path
+        use_cache = DATASET_CACHE if use_cache is None else use_cache
+        self.cache_dir = (cache_dir or DATASET_CACHE_DIR) if use_cache else None
         self.df = pd.DataFrame()
+        # model inputs precomputed at load time: float32, NaN -> 0.0, columns in `matrix_columns` order
+        self.feature_order = list(feature_order) if feature_order else None
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.matrix_columns: List[str] = []
+        self.all_numeric = True
+        self._records = None
+        # streaming mode: only the last couple of chunks are kept in memory
+        self._stream: Optional[ChunkPrefetcher] = None
+        self._chunks = deque(maxlen=2)
+        self._next_offset = 0
+        self._stream_lock = threading.RLock()
+        self.chunk_size = DATASET_STREAM_CHUNK_ROWS
+        self.prefetch = DATASET_STREAM_PREFETCH
         if csv_path and os.path.exists(csv_path):
-            self.load(csv_path)
+            self.load(csv_path, feature_order=self.feature_order)
 
-    def load(self, csv_path: str):
+    def load(self, csv_path: str, feature_order: Optional[List[str]] = None, stream: bool = False,
+             chunk_size: Optional[int] = None, prefetch: Optional[int] = None):
+        self._close_stream()
         self.csv_path = csv_path
-        # support CSV and Excel
-        if csv_path.lower().endswith('.csv'):
-            self.df = pd.read_csv(csv_path)
-        elif csv_path.lower().endswith(('.xls', '.xlsx')):
-            # requires openpyxl or xlrd depending on file type
-            self.df = pd.read_excel(csv_path)
+        # None builds the matrix over every column in file order
+        self.feature_order = list(feature_order) if feature_order else None
+        if stream:
+            self.chunk_size = max(16, int(chunk_size or DATASET_STREAM_CHUNK_ROWS))
+            self.prefetch = int(prefetch or DATASET_STREAM_PREFETCH)
+            self._open_stream()
+            return
+        if self.cache_dir and os.path.exists(csv_path):
+            # memory-mapped columnar copy, rebuilt when the source file changes
+            self.df = dataset_cache.load_or_build(csv_path, self.cache_dir)
         else:
-            # attempt to read with pandas generic loader
-            try:
-                self.df = pd.read_csv(csv_path)
-            except Exception:
-                self.df = pd.DataFrame()
+            self.df = dataset_cache.read_source(csv_path)
         self.df.reset_index(drop=True, inplace=True)
+        self._records = None
+        self._build_matrix()
+
+    def set_feature_order(self, feature_order: Optional[List[str]]):
+        """Rebuild the feature matrix for a different model input order (None = all columns)."""
+        self.feature_order = list(feature_order) if feature_order else None
+        with self._stream_lock:
+            if self._stream is not None:
+                self.matrix_columns = self.feature_order or [str(c) for c in self.df.columns]
+                for chunk in self._chunks:
+                    chunk.matrix, self.all_numeric = _to_matrix(chunk.df, self.matrix_columns)
+                return
+        self._build_matrix()
+
+    def _build_matrix(self):
+        self.matrix_columns = self.feature_order or [str(c) for c in self.df.columns]
+        self.matrix, self.all_numeric = _to_matrix(self.df, self.matrix_columns)
+
+    # --- streaming mode -------------------------------------------------
+
+    def is_streaming(self) -> bool:
+        return self._stream is not None
+
+    def _close_stream(self):
+        with self._stream_lock:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = None
+            self._chunks.clear()
+            self._next_offset = 0
+
+    def _open_stream(self):
+        with self._stream_lock:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = ChunkPrefetcher(self.csv_path, self.chunk_size, self.prefetch)
+            self._chunks.clear()
+            self._next_offset = 0
+            self.matrix_columns = []
+            # wait for the first chunk only, so bad files still fail the load
+            if not self._pull_chunk() and self._stream.error:
+                error = self._stream.error
+                self._close_stream()
+                raise ValueError(error)
+
+    def _pull_chunk(self) -> bool:
+        df = self._stream.next_chunk()
+        if df is None:
+            return False
+        df.reset_index(drop=True, inplace=True)
+        if not self.matrix_columns:
+            self.matrix_columns = self.feature_order or [str(c) for c in df.columns]
+        matrix, self.all_numeric = _to_matrix(df, self.matrix_columns)
+        self._chunks.append(_Chunk(self._next_offset, df, matrix))
+        self._next_offset += len(df)
+        self.df = df
+        self.matrix = matrix
+        return True
+
+    def _locate(self, index: int):
+        """(chunk, local index) for a streamed row, reading ahead as needed; None past the end."""
+        with self._stream_lock:
+            if index < 0:
+                return None
+            if not self._chunks or index < self._chunks[0].offset:
+                # rows before the retained window were dropped: start the file over (e.g. after reset)
+                self._open_stream()
+            while index >= self._next_offset:
+                if not self._pull_chunk():
+                    return None
+            for chunk in self._chunks:
+                if chunk.offset <= index < chunk.offset + len(chunk):
+                    return chunk, index - chunk.offset
+            return None
+
+    # --- row access -----------------------------------------------------
+
+    def has_row(self, index: int) -> bool:
+        """True if row `index` exists; in streaming mode this waits for it to be read."""
+        if self._stream is not None:
+            return self._locate(index) is not None
+        return 0 <= index < len(self.df)
+
+    def row_features(self, index: int) -> np.ndarray:
+        """Zero-copy view of one row of the feature matrix."""
+        if self._stream is not None:
+            found = self._locate(index)
+            if found is None:
+                raise IndexError("Index out of bounds")
+            chunk, local = found
+            return chunk.matrix[local]
+        if index < 0 or index >= len(self.matrix):
+            raise IndexError("Index out of bounds")
+        return self.matrix[index]
+
+    def window(self, start: int, stop: int) -> np.ndarray:
+        """Zero-copy view of rows [start, stop) of the feature matrix."""
+        if self._stream is not None:
+            with self._stream_lock:
+                if start < 0 or start >= stop:
+                    raise IndexError("Window out of bounds")
+                # read up to the last row first; windows are far shorter than a chunk,
+                # so the first row is then always in the current or previous chunk
+                last = self._locate(stop - 1)
+                first = self._locate(start) if last is not None else None
+                if first is None or last is None:
+                    raise IndexError("Window out of bounds")
+                if first[0] is last[0]:
+                    return first[0].matrix[first[1]:last[1] + 1]
+                # window straddles a chunk boundary: the only case that copies
+                return np.concatenate([first[0].matrix[first[1]:], last[0].matrix[:last[1] + 1]])
+        if start < 0 or stop > len(self.matrix) or start >= stop:
+            raise IndexError("Window out of bounds")
+        return self.matrix[start:stop]
 
     def get_row(self, index: int) -> Dict[str, Any]:
+        if self._stream is not None:
+            found = self._locate(index)
+            if found is None:
+                raise IndexError("Index out of bounds")
+            chunk, local = found
+            return chunk.record(local)
         if index < 0 or index >= len(self.df):
             raise IndexError("Index out of bounds")
-        return self.df.iloc[index].to_dict()
+        if self._records is None:
+            # one bulk conversion instead of an iloc[...].to_dict() per step
+            self._records = self.df.to_dict("records")
+        return dict(self._records[index])
 
     def length(self):
+        if self._stream is not None:
+            stream = self._stream
+            if stream.done:
+                return stream.rows_read
+            # still reading: best estimate, never below what has been parsed
+            return max(stream.estimated_rows or 0, stream.rows_read)
         return len(self.df)
- 
\ No newline at end of file
+
+    def length_exact(self) -> bool:
+        return self._stream is None or self._stream.done
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils import sanitize_floats
+
+
+class Event:
+    """One published message, JSON-encoded once and shared by every subscriber."""
+
+    __slots__ = ("type", "id", "prev_id", "data", "coalesce")
+
+    def __init__(self, type: str, payload: Any, id: Optional[int] = None, coalesce: bool = False,
+                 prev_id: Optional[int] = None):
+        self.type = type
+        self.id = id
+        # id of the record published before this one on the same hub; ids are shared across sessions,
+        # so consecutive records of a session aren't necessarily consecutive numbers
+        self.prev_id = prev_id
+        self.data = json.dumps(sanitize_floats(payload))
+        self.coalesce = coalesce
+
+    def sse(self) -> str:
+        # only record events carry an id, so a reconnecting EventSource sends the last record id back
+        head = f"id: {self.id}\n" if self.id is not None else ""
+        return f"{head}event: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    """Per-client bounded buffer.
+
+    Records beyond `maxsize` drop the oldest ones (the client is told how
+    many, so it can backfill from `/simulation/history`); coalescing events
+    such as status updates only keep the latest.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(1, int(maxsize))
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._latest: Dict[str, Event] = {}
+        self._dropped = 0
+        self.dropped_total = 0
+        self._wake: Optional[Callable[[], None]] = None
+        self._async_event: Optional[asyncio.Event] = None
+
+    def push(self, event: Event):
+        with self._lock:
+            if event.coalesce:
+                self._latest[event.type] = event
+            else:
+                if len(self._events) >= self.maxsize:
+                    self._events.popleft()
+                    self._dropped += 1
+                    self.dropped_total += 1
+                self._events.append(event)
+            wake = self._wake
+        if wake is not None:
+            wake()
+
+    def pending(self) -> bool:
+        return bool(self._events or self._latest or self._dropped)
+
+    def drain(self) -> List[Event]:
+        with self._lock:
+            out = []
+            if self._dropped:
+                first = self._events[0].id if self._events else None
+                out.append(Event("dropped", {"count": self._dropped, "before_id": first}))
+                self._dropped = 0
+            out.extend(self._events)
+            self._events.clear()
+            out.extend(self._latest.values())
+            self._latest.clear()
+            return out
+
+    async def wait(self, timeout: float):
+        """Wait (without blocking the event loop) until something is pending or `timeout` passes."""
+        if self._async_event is None:
+            loop = asyncio.get_running_loop()
+            self._async_event = asyncio.Event()
+            event = self._async_event
+
+            def wake():
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    # loop already closed
+                    pass
+
+            self._wake = wake
+        self._async_event.clear()
+        if self.pending():
+            return
+        try:
+            await asyncio.wait_for(self._async_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class PubSubHub:
+    """In-process fan-out of simulation events to live subscribers.
+
+    The last `replay_size` record events are kept so a reconnecting client
+    can resume from the last record id it saw.
+    """
+
+    def __init__(self, replay_size: int = 1000, client_buffer: int = 256):
+        self.client_buffer = client_buffer
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._replay = deque(maxlen=max(0, int(replay_size)))
+        self.published = 0
+        self.last_id: Optional[int] = None
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, type: str, payload: Any, id: Optional[int] = None, coalesce: bool = False):
+        prev_id = self.last_id
+        if id is not None:
+            self.last_id = id
+        if not self._subscribers and (id is None or not self._replay.maxlen):
+            return
+        event = Event(type, payload, id=id, coalesce=coalesce, prev_id=prev_id)
+        with self._lock:
+            if id is not None:
+                self._replay.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for sub in subscribers:
+            sub.push(event)
+
+    def subscribe(self, since_id: Optional[int] = None, buffer: Optional[int] = None) -> Subscription:
+        sub = Subscription(buffer or self.client_buffer)
+        with self._lock:
+            if since_id is not None and self.last_id is not None and since_id < self.last_id:
+                missed = [event for event in self._replay if event.id > since_id]
+                if not missed or missed[0].prev_id is None or missed[0].prev_id > since_id:
+                    # the records the client missed are no longer (or were never) buffered
+                    sub.push(Event("resync", {"since_id": since_id}))
+                for event in missed:
+                    sub.push(event)
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def clear_replay(self):
+        with self._lock:
+            self._replay.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "replay_buffered": len(self._replay),
+                "dropped": sum(s.dropped_total for s in self._subscribers),
+            }
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("terraguard.replay")
+
+
+class ReplayJob:
+    """Fast-forward scoring of a session's remaining rows on a background thread.
+
+    Rows are taken `chunk_size` at a time from the session's cursor: one
+    batched model call, one batched alert evaluation and one bulk insert per
+    chunk, producing the records the real-time loop would. Progress is kept
+    in the session state under "replay" (so every worker can report it) and
+    `cancel()` stops the job after the chunk in progress.
+    """
+
+    def __init__(self, controller, chunk_size: int):
+        self.controller = controller
+        self.chunk_size = max(1, int(chunk_size))
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.progress: Dict[str, Any] = {}
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        ctl = self.controller
+        start = ctl.state.get()["current_index"]
+        total = ctl.dataset.length()
+        self.progress = {
+            "status": "running",
+            "chunk_size": self.chunk_size,
+            "start_index": start,
+            "current_index": start,
+            "total": total,
+            "total_exact": ctl.dataset.length_exact(),
+            "processed": 0,
+            "chunks": 0,
+            "rows_per_s": 0.0,
+            "elapsed_s": 0.0,
+            "eta_s": None,
+            "error": None,
+        }
+        ctl.state.update(replay=dict(self.progress))
+        self._thread = threading.Thread(target=self._run, name=f"replay-{ctl.name}", daemon=True)
+        self._thread.start()
+
+    def cancel(self, wait: bool = True):
+        self._cancel.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        ctl = self.controller
+        t0 = time.perf_counter()
+        index = self.progress["start_index"]
+        status, error = "done", None
+        try:
+            while True:
+                if self._cancel.is_set():
+                    status = "cancelled"
+                    break
+                steps = ctl.prepare_chunk(index, self.chunk_size)
+                if not steps:
+                    break
+                ctl.finish_chunk(steps)
+                index = steps[-1].idx + 1
+                self._report(index, t0, "running")
+        except Exception as e:
+            logger.exception("replay of session %s failed", ctl.name)
+            status, error = "failed", str(e)
+        self.progress["error"] = error
+        self._report(index, t0, status)
+        ctl.db.flush()
+        ctl._publish_status()
+
+    def _report(self, index: int, t0: float, status: str):
+        ctl = self.controller
+        elapsed = time.perf_counter() - t0
+        processed = index - self.progress["start_index"]
+        total = ctl.dataset.length()
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        self.progress.update(
+            status=status,
+            current_index=index,
+            total=total,
+            total_exact=ctl.dataset.length_exact(),
+            processed=processed,
+            chunks=self.progress["chunks"] + (status == "running"),
+            rows_per_s=round(rate, 1),
+            elapsed_s=round(elapsed, 3),
+            eta_s=round((total - index) / rate, 1) if rate > 0 and status == "running" else None,
+        )
+        ctl.state.update(replay=dict(self.progress))
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+from app.config import SCHEDULER_COALESCE_MS
+from app.metrics import metrics
+
+logger = logging.getLogger("terraguard.scheduler")
+
+
+class SimulationScheduler:
+    """Drives every running simulation session from one thread.
+
+    On each tick the sessions whose next step is due are collected, their
+    model inputs are grouped by model and scored with one `predict_batch`
+    call per model, and then each session finishes its own step (alerts,
+    storage, events). When a step is due is up to the session's clock
+    (simulation/clock.py: absolute deadlines `speed` seconds apart); sessions
+    falling due within one tick of each other are run in the same tick.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # id(controller) -> [controller, next_due (monotonic)]
+        self._sessions: Dict[int, List[Any]] = {}
+        # held for a whole tick; remove() takes it so no step runs after a session is stopped
+        self._tick_lock = threading.Lock()
+        self._thread = None
+        self._last_tick = 0.0
+        self._stats = {"ticks": 0, "steps": 0, "model_calls": 0, "max_batch_size": 0}
+
+    def add(self, controller):
+        with self._cond:
+            self._sessions[id(controller)] = [controller, time.monotonic()]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="simulation-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def remove(self, controller):
+        if threading.current_thread() is self._thread:
+            self._discard(controller)
+            return
+        with self._tick_lock:
+            self._discard(controller)
+
+    def _discard(self, controller):
+        with self._cond:
+            self._sessions.pop(id(controller), None)
+
+    def is_scheduled(self, controller) -> bool:
+        return id(controller) in self._sessions
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._sessions:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    if any(entry[1] <= now for entry in self._sessions.values()):
+                        # also take sessions due before this tick would end: they'd otherwise wait
+                        # for it anyway and then run alone, never lining up with the others
+                        horizon = now + max(SCHEDULER_COALESCE_MS / 1000.0, self._last_tick)
+                        due = [entry[0] for entry in self._sessions.values() if entry[1] <= horizon]
+                        break
+                    self._cond.wait(min(entry[1] for entry in self._sessions.values()) - now)
+            with self._tick_lock:
+                t0 = time.monotonic()
+                try:
+                    self._tick(due)
+                except Exception:
+                    logger.exception("simulation tick failed")
+                self._last_tick = time.monotonic() - t0
+
+    def _tick(self, controllers):
+        steps = []
+        for ctl in controllers:
+            if not self.is_scheduled(ctl):
+                continue
+            try:
+                step = ctl.prepare_step()
+            except Exception:
+                logger.exception("session %s failed to prepare a step", getattr(ctl, "name", "?"))
+                step = None
+            if step is None:
+                # stopped or out of data
+                self._discard(ctl)
+                continue
+            steps.append((ctl, step))
+
+        # one batched call per model across every due session
+        groups: Dict[int, list] = {}
+        for ctl, step in steps:
+            if step.model is not None and step.error is None:
+                groups.setdefault(id(step.model), []).append((ctl, step))
+        for group in groups.values():
+            t0 = time.perf_counter()
+            try:
+                preds = group[0][1].model.predict_batch([s.input for _, s in group])
+                for (_, s), pred in zip(group, preds):
+                    s.pred = pred
+            except Exception as e:
+                metrics.swallowed("scheduler", "predict_batch")
+                for _, s in group:
+                    s.error = str(e)
+            elapsed = time.perf_counter() - t0
+            for ctl, _ in group:
+                ctl.clock.stage("model", elapsed)
+            self._stats["model_calls"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(group))
+
+        for ctl, step in steps:
+            try:
+                ctl.finish_step(step)
+            except Exception:
+                logger.exception("session %s failed to finish a step", getattr(ctl, "name", "?"))
+                # keep the schedule moving rather than retrying at once
+                ctl.clock.advance(max(0.0, float(step.speed)), step.skipped)
+            with self._cond:
+                entry = self._sessions.get(id(ctl))
+                if entry is not None:
+                    entry[1] = ctl.clock.next_due
+        self._stats["ticks"] += 1
+        self._stats["steps"] += len(steps)
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        s["sessions"] = len(self._sessions)
+        s["mean_batch_size"] = round(s["steps"] / s["model_calls"], 3) if s["model_calls"] else 0.0
+        return s
+
+
+scheduler = SimulationScheduler()
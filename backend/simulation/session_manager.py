@@ -0,0 +1,103 @@
+import re
+import threading
+from typing import Dict, List, Optional, Set
+
+from alerts.alert_engine import AlertEngine
+from database.db_manager import DBManager
+from simulation.dataset_loader import DatasetLoader
+from simulation.scheduler import SimulationScheduler, scheduler as shared_scheduler
+from simulation.simulation_controller import SimulationController
+from simulation.state_manager import StateManager
+from simulation.state_store import SQLiteStateStore, SharedStateManager
+
+SESSION_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class SessionManager:
+    """Named simulation sessions sharing the models, the database and one scheduler.
+
+    Each session has its own dataset, state (cursor, speed, mode), alert
+    history, event hub and record namespace in the database. With a shared
+    state `store` the session list lives in the store, so sessions created
+    by the leader worker show up in every other worker as well.
+    """
+
+    def __init__(self, db: DBManager, classification_model=None, regression_model=None,
+                 scheduler: Optional[SimulationScheduler] = None, store: Optional[SQLiteStateStore] = None):
+        self.db = db
+        self.class_model = classification_model
+        self.reg_model = regression_model
+        self.scheduler = scheduler or shared_scheduler
+        self.store = store
+        self._sessions: Dict[str, SimulationController] = {}
+        self._registered: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, controller: SimulationController):
+        # registered sessions (e.g. "default") always exist, whether or not the store has a row for them yet
+        with self._lock:
+            self._sessions[name] = controller
+            self._registered.add(name)
+
+    def create(self, name: str) -> SimulationController:
+        if not SESSION_NAME.match(name or ""):
+            raise ValueError("session name must be 1-64 characters of letters, digits, '_', '-' or '.'")
+        with self._lock:
+            if name in self._sessions or (self.store is not None and self.store.has_session(name)):
+                raise KeyError(name)
+            controller = self._add(name)
+            if self.store is not None:
+                # the state row is what makes the session exist for the other workers
+                controller.state.update()
+            return controller
+
+    def _add(self, name: str) -> SimulationController:
+        state = StateManager() if self.store is None else SharedStateManager(self.store, name)
+        controller = SimulationController(
+            DatasetLoader(), state, self.db.namespace(name),
+            self.class_model, self.reg_model, AlertEngine(),
+            scheduler=self.scheduler, name=name,
+        )
+        self._sessions[name] = controller
+        return controller
+
+    def get(self, name: str) -> SimulationController:
+        with self._lock:
+            if self.store is not None and name not in self._registered:
+                # the store is the source of truth: pick up sessions created and drop sessions deleted elsewhere
+                if not self.store.has_session(name):
+                    self._sessions.pop(name, None)
+                    raise KeyError(name)
+                if name not in self._sessions:
+                    return self._add(name)
+            return self._sessions[name]
+
+    def names(self) -> List[str]:
+        if self.store is not None:
+            names = [n for n in self.store.sessions() if n not in self._registered]
+            return list(self._registered) + names
+        with self._lock:
+            return list(self._sessions)
+
+    def controllers(self) -> List[SimulationController]:
+        """Controllers of the sessions known to this process."""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def list(self) -> List[dict]:
+        controllers = []
+        for name in self.names():
+            try:
+                controllers.append(self.get(name))
+            except KeyError:
+                continue
+        return [c.status() for c in controllers]
+
+    def delete(self, name: str, purge: bool = True):
+        with self._lock:
+            controller = self._sessions.pop(name)
+        controller.stop()
+        if purge:
+            controller.db.reset()
+        if self.store is not None:
+            self.store.delete_session(name)
@@ -1,13 +1,41 @@
+import json
 import threading
 import time
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional
 from simulation.dataset_loader import DatasetLoader
 from simulation.state_manager import StateManager
 from models.classification_model import ClassificationModel
 from models.regression_model import RegressionModel
 from alerts.alert_engine import AlertEngine
 from database.db_manager import DBManager
+from simulation.pubsub import PubSubHub
+from simulation.scheduler import SimulationScheduler, scheduler as shared_scheduler
+from simulation.replay import ReplayJob
+from simulation.clock import SessionClock, CATCHUP_POLICIES
+from app.metrics import metrics
+from app.config import STREAM_REPLAY_SIZE, STREAM_CLIENT_BUFFER, SCHEDULER_CATCHUP
+
+
+class Step:
+    """One simulation step between prepare_step() and finish_step()."""
+
+    __slots__ = ("idx", "raw", "timestamp", "mode", "speed", "model", "input", "pred", "error", "skipped")
+
+    def __init__(self, idx: int, raw: dict, timestamp: str, mode: str, speed: float):
+        self.idx = idx
+        self.raw = raw
+        self.timestamp = timestamp
+        self.mode = mode
+        self.speed = speed
+        # model to call with `input` (None: no model configured); filled in by the scheduler
+        self.model = None
+        self.input: Any = None
+        self.pred: Optional[dict] = None
+        self.error: Optional[str] = None
+        # rows skipped before this one to catch up with the clock
+        self.skipped = 0
+
 
 class SimulationController:
     def __init__(self,
@@ -16,120 +44,368 @@ class SimulationController:
                  db_manager: DBManager,
                  classification_model: Optional[ClassificationModel] = None,
                  regression_model: Optional[RegressionModel] = None,
-                 alert_engine: Optional[AlertEngine] = None):
+                 alert_engine: Optional[AlertEngine] = None,
+                 events: Optional[PubSubHub] = None,
+                 scheduler: Optional[SimulationScheduler] = None,
+                 name: str = "default"):
         self.dataset = dataset_loader
         self.state = state_manager
         self.db = db_manager
         self.class_model = classification_model
         self.reg_model = regression_model
         self.alert_engine = alert_engine or AlertEngine()
-        self._thread = None
-        self._stop_event = threading.Event()
+        self.name = name
+        # steps are driven by the shared scheduler, batched with every other running session
+        self.scheduler = scheduler or shared_scheduler
         self._thread_lock = threading.Lock()
         self._prev_output = None
+        # live records and status changes for /simulation/stream
+        self.events = events or PubSubHub(STREAM_REPLAY_SIZE, STREAM_CLIENT_BUFFER)
+        # (generation, last record id published, last status published) for follow()
+        self._followed = None
+        self._replay: Optional[ReplayJob] = None
+        # absolute-deadline pacing, lag and per-stage step times
+        self.clock = SessionClock(SCHEDULER_CATCHUP)
+
+    def _publish_status(self):
+        if self.events.has_subscribers():
+            self.events.publish("status", self.status(), coalesce=True)
 
     def start(self):
         with self._thread_lock:
             if self.state.get()["running"]:
                 return
             self.state.update(running=True)
-            self._stop_event.clear()
-            self._thread = threading.Thread(target=self._run_loop, daemon=True)
-            self._thread.start()
+            self.clock.start()
+            self.scheduler.add(self)
+        self._publish_status()
+
+    def replaying(self) -> bool:
+        return self._replay is not None and self._replay.active
+
+    def start_replay(self, chunk_size: int):
+        """Score the rest of the dataset in chunks on a background thread (see simulation/replay.py)."""
+        with self._thread_lock:
+            if self.state.get()["running"] or self.replaying():
+                raise RuntimeError("the session is already running")
+            self._replay = ReplayJob(self, chunk_size)
+            self._replay.start()
+        self._publish_status()
+
+    def cancel_replay(self):
+        job = self._replay
+        if job is not None:
+            job.cancel()
 
     def stop(self):
+        self.cancel_replay()
         with self._thread_lock:
             self.state.update(running=False)
-            self._stop_event.set()
-            if self._thread:
-                self._thread.join(timeout=2)
-                self._thread = None
+            # waits for a step in progress, so nothing is recorded after stop() returns
+            self.scheduler.remove(self)
+        # make every record produced so far visible/durable
+        self.db.flush()
+        self._publish_status()
+
+    def resume(self):
+        """Schedule a session whose shared state says it is running (after this worker became the leader)."""
+        with self._thread_lock:
+            s = self.state.get()
+            if s["running"] and self.dataset.length():
+                self.clock.start()
+                self.scheduler.add(self)
+            replay = s.get("replay")
+            if replay and replay.get("status") == "running" and not self.replaying():
+                # the worker running it went away
+                self.state.update(replay={**replay, "status": "interrupted", "eta_s": None})
+
+    def detach(self):
+        """Stop driving the session without changing its state (this worker is no longer the leader)."""
+        self.cancel_replay()
+        with self._thread_lock:
+            self.scheduler.remove(self)
+        self.db.flush()
 
     def reset(self):
         self.stop()
         self.state.reset_index()
         self.db.reset()
         self._prev_output = None
+        # sustained / rate-of-change state belongs to the previous run
+        self.alert_engine.reset()
+        self.events.clear_replay()
+        self.events.publish("reset", {})
+        self._publish_status()
 
     def set_speed(self, speed: float):
         self.state.update(speed=float(speed))
+        self._publish_status()
+
+    def set_catchup(self, policy: str):
+        if policy not in CATCHUP_POLICIES:
+            raise ValueError("catchup must be 'burst' or 'skip'")
+        self.state.update(catchup=policy)
+        self._publish_status()
 
     def set_mode(self, mode: str):
         if mode not in ("classification", "regression"):
             raise ValueError("mode must be 'classification' or 'regression'")
         self.state.update(mode=mode)
+        self._publish_status()
 
     def status(self):
         s = self.state.get()
-        s["dataset_length"] = self.dataset.length()
+        s["session"] = self.name
+        # on a non-leader worker the dataset is only loaded in the leader: keep the length it recorded
+        if self.dataset.length() or "dataset_length" not in s:
+            s["dataset_length"] = self.dataset.length()
+            # False while a streamed dataset is still being read (length is an estimate)
+            s["dataset_length_exact"] = self.dataset.length_exact()
         return s
 
-    def history(self, limit: int = 1000):
-        return self.db.fetch_history(limit=limit)
+    def follow(self, limit: int = 500, prime: bool = False):
+        """Publish the records and status the leader worker wrote since the last call (non-leader workers).
 
-    def _run_loop(self):
-        while not self._stop_event.is_set():
-            s = self.state.get()
-            if not s["running"]:
-                break
-            idx = s["current_index"]
-            if idx >= self.dataset.length():
-                self.state.update(running=False)
+        Only runs while someone is subscribed; `prime` starts following before the first subscriber joins.
+        """
+        if not prime and not self.events.has_subscribers():
+            self._followed = None
+            return
+        generation, last_id = self.db.history_version()
+        if self._followed is None:
+            # start from the current end of the history; older records come from /simulation/history
+            self._followed = (generation, last_id, None)
+            self.events.clear_replay()
+            self.events.last_id = last_id or None
+        seen_generation, seen_id, seen_status = self._followed
+        if generation != seen_generation:
+            seen_id = 0
+            self.events.clear_replay()
+            self.events.publish("reset", {})
+        while last_id > seen_id:
+            rows = self.db.fetch_history(since_id=seen_id, limit=limit)
+            if not rows:
                 break
-            raw = self.dataset.get_row(idx)
-            timestamp = datetime.utcnow().isoformat() 
-            mode = s["mode"]
-            model_output = {}
-            interpreted_risk = 0
-            try:
-                if mode == "classification":
-                    if self.class_model is not None:
-                        feature_order = getattr(self.class_model, "feature_order", None)
-
-                        if feature_order:
-                            features = [
-                                float(raw.get(col, 0.0) or 0.0)
-                                for col in feature_order
-                            ]
-                        else:
-                            features = [
-                                float(v)
-                                for v in raw.values()
-                                if isinstance(v, (int, float))
-                            ][:33]
-
-                        pred = self.class_model.predict(features)
-                    else:
-                        pred = {"prediction": 0, "confidence": 0.0}
+            for row in rows:
+                self.events.publish("record", row, id=row["id"])
+            seen_id = rows[-1]["id"]
+        status = self.status()
+        # compared as JSON: NaN in last_prediction never equals itself
+        encoded = json.dumps(status, sort_keys=True, default=str)
+        if encoded != seen_status and self.events.has_subscribers():
+            self.events.publish("status", status, coalesce=True)
+        self._followed = (generation, seen_id, encoded)
 
-                    model_output = pred
-                    interpreted_risk = int(pred.get("prediction", 0))
+    def history(self, limit: int = 1000, since_id: Optional[int] = None, before_id: Optional[int] = None,
+                latest: bool = False):
+        return self.db.fetch_history(limit=limit, since_id=since_id, before_id=before_id, latest=latest)
 
-                    displacement = float(raw.get("Displacement", 0.0))
-                    model_output["displacement_value"] = displacement
+    def prepare_step(self) -> Optional[Step]:
+        """Read the current row and build the model input; None once stopped or out of data."""
+        t0 = time.perf_counter()
+        s = self.state.get()
+        if not s["running"]:
+            return None
+        self.clock.catchup = s.get("catchup") or self.clock.catchup
+        skipped = self.clock.begin(max(0.0, float(s["speed"])))
+        idx = s["current_index"] + skipped
+        if not self.dataset.has_row(idx):
+            self.state.update(running=False)
+            self._publish_status()
+            return None
+        step = self._build_step(idx, s)
+        step.skipped = skipped
+        self.clock.stage("prepare", time.perf_counter() - t0)
+        return step
+
+    def _build_step(self, idx: int, s: dict) -> Step:
+        raw = self.dataset.get_row(idx)
+        step = Step(idx, raw, datetime.utcnow().isoformat(), s["mode"], s["speed"])
+        try:
+            if step.mode == "classification":
+                if self.class_model is not None:
+                    feature_order = getattr(self.class_model, "feature_order", None)
 
+                    if (feature_order and self.dataset.matrix_columns == list(feature_order)
+                            and self.dataset.all_numeric):
+                        # precomputed at load time in the model's order; just a row view
+                        features = self.dataset.row_features(idx)
+                    elif feature_order:
+                        features = [
+                            float(raw.get(col, 0.0) or 0.0)
+                            for col in feature_order
+                        ]
+                    elif self.dataset.feature_order is None and self.dataset.all_numeric:
+                        features = self.dataset.row_features(idx)[:33]
+                    else:
+                        features = [
+                            float(v)
+                            for v in raw.values()
+                            if isinstance(v, (int, float))
+                        ][:33]
+                    step.model, step.input = self.class_model, features
+            else:
+                start = max(0, idx - 4)
+                if self.dataset.feature_order is None and self.dataset.all_numeric:
+                    # matrix holds every column in file order, same as row.values(); a non-numeric
+                    # column would be coerced to 0.0 there, so those keep the row path below
+                    window = self.dataset.window(start, idx + 1)
                 else:
                     window = []
-                    start = max(0, idx - 4)
                     for i in range(start, idx + 1):
                         row = self.dataset.get_row(i)
                         window.append([v for v in row.values()])
-                    pred = self.reg_model.predict(window) if self.reg_model else {"risk_score": 0.0, "base_predictions": []}
-                    model_output = pred
-                    interpreted_risk = int(round(pred.get("risk_score", 0.0)))
-                    model_output["hazard_level"] = interpreted_risk
-                    model_output["displacement_value"] = pred.get("risk_score", 0.0)
-            except Exception as e:
-                model_output = {"error": str(e)}
+                if self.reg_model is not None:
+                    step.model, step.input = self.reg_model, window
+        except Exception as e:
+            metrics.swallowed("simulation", "build_step")
+            step.error = str(e)
+        return step
+
+    def _interpret(self, step: Step):
+        """(model_output, interpreted risk) for a step whose prediction is in."""
+        raw, mode = step.raw, step.mode
+        model_output = {}
+        interpreted_risk = 0
+        try:
+            if step.error is not None:
+                raise RuntimeError(step.error)
+            if mode == "classification":
+                pred = step.pred if step.model is not None else {"prediction": 0, "confidence": 0.0}
+
+                model_output = pred
+                interpreted_risk = int(pred.get("prediction", 0))
+
+                displacement = float(raw.get("Displacement", 0.0))
+                model_output["displacement_value"] = displacement
+
+            else:
+                pred = step.pred if step.model is not None else {"risk_score": 0.0, "base_predictions": []}
+                model_output = pred
+                interpreted_risk = int(round(pred.get("risk_score", 0.0)))
+                model_output["hazard_level"] = interpreted_risk
+                model_output["displacement_value"] = pred.get("risk_score", 0.0)
+        except Exception as e:
+            metrics.swallowed("simulation", "interpret")
+            model_output = {"error": str(e)}
+        return model_output, interpreted_risk
+
+    @staticmethod
+    def _outcome(alert: dict, interpreted_risk: int):
+        """(hazard level, alert message) stored with a record."""
+        hazard_level = alert.get("hazard_level")
 
-            alert = self.alert_engine.evaluate(timestamp, mode, model_output, self._prev_output)
-            hazard_level = alert.get("hazard_level")
+        if hazard_level is None:
+            hazard_level = interpreted_risk
 
-            if hazard_level is None:
-                hazard_level = interpreted_risk
+        return int(hazard_level), alert.get("alert_message", "")
 
-            hazard_level = int(hazard_level)
-            self.db.insert_record(timestamp, mode, dict(raw), model_output, hazard_level, alert.get("alert_message", ""))
-            self._prev_output = {**model_output, "hazard_level": alert.get("hazard_level"), "displacement_value": alert.get("displacement_value")}
-            self.state.update(current_index=idx+1, last_prediction=self._prev_output)
-            time.sleep(max(0.0, float(s["speed"])))
+    def _publish_record(self, record_id: int, step: Step, model_output: dict, hazard_level: int, alert_message: str):
+        # same shape as a /simulation/history item
+        self.events.publish("record", {
+            "id": record_id,
+            "timestamp": step.timestamp,
+            "mode": step.mode,
+            "raw_row": step.raw,
+            "model_output": model_output,
+            "risk_level": hazard_level,
+            "alert_message": alert_message,
+        }, id=record_id)
+
+    def finish_step(self, step: Step):
+        """Interpret the prediction, evaluate alerts, store and publish the record, advance the cursor."""
+        t0 = time.perf_counter()
+        model_output, interpreted_risk = self._interpret(step)
+        alert = self.alert_engine.evaluate(step.timestamp, step.mode, model_output, self._prev_output)
+        hazard_level, alert_message = self._outcome(alert, interpreted_risk)
+        t1 = time.perf_counter()
+        record_id = self.db.insert_record(step.timestamp, step.mode, dict(step.raw), model_output, hazard_level, alert_message)
+        t2 = time.perf_counter()
+        self._publish_record(record_id, step, model_output, hazard_level, alert_message)
+        t3 = time.perf_counter()
+        self.clock.stage("alerts", t1 - t0)
+        self.clock.stage("store", t2 - t1)
+        self.clock.stage("publish", t3 - t2)
+        period = max(0.0, float(step.speed))
+        self.clock.advance(period, step.skipped)
+        metrics.rows("simulation", step.mode)
+        self._prev_output = self.alert_engine.chain(model_output, alert)
+        self.state.update(current_index=step.idx + 1, last_prediction=self._prev_output,
+                          clock=self.clock.snapshot(period))
+        self._publish_status()
+
+    def prepare_chunk(self, start: int, size: int) -> List[Step]:
+        """Steps for rows [start, start + size) (fewer at the end of the data), as prepare_step() would build them.
+
+        Classification inputs are cut from the feature matrix in one slice when it is in the model's order.
+        """
+        s = self.state.get()
+        feature_order = getattr(self.class_model, "feature_order", None)
+        if (s["mode"] == "classification" and self.class_model is not None and feature_order
+                and self.dataset.matrix_columns == list(feature_order) and self.dataset.all_numeric
+                and not self.dataset.is_streaming()):
+            stop = min(start + size, self.dataset.length())
+            if stop <= start:
+                return []
+            block = self.dataset.window(start, stop)
+            steps = []
+            for idx, features in zip(range(start, stop), block):
+                step = Step(idx, self.dataset.get_row(idx), datetime.utcnow().isoformat(), s["mode"], s["speed"])
+                step.model, step.input = self.class_model, features
+                steps.append(step)
+            return steps
+        steps = []
+        idx = start
+        while idx < start + size and self.dataset.has_row(idx):
+            steps.append(self._build_step(idx, s))
+            idx += 1
+        return steps
+
+    def finish_chunk(self, steps: List[Step]):
+        """finish_step() for consecutive steps of one mode: one model call, batched alerts, one bulk insert."""
+        if not steps:
+            return
+        scored = [s for s in steps if s.model is not None and s.error is None]
+        if scored:
+            try:
+                with metrics.stage("replay", "model"):
+                    preds = scored[0].model.predict_batch([s.input for s in scored])
+                for s, pred in zip(scored, preds):
+                    s.pred = pred
+            except Exception as e:
+                metrics.swallowed("replay", "model")
+                for s in scored:
+                    s.error = str(e)
+        interpreted = [self._interpret(s) for s in steps]
+        outputs = [o for o, _ in interpreted]
+        mode = steps[0].mode
+        with metrics.stage("replay", "alerts"):
+            alerts = self.alert_engine.evaluate_batch([s.timestamp for s in steps], mode, outputs, self._prev_output)
+        outcomes = [self._outcome(a, risk) for a, (_, risk) in zip(alerts, interpreted)]
+        with metrics.stage("replay", "store"):
+            ids = self.db.insert_records([
+                (s.timestamp, mode, dict(s.raw), o, hazard_level, alert_message)
+                for s, o, (hazard_level, alert_message) in zip(steps, outputs, outcomes)
+            ])
+        with metrics.stage("replay", "publish"):
+            for record_id, s, o, (hazard_level, alert_message) in zip(ids, steps, outputs, outcomes):
+                self._publish_record(record_id, s, o, hazard_level, alert_message)
+        metrics.rows("replay", mode, len(steps))
+        self._prev_output = self.alert_engine.chain(outputs[-1], alerts[-1])
+        self.state.update(current_index=steps[-1].idx + 1, last_prediction=self._prev_output)
+        self._publish_status()
+
+    def run_step(self) -> bool:
+        """Run one step synchronously (no batching); False once stopped or out of data."""
+        step = self.prepare_step()
+        if step is None:
+            return False
+        if step.model is not None and step.error is None:
+            t0 = time.perf_counter()
+            try:
+                step.pred = step.model.predict(step.input)
+            except Exception as e:
+                step.error = str(e)
+            self.clock.stage("model", time.perf_counter() - t0)
+        self.finish_step(step)
+        return True
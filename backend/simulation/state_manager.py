@@ -1,16 +1,18 @@
 import threading
 from typing import Dict, Any
 
+DEFAULT_STATE: Dict[str, Any] = {
+    "running": False,
+    "current_index": 0,
+    "mode": "classification",
+    "speed": 1.0,
+    "last_prediction": None
+}
+
 class StateManager:
     def __init__(self):
         self._lock = threading.Lock()
-        self.state: Dict[str, Any] = {
-            "running": False,
-            "current_index": 0,
-            "mode": "classification",
-            "speed": 1.0,
-            "last_prediction": None
-        }
+        self.state: Dict[str, Any] = dict(DEFAULT_STATE)
 
     def get(self) -> Dict[str, Any]:
         with self._lock:
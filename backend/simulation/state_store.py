@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from simulation.state_manager import DEFAULT_STATE
+
+
+class SQLiteStateStore:
+    """Simulation state, the leader lease and the command queue in one SQLite file.
+
+    Every worker process opens its own connection (re-opened after a fork),
+    so any number of processes can share the file; WAL mode lets readers run
+    alongside the leader's writes.
+    """
+
+    def __init__(self, path: str, busy_timeout_s: float = 5.0):
+        self.path = path
+        self.busy_timeout_s = busy_timeout_s
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        with self._lock:
+            c = self._connection().cursor()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS sim_state (
+                session TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated REAL
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS commands (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                args TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                result TEXT,
+                created REAL,
+                finished REAL
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_commands_status ON commands (status, id)")
+            self._conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # a connection must not be shared with a forked child
+        if self._conn is None or self._pid != os.getpid():
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            # autocommit: transactions are opened explicitly with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, check_same_thread=False,
+                                         isolation_level=None)
+            self._pid = os.getpid()
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    # --- session state ---
+
+    def load(self, session: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT state FROM sim_state WHERE session = ?", (session,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def merge(self, session: str, defaults: Dict[str, Any], **changes) -> Dict[str, Any]:
+        """Apply `changes` to a session's state atomically (across processes); returns the new state."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT state FROM sim_state WHERE session = ?", (session,)).fetchone()
+                state = dict(defaults)
+                if row:
+                    state.update(json.loads(row[0]))
+                state.update(changes)
+                conn.execute("INSERT OR REPLACE INTO sim_state (session, state, updated) VALUES (?, ?, ?)",
+                             (session, json.dumps(state), time.time()))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return state
+
+    def sessions(self) -> Dict[str, Dict[str, Any]]:
+        return {name: json.loads(state) for name, state in self._execute("SELECT session, state FROM sim_state ORDER BY session")}
+
+    def has_session(self, session: str) -> bool:
+        return bool(self._execute("SELECT 1 FROM sim_state WHERE session = ?", (session,)))
+
+    def delete_session(self, session: str):
+        self._execute("DELETE FROM sim_state WHERE session = ?", (session,))
+
+    # --- leader lease ---
+
+    def acquire_lease(self, name: str, holder: str, ttl_s: float) -> bool:
+        """Take or renew the lease; True if `holder` owns it until now + ttl_s."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT holder, expires FROM leases WHERE name = ?", (name,)).fetchone()
+                held = row is None or row[0] == holder or row[1] < now
+                if held:
+                    conn.execute("INSERT OR REPLACE INTO leases (name, holder, expires) VALUES (?, ?, ?)",
+                                 (name, holder, now + ttl_s))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return held
+
+    def release_lease(self, name: str, holder: str):
+        self._execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def lease_holder(self, name: str) -> Optional[Tuple[str, float]]:
+        rows = self._execute("SELECT holder, expires FROM leases WHERE name = ?", (name,))
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    # --- commands for the leader ---
+
+    def submit_command(self, op: str, args: Dict[str, Any]) -> int:
+        with self._lock:
+            cur = self._connection().execute("INSERT INTO commands (op, args, created) VALUES (?, ?, ?)",
+                                             (op, json.dumps(args), time.time()))
+            return cur.lastrowid
+
+    def pending_commands(self) -> List[Tuple[int, str, Dict[str, Any]]]:
+        rows = self._execute("SELECT id, op, args FROM commands WHERE status = 'pending' ORDER BY id")
+        return [(cid, op, json.loads(args)) for cid, op, args in rows]
+
+    def claim_command(self, command_id: int) -> bool:
+        with self._lock:
+            cur = self._connection().execute(
+                "UPDATE commands SET status = 'running' WHERE id = ? AND status = 'pending'", (command_id,))
+            return cur.rowcount == 1
+
+    def finish_command(self, command_id: int, ok: bool, result: Any):
+        self._execute("UPDATE commands SET status = ?, result = ?, finished = ? WHERE id = ?",
+                      ("done" if ok else "error", json.dumps(result), time.time(), command_id))
+
+    def command_result(self, command_id: int) -> Optional[Tuple[str, Any]]:
+        """(status, result) once the command has finished, else None."""
+        rows = self._execute("SELECT status, result FROM commands WHERE id = ?", (command_id,))
+        if not rows or rows[0][0] in ("pending", "running"):
+            return None
+        return rows[0][0], json.loads(rows[0][1]) if rows[0][1] is not None else None
+
+    def cancel_command(self, command_id: int) -> bool:
+        """Withdraw a command nobody has picked up yet."""
+        with self._lock:
+            cur = self._connection().execute("DELETE FROM commands WHERE id = ? AND status = 'pending'", (command_id,))
+            return cur.rowcount == 1
+
+    def prune_commands(self, older_than_s: float = 600.0):
+        self._execute("DELETE FROM commands WHERE status IN ('done', 'error') AND finished < ?",
+                      (time.time() - older_than_s,))
+
+
+class SharedStateManager:
+    """StateManager backed by a SQLiteStateStore row, visible to every worker process."""
+
+    def __init__(self, store: SQLiteStateStore, session: str):
+        self.store = store
+        self.session = session
+
+    def get(self) -> Dict[str, Any]:
+        state = dict(DEFAULT_STATE)
+        state.update(self.store.load(self.session) or {})
+        return state
+
+    def update(self, **kwargs):
+        self.store.merge(self.session, DEFAULT_STATE, **kwargs)
+
+    def reset_index(self):
+        self.store.merge(self.session, DEFAULT_STATE, current_index=0, last_prediction=None)
@@ -37,6 +37,8 @@ type SimulationContextValue = {
 
 const SimulationContext = createContext<SimulationContextValue | null>(null)
 
+const HISTORY_LIMIT = 300
+
 export function SimulationProvider({ children }: { children: React.ReactNode }) {
   const [status, setStatus] = useState<SimulationStatus | null>(null)
   const [history, setHistory] = useState<SimulationHistoryRecord[]>([])
@@ -49,6 +51,8 @@ export function SimulationProvider({ children }: { children: React.ReactNode })
 
   const lastToastedAlertId = useRef<number>(0)
   const inflight = useRef<{ status: boolean; history: boolean }>({ status: false, history: false })
+  // Cursor for incremental history polling: last record id seen and the backend history generation
+  const historyCursor = useRef<{ lastId: number | null; generation: string | null }>({ lastId: null, generation: null })
   const controlInFlightRef = useRef(false)
 
   const fetchStatus = useCallback(async () => {
@@ -67,80 +71,137 @@ export function SimulationProvider({ children }: { children: React.ReactNode })
     }
   }, [])
 
+  const notifyAlerts = useCallback((records: SimulationHistoryRecord[]) => {
+    // Toast only for *new* alerts (records where alert_message is non-empty)
+    const newAlerts = records.filter((r) => r.alert_message && r.id > lastToastedAlertId.current)
+    if (newAlerts.length > 0) {
+      const maxId = Math.max(...newAlerts.map((a) => a.id))
+      lastToastedAlertId.current = maxId
+
+      // Improve UX: Dismiss any existing toast before showing a new one
+      toast.dismiss()
+
+      // Show only the latest alert if multiple arrive at once
+      const latestAlert = newAlerts[newAlerts.length - 1]
+
+      const mode = latestAlert.mode
+      const hazardValue = latestAlert.risk_level
+      const normalized = normalizeRisk(mode, hazardValue)
+      const cls = bandClasses(normalized.band)
+
+      toast.custom(
+        (t) => (
+          <div
+            className={[
+              'pointer-events-auto w-90 rounded-xl px-4 py-3 shadow-2xl',
+              'bg-black/90 ring-1 ring-white/10 backdrop-blur',
+              t.visible ? 'animate-in fade-in slide-in-from-top-2' : 'animate-out fade-out',
+            ].join(' ')}
+          >
+            <div className="flex items-start gap-3">
+              <div className={['mt-1 h-2.5 w-2.5 rounded-full', cls.dot].join(' ')} />
+              <div className="min-w-0">
+                <div className="flex items-center gap-2">
+                  <span className="text-sm font-semibold text-white">TerraGuard Alert</span>
+                  <span className={['inline-flex items-center rounded-full px-2 py-0.5 text-xs', cls.badge].join(' ')}>
+                    {normalized.band}
+                  </span>
+                </div>
+                <div className="mt-1 text-sm text-white/80">{latestAlert.alert_message}</div>
+              </div>
+              <button
+                className="ml-auto text-white/60 hover:text-white"
+                onClick={() => toast.dismiss(t.id)}
+                aria-label="Dismiss"
+              >
+                ×
+              </button>
+            </div>
+          </div>
+        ),
+        { duration: 6500 }
+      )
+    }
+  }, [])
+
   const fetchHistory = useCallback(async () => {
     if (inflight.current.history) return
     inflight.current.history = true
     try {
-      const h = await simulationApi.getSimulationHistory(300)
-      setHistory(h)
+      const cursor = historyCursor.current
+      let page = await simulationApi.getSimulationHistory(HISTORY_LIMIT, cursor.lastId ?? undefined)
+      if (cursor.lastId != null && page.generation !== cursor.generation) {
+        // history was reset since the last poll: the cursor is stale, reload the tail
+        page = await simulationApi.getSimulationHistory(HISTORY_LIMIT)
+        cursor.lastId = null
+      }
+      const incremental = cursor.lastId != null
+      const h = page.records
+      cursor.generation = page.generation
+      if (h.length > 0) cursor.lastId = h[h.length - 1].id
+      if (incremental) {
+        if (h.length > 0) setHistory((prev) => [...prev, ...h].slice(-HISTORY_LIMIT))
+      } else {
+        setHistory(h)
+      }
       setError(null)
       setLastHistoryAt(Date.now())
 
-      // Toast only for *new* alerts (records where alert_message is non-empty)
-      const newAlerts = h.filter((r) => r.alert_message && r.id > lastToastedAlertId.current)
-      if (newAlerts.length > 0) {
-        const maxId = Math.max(...newAlerts.map((a) => a.id))
-        lastToastedAlertId.current = maxId
-
-        // Improve UX: Dismiss any existing toast before showing a new one
-        toast.dismiss()
-
-        // Show only the latest alert if multiple arrive at once
-        const latestAlert = newAlerts[newAlerts.length - 1]
-
-        const mode = latestAlert.mode
-        const hazardValue = latestAlert.risk_level
-        const normalized = normalizeRisk(mode, hazardValue)
-        const cls = bandClasses(normalized.band)
-
-        toast.custom(
-          (t) => (
-            <div
-              className={[
-                'pointer-events-auto w-90 rounded-xl px-4 py-3 shadow-2xl',
-                'bg-black/90 ring-1 ring-white/10 backdrop-blur',
-                t.visible ? 'animate-in fade-in slide-in-from-top-2' : 'animate-out fade-out',
-              ].join(' ')}
-            >
-              <div className="flex items-start gap-3">
-                <div className={['mt-1 h-2.5 w-2.5 rounded-full', cls.dot].join(' ')} />
-                <div className="min-w-0">
-                  <div className="flex items-center gap-2">
-                    <span className="text-sm font-semibold text-white">TerraGuard Alert</span>
-                    <span className={['inline-flex items-center rounded-full px-2 py-0.5 text-xs', cls.badge].join(' ')}>
-                      {normalized.band}
-                    </span>
-                  </div>
-                  <div className="mt-1 text-sm text-white/80">{latestAlert.alert_message}</div>
-                </div>
-                <button
-                  className="ml-auto text-white/60 hover:text-white"
-                  onClick={() => toast.dismiss(t.id)}
-                  aria-label="Dismiss"
-                >
-                  ×
-                </button>
-              </div>
-            </div>
-          ),
-          { duration: 6500 }
-        )
-      }
+      notifyAlerts(h)
     } catch (e) {
       setError(e instanceof Error ? e.message : 'Failed to fetch simulation history')
     } finally {
       inflight.current.history = false
       setLoading(false)
     }
-  }, [])
+  }, [notifyAlerts])
 
   const refreshNow = useCallback(async () => {
     await Promise.all([fetchStatus(), fetchHistory()])
   }, [fetchHistory, fetchStatus])
 
+  // Live updates: records and status are pushed over SSE; polling only runs while the stream is down
+  const [streaming, setStreaming] = useState(false)
+
+  useEffect(() => {
+    const es = simulationApi.openSimulationStream()
+    if (!es) return
+
+    const resync = () => {
+      historyCursor.current.lastId = null
+      void fetchHistory()
+    }
+
+    es.onopen = () => setStreaming(true)
+    es.onerror = () => setStreaming(false)
+    es.addEventListener('status', (ev) => {
+      setStatus(JSON.parse((ev as MessageEvent).data) as SimulationStatus)
+      setLastStatusAt(Date.now())
+      setLoading(false)
+    })
+    es.addEventListener('record', (ev) => {
+      const rec = JSON.parse((ev as MessageEvent).data) as SimulationHistoryRecord
+      const cursor = historyCursor.current
+      if (cursor.lastId != null && rec.id <= cursor.lastId) return
+      cursor.lastId = rec.id
+      setHistory((prev) => [...prev, rec].slice(-HISTORY_LIMIT))
+      setLastHistoryAt(Date.now())
+      notifyAlerts([rec])
+    })
+    // reset, or this client fell behind: reload the tail over HTTP
+    es.addEventListener('reset', resync)
+    es.addEventListener('dropped', resync)
+    es.addEventListener('resync', resync)
+
+    return () => {
+      es.close()
+      setStreaming(false)
+    }
+  }, [fetchHistory, notifyAlerts])
+
   // Polling cadence (centralized)
-  useInterval(fetchStatus, 1000)
-  useInterval(fetchHistory, 2000)
+  useInterval(fetchStatus, streaming ? null : 1000)
+  useInterval(fetchHistory, streaming ? null : 2000)
 
   // initial load (StrictMode-safe: effect will run twice in dev but is idempotent)
   useEffect(() => {
@@ -1,5 +1,5 @@
 import { AlertTriangle, Gauge, Layers, MoveUpRight, Zap } from 'lucide-react'
-import { useMemo } from 'react'
+import { useEffect, useMemo, useRef, useState } from 'react'
 import { AlertsPanel } from '../components/dashboard/AlertsPanel'
 import { MetricCard } from '../components/dashboard/MetricCard'
 import { DisplacementChart } from '../components/charts/DisplacementChart'
@@ -9,6 +9,8 @@ import { Spinner } from '../components/ui/Spinner'
 import { useSimulation } from '../context/SimulationContext'
 import { formatNumber, formatPercent } from '../utils/format'
 import { normalizeRisk } from '../utils/risk'
+import * as simulationApi from '../services/simulationApi'
+import type { SimulationSeries } from '../types/simulation'
 
 function pickDisplacement(modelOutput: Record<string, unknown> | null | undefined, rawRow: Record<string, unknown> | null | undefined) {
   const fromModel =
@@ -18,8 +20,23 @@ function pickDisplacement(modelOutput: Record<string, unknown> | null | undefine
   return Number.isFinite(v) ? v : null
 }
 
+const CHART_POINTS = 160
+
 export function DashboardPage() {
-  const { status, history, loading, error, activeAlertsCount, riskBand } = useSimulation()
+  const { status, history, loading, error, activeAlertsCount, riskBand, lastHistoryAt } = useSimulation()
+
+  // Chart series are downsampled server-side over the whole run; refreshed as new records arrive (at most every 2 s)
+  const [series, setSeries] = useState<SimulationSeries | null>(null)
+  const lastSeriesFetch = useRef(0)
+  useEffect(() => {
+    const now = Date.now()
+    if (now - lastSeriesFetch.current < 2000) return
+    lastSeriesFetch.current = now
+    simulationApi
+      .getSimulationSeries(CHART_POINTS)
+      .then(setSeries)
+      .catch(() => setSeries(null))
+  }, [lastHistoryAt])
 
   const lastRecord = history.length ? history[history.length - 1] : null
   const mode = status?.mode ?? (lastRecord?.mode ?? 'classification')
@@ -36,7 +53,19 @@ export function DashboardPage() {
   )
 
   const chartData = useMemo(() => {
-    const tail = history.slice(-160)
+    const disp = series?.series.displacement
+    const haz = series?.series.hazard
+    if (disp && haz && series.count > 0) {
+      const label = (ts: number | null, id: number) =>
+        ts == null ? `#${id}` : new Date(ts * 1000).toLocaleTimeString([], { minute: '2-digit', second: '2-digit' })
+      return {
+        hazard: haz.id.map((id, i) => ({ t: label(haz.ts[i], id), hazard: normalizeRisk(mode, haz.value[i]).index })),
+        displacement: disp.id.map((id, i) => ({ t: label(disp.ts[i], id), displacement: disp.value[i] ?? 0 })),
+      }
+    }
+
+    // fallback while the series endpoint is unavailable: the latest records held in context
+    const tail = history.slice(-CHART_POINTS)
     return {
       hazard: tail.map((r) => {
         const d = new Date(r.timestamp)
@@ -50,7 +79,7 @@ export function DashboardPage() {
         return { t, displacement: disp }
       }),
     }
-  }, [history])
+  }, [history, series, mode])
 
   return (
     <div className="space-y-6">
@@ -1,6 +1,6 @@
 import axios from 'axios'
 
-const baseURL = import.meta.env.VITE_API_BASE_URL ?? 'http://localhost:8000'
+export const baseURL = import.meta.env.VITE_API_BASE_URL ?? 'http://localhost:8000'
 
 export const apiClient = axios.create({
   baseURL,
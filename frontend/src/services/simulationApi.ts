@@ -1,5 +1,5 @@
-import { apiClient } from './apiClient'
-import type { SimulationHistoryRecord, SimulationMode, SimulationStatus } from '../types/simulation'
+import { apiClient, baseURL } from './apiClient'
+import type { SimulationHistoryRecord, SimulationMode, SimulationSeries, SimulationStatus } from '../types/simulation'
 
 export type StartSimulationParams = {
   csv_path?: string
@@ -11,13 +11,41 @@ export async function getSimulationStatus(): Promise<SimulationStatus> {
   return res.data
 }
 
-export async function getSimulationHistory(limit = 300): Promise<SimulationHistoryRecord[]> {
+export type HistoryPage = {
+  records: SimulationHistoryRecord[]
+  /** Changes when the backend history is reset; cursors from another generation are stale. */
+  generation: string | null
+}
+
+/**
+ * Latest `limit` records, or only those after `sinceId` when given.
+ * Unchanged responses are revalidated by the browser via ETag (304, no body).
+ */
+export async function getSimulationHistory(limit = 300, sinceId?: number): Promise<HistoryPage> {
   const res = await apiClient.get<SimulationHistoryRecord[]>('/simulation/history', {
-    params: { limit },
+    params: { limit, latest: true, ...(sinceId != null ? { since_id: sinceId } : {}) },
+  })
+  const generation = res.headers['x-history-generation']
+  return { records: res.data, generation: generation != null ? String(generation) : null }
+}
+
+/** Whole-run chart series, downsampled on the server to about `points` points each. */
+export async function getSimulationSeries(points = 160, fields = 'displacement,hazard'): Promise<SimulationSeries> {
+  const res = await apiClient.get<SimulationSeries>('/simulation/series', {
+    params: { points, fields },
   })
   return res.data
 }
 
+/**
+ * Server-sent event stream of `record` / `status` / `reset` / `dropped` / `resync` events.
+ * EventSource reconnects on its own and resumes after the last record id it received.
+ */
+export function openSimulationStream(): EventSource | null {
+  if (typeof EventSource === 'undefined') return null
+  return new EventSource(`${baseURL}/simulation/stream`)
+}
+
 /** Start can be slow when backend loads a large Excel/CSV dataset. */
 const START_TIMEOUT_MS = 60_000
 
@@ -8,6 +8,8 @@ export type SimulationStatus = {
   speed: number
   last_prediction: Record<string, unknown> | null
   dataset_length: number
+  /** False while a streamed dataset is still being read and `dataset_length` is an estimate. */
+  dataset_length_exact?: boolean
 }
 
 // Mirrors `DBManager.fetch_history()` record shape as returned by `/simulation/history`.
@@ -21,3 +23,18 @@ export type SimulationHistoryRecord = {
   alert_message: string
 }
 
+
+// `/simulation/series`: server-side downsampled chart series (parallel arrays per series).
+export type SeriesPoints = {
+  id: number[]
+  ts: (number | null)[]
+  value: (number | null)[]
+}
+
+export type SimulationSeries = {
+  generation: number
+  last_id: number
+  count: number
+  method: 'lttb' | 'minmax'
+  series: Partial<Record<'displacement' | 'risk_score' | 'hazard', SeriesPoints>>
+}